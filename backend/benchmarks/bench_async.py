@@ -0,0 +1,228 @@
+"""
+Compare sync and async upload/get-data views under concurrent load.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_async [--requests 400] [--vision-ms 300] [--firebase-ms 40]
+                                     [--threads 8] [--concurrency 64]
+
+Vision is replaced by the fake OCR backend sleeping ``--vision-ms`` per
+image and Firebase by an in-memory stand-in sleeping ``--firebase-ms``
+per call. Sync views run on ``--threads`` threads, like a gthread
+worker. Async views run ``--concurrency`` requests at once on one event
+loop with the default bounded pools. ``threads`` is the number of extra
+threads each mode used; peak RSS growth is sampled from /proc while it
+runs (Linux only).
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sample_app_project.settings')
+os.environ.setdefault('SEVEN_SEGMENT_ENABLED', 'False')
+os.environ.setdefault('OCR_CACHE_ENABLED', 'False')
+os.environ.setdefault('VITALS_HISTORY_ENABLED', 'False')
+os.environ.setdefault('SERVER_TIMING_ENABLED', 'False')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import AsyncRequestFactory, RequestFactory  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from sample_app_project import views  # noqa: E402
+from sample_app_project.ocr_backends import FakeBackend  # noqa: E402
+
+
+class FakeReference:
+    """Enough of firebase_admin.db.Reference for the upload and get-data paths"""
+
+    def __init__(self, tree, path, rtt):
+        self.tree = tree
+        self.path = path
+        self.rtt = rtt
+
+    def get(self):
+        time.sleep(self.rtt)
+        return self.tree.get(self.path)
+
+    def set(self, value):
+        time.sleep(self.rtt)
+        self.tree[self.path] = value
+
+    def update(self, value):
+        time.sleep(self.rtt)
+        self.tree.setdefault(self.path, {}).update(value)
+
+
+class RSSSampler:
+    """Peak resident set size growth over a block, sampled every few milliseconds"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    @staticmethod
+    def rss():
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            return None
+
+    def __enter__(self):
+        self.baseline = self.rss()
+        self.peak = self.baseline or 0
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.rss() or 0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def growth_mb(self):
+        if self.baseline is None:
+            return None
+        return (self.peak - self.baseline) / 1e6
+
+
+def jpeg(width=640, height=480):
+    buf = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 200, 200)).save(buf, 'JPEG', quality=90)
+    return buf.getvalue()
+
+
+def upload_params(image, i):
+    upload = io.BytesIO(image)
+    upload.name = f'capture-{i}.jpg'
+    return {'image': upload, 'type': 'temperature', 'roomId': f'room-{i % 32}'}
+
+
+def summarize(name, latencies, elapsed, threads, rss, errors):
+    latencies.sort()
+    growth = rss.growth_mb()
+    return (
+        f"{name:<28} {len(latencies) / elapsed:>8.1f} {statistics.median(latencies) * 1000:>9.1f} "
+        f"{latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000:>9.1f} {threads:>8} "
+        f"{'n/a' if growth is None else f'{growth:.1f}':>9} {errors:>7}"
+    )
+
+
+def run_sync(view, make_request, count, threads):
+    latencies = []
+    errors = 0
+    peak_threads = 0
+
+    def one(i):
+        nonlocal errors, peak_threads
+        request = make_request(i)
+        started = time.perf_counter()
+        response = view(request)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        peak_threads = max(peak_threads, threading.active_count())
+
+    with RSSSampler() as rss:
+        baseline_threads = threading.active_count()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(one, range(count)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed, peak_threads - baseline_threads, rss, errors
+
+
+def run_async(view, make_request, count, concurrency):
+    latencies = []
+    errors = 0
+    peak_threads = 0
+
+    async def client(indexes):
+        nonlocal errors, peak_threads
+        for i in indexes:
+            request = make_request(i)
+            started = time.perf_counter()
+            response = await view(request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            peak_threads = max(peak_threads, threading.active_count())
+
+    async def main():
+        await asyncio.gather(*(client(range(c, count, concurrency)) for c in range(concurrency)))
+
+    with RSSSampler() as rss:
+        baseline_threads = threading.active_count()
+        started = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - started
+    # Pool threads count against this mode only
+    views.executors.shutdown()
+    return latencies, elapsed, peak_threads - baseline_threads, rss, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--vision-ms', type=float, default=300.0, help="simulated Vision latency")
+    parser.add_argument('--firebase-ms', type=float, default=40.0, help="simulated Firebase round trip")
+    parser.add_argument('--threads', type=int, default=8, help="threads serving the sync views")
+    parser.add_argument('--concurrency', type=int, default=64, help="requests in flight for the async views")
+    args = parser.parse_args()
+
+    tree = {}
+    views.db.reference = lambda path: FakeReference(tree, path, args.firebase_ms / 1000)
+    views.initialize_services = lambda: True
+    views.services._states['firebase'].ready = True
+    backend = FakeBackend(latency=args.vision_ms / 1000)
+    views.ocr_backends = {'default': backend}
+    # Answer every get-data from Firebase, not the room cache
+    views.room_cache = None
+    views.async_uploads.limit = max(views.async_uploads.limit, args.concurrency)
+
+    image = jpeg()
+    factory = RequestFactory()
+    async_factory = AsyncRequestFactory()
+
+    def sync_upload(i):
+        return factory.post('/api/upload/', upload_params(image, i))
+
+    def async_upload(i):
+        return async_factory.post('/api/upload/', upload_params(image, i))
+
+    def sync_get(i):
+        return factory.get('/api/get-data/', {'roomId': f'room-{i % 32}', 'fields': '-images'})
+
+    def async_get(i):
+        return async_factory.get('/api/get-data/', {'roomId': f'room-{i % 32}', 'fields': '-images'})
+
+    print(f"{args.requests} requests, Vision {args.vision_ms:.0f} ms, Firebase {args.firebase_ms:.0f} ms, "
+          f"sync on {args.threads} threads, async {args.concurrency} in flight "
+          f"(pools: {', '.join(f'{k}={v}' for k, v in views.executors.sizes.items())})")
+    print(f"{'mode':<28} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'threads':>8} {'+RSS MB':>9} {'errors':>7}")
+    cases = [
+        ('upload sync', lambda: run_sync(views.upload_image, sync_upload, args.requests, args.threads)),
+        ('upload async', lambda: run_async(views.upload_image_async, async_upload, args.requests, args.concurrency)),
+        ('get-data sync', lambda: run_sync(views.get_captured_data, sync_get, args.requests, args.threads)),
+        ('get-data async', lambda: run_async(views.get_captured_data_async, async_get, args.requests,
+                                             args.concurrency)),
+    ]
+    for name, run in cases:
+        print(summarize(name, *run()))
+
+
+if __name__ == '__main__':
+    main()
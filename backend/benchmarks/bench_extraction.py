@@ -0,0 +1,138 @@
+"""
+Benchmark vital-sign extraction against the previous regex implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_extraction [--seconds 2]
+"""
+
+import argparse
+import re
+import time
+
+from sample_app_project.extraction import extract
+
+# The OCRService.extract_value implementation this engine replaced, kept
+# verbatim so the comparison stays honest
+LEGACY_PATTERNS = {
+    'temperature': r"(\d{1,3}[,.]?\d{0,2}\s?[°℃CF])|(\d{1,3}[,.]?\d{0,2})",
+    'weight': r"(\d{1,4}[,.]?\d{0,3}\s?[kK][gG])|(\d{1,4}[,.]?\d{0,3})",
+    'glucose': r"(\d{1,4}[,.]?\d{0,2}\s?(mg/dL|mmol/L)?)|(\d{1,4}[,.]?\d{0,2})",
+    'blood_pressure': r"\b(\d{2,3})[\/\-](\d{2,3})\s*(mmHg|mmhg|MMHG)?\b",
+    'endoscope': r".+"
+}
+
+
+def legacy_extract_value(text, capture_type):
+    if not text or text == "No text found":
+        return None
+
+    matches = re.findall(LEGACY_PATTERNS[capture_type], text, re.IGNORECASE)
+    flat_matches = [m for group in matches for m in group if m]
+
+    if not flat_matches:
+        return None
+
+    raw_value = flat_matches[0]
+    clean_value = re.sub(r"[^\d.,]", "", raw_value)
+
+    if ',' in clean_value and '.' not in clean_value:
+        numeric_value = clean_value.replace(',', '.')
+    elif '.' in clean_value and ',' not in clean_value:
+        numeric_value = clean_value
+    elif ',' in clean_value and '.' in clean_value:
+        parts = clean_value.split(',')
+        if len(parts) == 2:
+            integer_part = parts[0].replace('.', '')
+            decimal_part = parts[1]
+            numeric_value = f"{integer_part}.{decimal_part}"
+        else:
+            numeric_value = clean_value.replace(',', '.')
+    else:
+        numeric_value = clean_value
+
+    try:
+        float(numeric_value)
+
+        if capture_type == 'temperature':
+            return f"{numeric_value}°C"
+        elif capture_type == 'weight':
+            return f"{numeric_value} Kg"
+        elif capture_type == 'glucose':
+            return f"{numeric_value} mg/dL"
+        elif capture_type == 'blood_pressure':
+            return f"{clean_value} mmHg"
+        elif capture_type == 'endoscope':
+            return "Endoscopic data captured"
+        else:
+            return numeric_value
+    except ValueError:
+        return None
+
+
+def current_extract_value(text, capture_type):
+    reading = extract(text, capture_type)
+    return reading.format() if reading else None
+
+
+ENDOSCOPE_REPORT = "\n".join(
+    [
+        "OLYMPUS EVIS EXERA III CV-190",
+        "Patient: ********  ID: 0042-1187",
+        "Date 2026/03/14  Time 10:42:17",
+    ]
+    + [f"Frame {i:04d}  Gain A  Enh A{i % 8}  Iris Auto  Zoom x1.{i % 9}" for i in range(400)]
+)
+
+# Realistic OCR outputs: device screens read as several lines of text with
+# labels, clock digits and battery icons around the reading
+CORPUS = [
+    ('temperature', "36,5°C"),
+    ('temperature', "BODY TEMP\n37.2 °C\nMEM 12"),
+    ('temperature', "12:45\nFever!\n38.9C\nTHERMO-X"),
+    ('temperature', "98.6 F\nOral"),
+    ('weight', "72.4 kg"),
+    ('weight', "SCALE 200\n081.6kg\nBMI 24.1\nFAT 18.3%"),
+    ('weight', "STEP ON\n0.0\n65,30 KG"),
+    ('glucose', "5.6 mmol/L\nAC\n08:15"),
+    ('glucose', "GLU\n104 mg/dL\nCode 25\n03-14"),
+    ('blood_pressure', "SYS DIA PUL\n128/84 mmHg\nPUL 72"),
+    ('blood_pressure', "MEM 3\n2026-03-14\n117-76\nIHB"),
+    ('endoscope', ENDOSCOPE_REPORT),
+    ('temperature', "No text found"),
+    ('weight', "E-3\nLo"),
+]
+
+
+def run(func, seconds):
+    """Call func over the corpus repeatedly for ~seconds; return extractions/sec"""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for capture_type, text in CORPUS:
+            func(text, capture_type)
+        count += len(CORPUS)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help="time budget per implementation")
+    args = parser.parse_args()
+
+    print(f"{'capture':<15} {'legacy':<24} {'current':<24}")
+    for capture_type, text in CORPUS:
+        sample = text if len(text) < 40 else f"<{len(text)} chars>"
+        print(f"{capture_type:<15} {str(legacy_extract_value(text, capture_type)):<24} "
+              f"{str(current_extract_value(text, capture_type)):<24} {sample!r}")
+
+    legacy = run(legacy_extract_value, args.seconds)
+    current = run(current_extract_value, args.seconds)
+    print()
+    print(f"legacy:  {legacy:>12,.0f} extractions/sec")
+    print(f"current: {current:>12,.0f} extractions/sec  ({current / legacy:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Compare /api/get-data/ against the previous five-read implementation.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_get_data [--rtt-ms 40] [--image-kb 150] [--requests 50]
+
+Firebase is replaced by an in-memory stand-in that sleeps ``--rtt-ms`` per
+``get()`` to model the round trip to the Realtime Database. Each capture
+record carries a base64 image of ``--image-kb`` kilobytes, as uploads do
+when the blob store is off.
+
+The room reads are measured with the room cache off, so every request pays
+the Firebase round trip like the legacy view; the cached rows show polling
+once the room cache holds the room.
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sample_app_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import JsonResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from sample_app_project import views  # noqa: E402
+from sample_app_project.room_cache import build_room_cache  # noqa: E402
+
+
+class FakeReference:
+    """Enough of firebase_admin.db.Reference for reads of a nested dict"""
+
+    def __init__(self, tree, path, rtt):
+        self.tree = tree
+        self.path = path
+        self.rtt = rtt
+
+    def get(self):
+        time.sleep(self.rtt)
+        node = self.tree
+        for part in self.path.strip('/').split('/'):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+
+def build_tree(room_id, image_kb):
+    image = base64.b64encode(os.urandom(image_kb * 1024 * 3 // 4)).decode('utf-8')
+    readings = {
+        'temperature': ('36.5°C', 36.5, '°C'),
+        'weight': ('72.4 Kg', 72.4, 'kg'),
+        'glucose': ('104 mg/dL', 104.0, 'mg/dL'),
+        'blood_pressure': ('128/84 mmHg', None, 'mmHg'),
+        'endoscope': ('Endoscope image captured', None, None),
+    }
+    room = {
+        capture_type: {
+            'raw_text': formatted,
+            'formatted_value': formatted,
+            'value': value,
+            'unit': unit,
+            'confidence': 0.92,
+            'ocr_backend': 'google',
+            'timestamp': '2026-03-14T10:00:00',
+            'captured_image': image,
+        }
+        for capture_type, (formatted, value, unit) in readings.items()
+    }
+    return {'telehealth_data': {room_id: room}}
+
+
+def legacy_get_captured_data(request):
+    """The view this change replaced, kept verbatim minus the service check"""
+    room_id = request.GET.get("roomId")
+    db = views.db
+    temperature_ref = db.reference(f'telehealth_data/{room_id}/temperature')
+    weight_ref = db.reference(f'telehealth_data/{room_id}/weight')
+    glucose_ref = db.reference(f'telehealth_data/{room_id}/glucose')
+    blood_pressure = db.reference(f'telehealth_data/{room_id}/blood_pressure')
+    endoscope_ref = db.reference(f'telehealth_data/{room_id}/endoscope')
+
+    return JsonResponse({
+        'status': 'success',
+        'data': {
+            'temperature': temperature_ref.get(),
+            'weight': weight_ref.get(),
+            'glucose': glucose_ref.get(),
+            'blood_pressure': blood_pressure.get(),
+            'endoscope': endoscope_ref.get()
+        }
+    })
+
+
+def measure(view, request, count):
+    latencies = []
+    size = 0
+    for _ in range(count):
+        started = time.perf_counter()
+        response = view(request)
+        latencies.append(time.perf_counter() - started)
+        size = len(response.content)
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        'bytes': size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rtt-ms', type=float, default=40.0, help="simulated Firebase round trip")
+    parser.add_argument('--image-kb', type=int, default=150, help="base64 image size per record")
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    room_id = 'bench-room'
+    tree = build_tree(room_id, args.image_kb)
+    views.db.reference = lambda path: FakeReference(tree, path, args.rtt_ms / 1000)
+    views.initialize_services = lambda: True
+
+    factory = RequestFactory()
+    cases = [
+        ('legacy (5 reads)', legacy_get_captured_data, {'roomId': room_id}, False),
+        ('room read', views.get_captured_data, {'roomId': room_id}, False),
+        ('room read -images', views.get_captured_data, {'roomId': room_id, 'fields': '-images'}, False),
+        ('cached', views.get_captured_data, {'roomId': room_id}, True),
+        ('cached -images', views.get_captured_data, {'roomId': room_id, 'fields': '-images'}, True),
+    ]
+
+    print(f"rtt {args.rtt_ms:.0f} ms, {args.image_kb} KB image per record, {args.requests} requests")
+    print(f"{'variant':<20} {'p50 ms':>9} {'p95 ms':>9} {'bytes':>10}")
+    for name, view, params, cached in cases:
+        views.room_cache = build_room_cache() if cached else None
+        result = measure(view, factory.get('/api/get-data/', params), args.requests)
+        print(f"{name:<20} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['bytes']:>10}")
+
+
+if __name__ == '__main__':
+    main()
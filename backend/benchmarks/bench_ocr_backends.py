@@ -0,0 +1,112 @@
+"""
+Compare OCR backend latency and throughput on the same image set.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_ocr_backends [--images DIR] [--concurrency 4]
+        [--fake-latency 0.3] [--google]
+
+Without --images a set of synthetic device-display images is generated.
+The tesseract backend is included when pytesseract is installed; Google
+Vision only with --google (it needs credentials and costs quota).
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image, ImageDraw, ImageFont
+
+from sample_app_project.ocr_backends import FakeBackend, GoogleVisionBackend, TesseractBackend
+
+READINGS = ["36.5 °C", "72.4 kg", "104 mg/dL", "128/84 mmHg", "37.9 °C", "5.6 mmol/L"]
+
+
+def synthetic_images(count):
+    """Dark text on a light LCD-like panel, one reading per image"""
+    try:
+        font = ImageFont.load_default(size=96)
+    except TypeError:
+        font = ImageFont.load_default()
+    images = []
+    for i in range(count):
+        img = Image.new('L', (800, 300), 200)
+        ImageDraw.Draw(img).text((40, 90), READINGS[i % len(READINGS)], fill=20, font=font)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def load_images(directory):
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            with open(os.path.join(directory, name), 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+def measure(backend, images, concurrency):
+    latencies = []
+
+    def call(image_bytes):
+        started = time.perf_counter()
+        backend.detect_text(image_bytes)
+        latencies.append(time.perf_counter() - started)
+
+    # Warm up connections and model loading outside the measurement
+    backend.detect_text(images[0])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, images))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'images_per_sec': len(images) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', help="directory of JPEG/PNG captures")
+    parser.add_argument('--count', type=int, default=40, help="synthetic images to generate")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--fake-latency', type=float, default=0.0,
+                        help="seconds the fake backend sleeps per call, to model a remote engine")
+    parser.add_argument('--google', action='store_true', help="include Google Vision")
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count)
+    if not images:
+        parser.error("no images to run")
+
+    backends = [FakeBackend(latency=args.fake_latency)]
+    try:
+        backends.append(TesseractBackend())
+    except ImproperlyConfigured as e:
+        print(f"skipping tesseract: {e}")
+    if args.google:
+        from google.cloud import vision
+        client = vision.ImageAnnotatorClient()
+        backends.append(GoogleVisionBackend(lambda: client))
+
+    print(f"{len(images)} images, concurrency {args.concurrency}")
+    print(f"{'backend':<10} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'images/s':>10}")
+    for backend in backends:
+        result = measure(backend, images, args.concurrency)
+        print(f"{backend.name:<10} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['mean_ms']:>9.1f} {result['images_per_sec']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
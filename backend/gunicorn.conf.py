@@ -0,0 +1,20 @@
+"""
+Gunicorn settings, picked up automatically by ``gunicorn sample_app_project.wsgi``.
+
+The app is not preloaded, so workers start without the OCR stack. Each
+worker imports it in a background thread once it has loaded the
+application, so ``/health/`` answers at once and the first upload does
+not pay for the imports. Set WARM_UP_ON_FORK=False to skip this.
+"""
+
+import os
+
+
+def post_worker_init(worker):
+    if os.environ.get('WARM_UP_ON_FORK', 'True') != 'True':
+        return
+
+    from sample_app_project.lazy_import import warm_up_in_background
+    from sample_app_project.views import initialize_services
+
+    warm_up_in_background(then=initialize_services)
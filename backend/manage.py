@@ -29,11 +29,17 @@ def main():
             config_dir.mkdir(exist_ok=True)
             vision_key_path = config_dir / "vision-key.json"
             
-            with open(vision_key_path, "w") as f:
-                json.dump(vision_creds, f)
+            # Only rewrite the key file when the credentials changed
+            try:
+                unchanged = json.loads(vision_key_path.read_text()) == vision_creds
+            except (OSError, ValueError):
+                unchanged = False
+            if not unchanged:
+                with open(vision_key_path, "w") as f:
+                    json.dump(vision_creds, f)
+                print(f"Google Vision credentials saved to: {vision_key_path.absolute()}")
             
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(vision_key_path.absolute())
-            print(f"Google Vision credentials saved to: {vision_key_path.absolute()}")
             
         except json.JSONDecodeError as e:
             print(f"Error parsing Google Vision credentials: {e}")
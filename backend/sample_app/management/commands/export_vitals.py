@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sample_app_project.views import export_vitals_stream, parse_time
+
+
+class Command(BaseCommand):
+    help = "Stream vitals for a set of rooms or a time window as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['latest', 'history'], default='latest',
+                            help="latest Firebase records, or every reading in the history store")
+        parser.add_argument('--rooms', default='', help="comma-separated room ids (default: all)")
+        parser.add_argument('--types', default='', help="comma-separated capture types (default: all)")
+        parser.add_argument('--start', help="ISO 8601 or epoch seconds")
+        parser.add_argument('--end', help="ISO 8601 or epoch seconds")
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--images', action='store_true', help="include image payloads")
+        parser.add_argument('--output', '-o', help="file to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            chunks, stats = export_vitals_stream(
+                source=options['source'],
+                rooms=[r for r in options['rooms'].split(',') if r],
+                capture_types=[t for t in options['types'].split(',') if t],
+                start=parse_time(options['start'], None),
+                end=parse_time(options['end'], None),
+                include_images=options['images'],
+                fmt=options['format'],
+                label="export_vitals"
+            )
+        except Exception as e:
+            raise CommandError(str(e))
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            out.flush()
+            if options['output']:
+                out.close()
+        self.stderr.write(stats.summary())
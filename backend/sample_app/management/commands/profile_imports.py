@@ -0,0 +1,61 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(output):
+    """``(module, self_us, cumulative_us, depth)`` rows from ``-X importtime`` output"""
+    rows = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Report per-module import cost of a cold start, measured in a fresh interpreter"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='sample_app_project.urls',
+                            help="module imported after django.setup() (default: the URLconf)")
+        parser.add_argument('--warm', action='store_true',
+                            help="also import the lazily loaded OCR stack, to see its cost")
+        parser.add_argument('--top', type=int, default=25, help="modules to list")
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--budget-ms', type=float,
+                            help="exit with an error when the total exceeds this many milliseconds")
+
+    def handle(self, *args, **options):
+        code = f"import django; django.setup(); import {options['module']}"
+        if options['warm']:
+            code += "; from sample_app_project.lazy_import import warm_up; warm_up()"
+
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'sample_app_project.settings')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, env=env
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Import failed:\n{result.stderr[-2000:]}")
+
+        rows = parse_importtime(result.stderr)
+        total_ms = sum(row[2] for row in rows if row[3] == 0) / 1000
+        key = 2 if options['sort'] == 'cumulative' else 1
+        top = sorted(rows, key=lambda row: row[key], reverse=True)[:options['top']]
+
+        self.stdout.write(f"{len(rows)} modules imported in {total_ms:.1f} ms "
+                          f"(python -c \"{code}\")")
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for module, self_us, cumulative_us, depth in top:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}")
+
+        if options['budget_ms'] is not None and total_ms > options['budget_ms']:
+            raise CommandError(f"Import time {total_ms:.1f} ms exceeds the {options['budget_ms']:.0f} ms budget")
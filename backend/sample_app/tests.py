@@ -1,3 +1,958 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image, ImageDraw
+
+from sample_app_project import metrics, resilience, views
+from sample_app_project.blob_store import BlobNotFound, LocalBlobStore
+from sample_app_project.events import RoomEventHub
+from sample_app_project.extraction import extract, normalize_decimal
+from sample_app_project.metrics import Histogram, RequestMetrics, label, stage, timed
+from sample_app_project.ocr_backends import FakeBackend, TesseractBackend, build_backends
+from sample_app_project.ocr_cache import OCRResultCache
+from sample_app_project.ocr_queue import InProcessJobQueue, OCRJob, QueueFull, SynchronousJobQueue
+from sample_app_project.outbox import FirebaseOutbox, pending_rows
+from sample_app_project.preprocessing import preprocess_image
+from sample_app_project.resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, deadline
+from sample_app_project.room_cache import RoomCache
+from sample_app_project.room_data import validate_room_id
+from sample_app_project.services import ServiceRegistry
+from sample_app_project.sevenseg import DIGIT_SEGMENTS, FastPath, recognize
+from sample_app_project.upload_handlers import UploadRejected
+from sample_app_project.views import OCRService
+from sample_app_project.vitals_history import VitalsHistory
+
+
+class ExtractValueTests(SimpleTestCase):
+    """Readings must keep the precision the legacy regexes kept"""
+
+    def assertReads(self, text, capture_type, expected):
+        self.assertEqual(OCRService.extract_value(text, capture_type), expected)
+
+    def test_extra_decimals_are_truncated_not_dropped(self):
+        self.assertReads('36.555', 'temperature', '36.55°C')
+        self.assertReads('70.5555 kg', 'weight', '70.555 Kg')
+        self.assertReads('5.678', 'glucose', '5.67 mg/dL')
+        self.assertReads('123.4567 kg', 'weight', '123.456 Kg')
+
+    def test_whole_number_is_range_checked(self):
+        # 1234.567 kg, not 1234 or 1 kg: out of range, so no reading
+        self.assertReads('1234.5678 kg', 'weight', None)
+        self.assertReads('12345.6 kg', 'weight', None)
+
+    def test_mixed_separators(self):
+        self.assertEqual(normalize_decimal('1.234,5'), '1234.5')
+        self.assertEqual(normalize_decimal('1,234.5'), '1234.5')
+        # 1234.5 kg is out of range; it must not be read as 1.234 kg
+        self.assertReads('1.234,5 kg', 'weight', None)
+
+    def test_decimal_comma(self):
+        self.assertReads('36,6 C', 'temperature', '36.6°C')
+
+    def test_clock_readings_are_skipped(self):
+        self.assertReads('12:30 36.5', 'temperature', '36.5°C')
+        self.assertReads('10:45 72.3kg', 'weight', '72.3 Kg')
+
+    def test_units(self):
+        self.assertReads('98.6F', 'temperature', '98.6°F')
+        self.assertReads('5.5 mmol/L', 'glucose', '5.5 mmol/L')
+        self.assertReads('120/80', 'blood_pressure', '120/80 mmHg')
+
+    def test_no_text(self):
+        self.assertIsNone(extract('No text found', 'weight'))
+
+
+class PreprocessImageTests(SimpleTestCase):
+
+    def test_decompression_bomb_is_rejected_as_too_large(self):
+        out = io.BytesIO()
+        Image.new('RGB', (100, 100)).save(out, format='PNG')
+        out.seek(0)
+        # Pillow raises DecompressionBombError past twice this many pixels
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            with self.assertRaises(UploadRejected):
+                preprocess_image(out, 'temperature')
+
+    def jpeg(self, **params):
+        out = io.BytesIO()
+        Image.new('RGB', (320, 240), (200, 200, 200)).save(out, format='JPEG', **params)
+        return out.getvalue()
+
+    def test_plain_jpeg_is_passed_through(self):
+        raw = self.jpeg()
+        image_bytes, stats = preprocess_image(io.BytesIO(raw), 'temperature')
+        self.assertFalse(stats['reencoded'])
+        self.assertEqual(image_bytes, raw)
+
+    def test_metadata_is_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Acme'
+        exif[0x8825] = {1: 'N', 2: (52.0, 31.0, 12.0)}
+        raw = self.jpeg(exif=exif, comment=b'SN 0042')
+
+        image_bytes, stats = preprocess_image(io.BytesIO(raw), 'temperature')
+        self.assertTrue(stats['reencoded'])
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            self.assertEqual([marker for marker, _ in img.applist], ['APP0'])
+            self.assertEqual(len(img.getexif()), 0)
+
+def seven_segment_png(text, point_offset=4, blobs=()):
+    """Dark 60x100 seven-segment digits on a light display, 80px apart"""
+    width, height, stroke = 60, 100, 12
+    img = Image.new('L', (480, 180), 220)
+    draw = ImageDraw.Draw(img)
+    x, y = 40, 40
+    for char in text:
+        if char == '.':
+            left = x - 80 + width + point_offset
+            draw.rectangle((left, y + height - stroke, left + stroke - 1, y + height - 1), fill=30)
+            continue
+        segments = {
+            'a': (x + stroke, y, x + width - stroke, y + stroke),
+            'b': (x + width - stroke, y + stroke, x + width, y + height // 2),
+            'c': (x + width - stroke, y + height // 2, x + width, y + height - stroke),
+            'd': (x + stroke, y + height - stroke, x + width - stroke, y + height),
+            'e': (x, y + height // 2, x + stroke, y + height - stroke),
+            'f': (x, y + stroke, x + stroke, y + height // 2),
+            'g': (x + stroke, y + (height - stroke) // 2, x + width - stroke, y + (height + stroke) // 2),
+        }
+        for segment in DIGIT_SEGMENTS[char]:
+            left, top, right, bottom = segments[segment]
+            draw.rectangle((left, top, right - 1, bottom - 1), fill=30)
+        x += 80
+    for blob in blobs:
+        draw.rectangle(blob, fill=30)
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def jpeg_upload(name='capture.jpg'):
+    out = io.BytesIO()
+    Image.new('RGB', (320, 240), (200, 200, 200)).save(out, format='JPEG')
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+class SevenSegmentTests(SimpleTestCase):
+
+    def test_reads_digits_and_decimal_point(self):
+        self.assertEqual(recognize(seven_segment_png('41.2')).text, '41.2')
+        self.assertEqual(recognize(seven_segment_png('36.55')).text, '36.55')
+
+    def test_solid_blob_is_not_a_confident_eight(self):
+        reading = recognize(seven_segment_png('', blobs=[(40, 40, 99, 139)]))
+        self.assertLess(reading.confidence, 0.6)
+
+    def test_short_bar_is_not_a_confident_one(self):
+        reading = recognize(seven_segment_png('45', blobs=[(200, 90, 211, 139)]))
+        self.assertEqual(reading.text, '451')
+        self.assertLess(reading.confidence, 0.6)
+
+    def test_doubtful_decimal_point_zeroes_confidence(self):
+        # Touching the 5, so it is not a blob of its own
+        self.assertEqual(recognize(seven_segment_png('45.5', point_offset=0)).confidence, 0.0)
+        # Too wide for a decimal point, but where one would be
+        self.assertEqual(recognize(seven_segment_png('455', blobs=[(142, 128, 180, 139)])).confidence, 0.0)
+
+    def test_scale_reading_without_decimal_point_falls_back(self):
+        fast_path = FastPath()
+        self.assertIsNone(fast_path.read(seven_segment_png('455'), 'weight'))
+        self.assertEqual(fast_path.read(seven_segment_png('45.5'), 'weight'), '45.5')
+
+    def test_two_unit_types_need_a_configured_unit(self):
+        self.assertFalse(FastPath().handles('glucose'))
+        self.assertFalse(FastPath().handles('temperature'))
+
+        fast_path = FastPath(units={'glucose': 'mmol/L'})
+        self.assertTrue(fast_path.handles('glucose'))
+        self.assertEqual(fast_path.read(seven_segment_png('5.5'), 'glucose'), '5.5 mmol/L')
+
+    def test_configured_unit_is_stored_with_the_reading(self):
+        fast_path = FastPath(units={'temperature': '°F'})
+        with mock.patch.object(views, 'get_fast_path', return_value=fast_path):
+            result = OCRService.read_fast_path(seven_segment_png('98.6'), 'temperature')
+            self.assertEqual((result['value'], result['unit']), ('98.6', '°F'))
+            # Digits alone must not be saved with the default unit
+            self.assertIsNone(OCRService.read_fast_path(seven_segment_png('98.6'), 'glucose'))
+
+
+class VitalsHistoryTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, 'history')
+        self.history = VitalsHistory(self.root)
+
+    def test_root_is_created_on_first_append(self):
+        self.assertFalse(os.path.exists(self.root))
+        self.assertEqual(self.history.rooms(), [])
+        self.history.append('room-1', 'weight', {'value': '70.5', 'unit': 'Kg', 'timestamp': '2026-03-14T10:00:00'})
+        self.assertEqual(self.history.rooms(), ['room-1'])
+
+    def test_room_ids_stay_inside_the_root(self):
+        for room_id in ('..', '.', '../..', '.hidden', 'a/../../b'):
+            directory = os.path.realpath(self.history.series_dir(room_id, 'weight'))
+            self.assertEqual(os.path.dirname(os.path.dirname(directory)), os.path.realpath(self.root))
+        with self.assertRaises(ValueError):
+            self.history.series_dir('', 'weight')
+
+    def test_room_ids_round_trip(self):
+        for room_id in ('..', 'clinic.a', 'room 7/b'):
+            self.history.append(room_id, 'temperature', {'value': '36.6', 'unit': '°C',
+                                                         'timestamp': '2026-03-14T10:00:00'})
+        self.assertEqual(self.history.rooms(), ['..', 'clinic.a', 'room 7/b'])
+
+
+    def test_bucket_parameters_are_validated(self):
+        with mock.patch.object(views, 'vitals_history', self.history):
+            for params, message in (
+                ({'buckets': '0'}, "buckets must be a positive integer, not '0'"),
+                ({'buckets': '-3'}, "buckets must be a positive integer, not '-3'"),
+                ({'buckets': 'many'}, "buckets must be a positive integer, not 'many'"),
+                ({'bucket': 'nan'}, "bucket must be a positive number of seconds"),
+                ({'bucket': '0'}, "bucket must be a positive number of seconds"),
+            ):
+                request = RequestFactory().get('/api/history/', {'roomId': 'room-1', 'type': 'weight', **params})
+                response = views.vitals_history_view(request)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(response.content)['message'], message)
+
+class OutboxOrderingTests(SimpleTestCase):
+    """Rows queued while Firebase was down must not be overtaken by direct writes"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'outbox.sqlite3')
+        settings = override_settings(OUTBOX_PATH=self.path, FIREBASE_WRITE_BEHIND=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # No flusher thread: rows stay queued, as during an outage
+        for patch in (mock.patch.object(views, 'outbox', None), mock.patch.object(FirebaseOutbox, 'start')):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_direct_writes_without_an_outbox(self):
+        self.assertIsNone(views.outbox_for('room-1'))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(views.resume_outbox())
+
+    def test_room_with_queued_rows_writes_through_the_outbox(self):
+        FirebaseOutbox(self.path, writer=None).enqueue('room-1', {'weight': {'value': '70.5'}})
+        self.assertEqual(pending_rows(self.path), 1)
+
+        self.assertIsNotNone(views.outbox_for('room-1'))
+        self.assertIsNone(views.outbox_for('room-2'))
+
+    def test_queued_rows_start_the_outbox_at_startup(self):
+        FirebaseOutbox(self.path, writer=None).enqueue('room-1', {'weight': {'value': '70.5'}})
+        outbox = views.resume_outbox()
+        self.assertIsNotNone(outbox)
+        outbox.start.assert_called_once_with()
+
+
+class FirebaseError(Exception):
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class OutboxFlushTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'outbox.sqlite3')
+        self.written = []
+
+    def writer(self, room_id, updates):
+        # Mirrors db.reference(), which rejects keys with '.', '#', '$', '[' or ']'
+        if '.' in room_id:
+            raise ValueError(f"Invalid path argument: telehealth_data/{room_id}")
+        self.written.append((room_id, updates))
+
+    def test_newest_record_per_capture_type_is_written(self):
+        outbox = FirebaseOutbox(self.path, self.writer)
+        outbox.enqueue('room-1', {'weight': {'value': '70.1'}})
+        outbox.enqueue('room-1', {'weight': {'value': '70.5'}, 'temperature': {'value': '36.6'}})
+
+        self.assertEqual(outbox.flush(), 3)
+        self.assertEqual(self.written, [('room-1', {'weight': {'value': '70.5'}, 'temperature': {'value': '36.6'}})])
+        self.assertEqual(outbox.stats()['coalesced_rows'], 1)
+        self.assertFalse(outbox.has_pending('room-1'))
+
+    def test_rows_left_by_a_dead_process_are_replayed(self):
+        FirebaseOutbox(self.path, writer=None).enqueue('room-1', {'weight': {'value': '70.5'}})
+
+        outbox = FirebaseOutbox(self.path, self.writer)
+        self.assertEqual(outbox.flush(), 1)
+        self.assertEqual(self.written, [('room-1', {'weight': {'value': '70.5'}})])
+        self.assertEqual(pending_rows(self.path), 0)
+
+    def test_rejected_room_is_dead_lettered_and_others_flush(self):
+        outbox = FirebaseOutbox(self.path, self.writer)
+        outbox.enqueue('clinic.a', {'weight': {'value': '70.5'}})
+        outbox.enqueue('room-2', {'weight': {'value': '80.0'}})
+
+        self.assertEqual(outbox.flush(), 1)
+        self.assertEqual(self.written, [('room-2', {'weight': {'value': '80.0'}})])
+        stats = outbox.stats()
+        self.assertEqual((stats['pending'], stats['dead_letter'], stats['dead_lettered']), (0, 1, 1))
+
+    def test_permission_denied_is_dead_lettered(self):
+        def writer(room_id, updates):
+            raise FirebaseError('PERMISSION_DENIED')
+
+        outbox = FirebaseOutbox(self.path, writer)
+        outbox.enqueue('room-1', {'weight': {'value': '70.5'}})
+        self.assertEqual(outbox.flush(), 0)
+        self.assertEqual(outbox.stats()['dead_letter'], 1)
+
+    def test_transient_failure_keeps_rows_queued(self):
+        for error in (FirebaseError('UNAVAILABLE'), Exception("Firebase not initialized")):
+            def writer(room_id, updates):
+                raise error
+
+            outbox = FirebaseOutbox(self.path, writer)
+            outbox.enqueue('room-1', {'weight': {'value': '70.5'}})
+            with self.assertRaises(type(error)):
+                outbox.flush()
+            self.assertEqual(outbox.stats()['dead_letter'], 0)
+        self.assertEqual(pending_rows(self.path), 2)
+
+
+class RoomIdTests(SimpleTestCase):
+
+    def test_firebase_keys_are_accepted(self):
+        self.assertEqual(validate_room_id('room-1'), 'room-1')
+        self.assertEqual(validate_room_id('Klinik Süd_3'), 'Klinik Süd_3')
+
+    def test_invalid_keys_are_rejected(self):
+        for room_id in ('', 'clinic.a', 'a#b', 'a$b', 'a[0]', 'a/b', 'a\nb', 'x' * 769):
+            with self.assertRaises(ValueError):
+                validate_room_id(room_id)
+
+
+class BlobStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = LocalBlobStore(tmp.name)
+
+    def test_identical_images_are_stored_once(self):
+        digest = self.store.put(b'jpeg')
+        self.assertEqual(self.store.put(b'jpeg'), digest)
+        with self.store.open(digest) as f:
+            self.assertEqual(f.read(), b'jpeg')
+        stats = self.store.stats()
+        self.assertEqual((stats['stored'], stats['deduplicated'], stats['bytes_stored']), (1, 1, 4))
+
+    def test_only_digests_resolve_to_paths(self):
+        for digest in ('../settings.py', '0' * 63, 'A' * 64):
+            with self.assertRaises(BlobNotFound):
+                self.store.open(digest)
+        with self.assertRaises(BlobNotFound):
+            self.store.open('0' * 64)
+
+    def test_records_reference_the_blob(self):
+        with mock.patch.object(views, 'get_blob_store', return_value=self.store):
+            image_bytes, image_fields, stats = views.prepare_image(jpeg_upload(), 'weight')
+        ref = image_fields['captured_image_ref']
+        self.assertNotIn('captured_image', image_fields)
+        self.assertEqual(ref['url'], f"/api/images/{ref['digest']}/")
+        self.assertEqual((ref['bytes'], ref['width'], ref['height']), (len(image_bytes), 320, 240))
+        with self.store.open(ref['digest']) as f:
+            self.assertEqual(f.read(), image_bytes)
+
+
+class CapturedImageTests(SimpleTestCase):
+
+    def setUp(self):
+        store = mock.Mock()
+        store.open.side_effect = lambda digest: io.BytesIO(b'jpeg')
+        patch = mock.patch.object(views, 'get_blob_store', return_value=store)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_images_are_only_cached_privately(self):
+        for headers in ({}, {'HTTP_IF_NONE_MATCH': '"abc"'}):
+            response = views.captured_image(RequestFactory().get('/api/images/abc/', **headers), 'abc')
+            self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(response.status_code, 304)
+
+
+class RoomCacheTests(SimpleTestCase):
+
+    def test_read_that_raced_a_write_is_not_cached(self):
+        cache = RoomCache()
+        generation = cache.generation('room-1')
+        # A write lands while the read is in flight
+        cache.apply('room-1', {'weight': {'value': '70.5'}})
+        cache.fill('room-1', {'weight': {'value': '70.1'}}, generation)
+
+        self.assertIsNone(cache.get('room-1'))
+        self.assertEqual(cache.stats()['stale_fills'], 1)
+
+        cache.fill('room-1', {'weight': {'value': '70.5'}}, cache.generation('room-1'))
+        self.assertEqual(cache.get('room-1')[1], {'weight': {'value': '70.5'}})
+
+    def test_cache_is_bounded_by_bytes(self):
+        cache = RoomCache(max_bytes=1000)
+        image = {'captured_image': 'A' * 600}
+        cache.fill('room-1', {'weight': image}, 0)
+        cache.fill('room-2', {'weight': image}, 0)
+        self.assertIsNone(cache.get('room-1'))
+        self.assertIsNotNone(cache.get('room-2'))
+
+        cache.fill('room-3', {'weight': {'captured_image': 'A' * 2000}}, 0)
+        self.assertIsNone(cache.get('room-3'))
+        self.assertLessEqual(cache.stats()['bytes'], 1000)
+
+
+class GetDataTests(SimpleTestCase):
+
+    def setUp(self):
+        self.firebase = mock.Mock(return_value={'weight': {'formatted_value': '70.5 Kg', 'captured_image': 'abc'}})
+        for patch in (
+            mock.patch.object(views, 'initialize_services', return_value=True),
+            mock.patch.object(views, 'call_upstream', lambda name, fn: self.firebase()),
+            mock.patch.object(views, 'room_cache', RoomCache()),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def get(self, **params):
+        headers = {'HTTP_IF_NONE_MATCH': params.pop('etag')} if 'etag' in params else {}
+        return views.get_captured_data(RequestFactory().get('/api/get-data/', params, **headers))
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get(roomId='room-1')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(roomId='room-1', etag=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.firebase.call_count, 1)
+
+    def test_write_changes_the_etag(self):
+        etag = self.get(roomId='room-1')['ETag']
+        views.room_written('room-1', {'weight': {'formatted_value': '71.0 Kg'}})
+        self.assertEqual(self.get(roomId='room-1', etag=etag).status_code, 200)
+
+    def test_projection_has_its_own_etag(self):
+        etag = self.get(roomId='room-1')['ETag']
+        response = self.get(roomId='room-1', fields='-images', etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'captured_image', response.content)
+
+
+class JobQueueTests(SimpleTestCase):
+
+    def test_full_queue_rejects_new_jobs(self):
+        job_queue = InProcessJobQueue(handler=None, maxsize=1)
+        job_queue.submit({'n': 1})
+        with self.assertRaises(QueueFull):
+            job_queue.submit({'n': 2})
+        metrics = job_queue.metrics()
+        self.assertEqual((metrics['depth'], metrics['submitted'], metrics['rejected']), (1, 1, 1))
+
+    def test_workers_record_results_and_failures(self):
+        def handler(job):
+            if job.payload['n'] == 2:
+                raise ValueError("no reading")
+            return {'value': '36.6'}
+
+        job_queue = InProcessJobQueue(handler, workers=1)
+        job_queue.start()
+        done, failed = job_queue.submit({'n': 1}), job_queue.submit({'n': 2})
+        # Shutdown queues behind both jobs, so joining waits for them
+        job_queue.shutdown(wait=True)
+
+        self.assertEqual((done.status, done.result), (OCRJob.DONE, {'value': '36.6'}))
+        self.assertEqual((failed.status, failed.error), (OCRJob.FAILED, "no reading"))
+        self.assertIsNone(done.payload)
+        self.assertEqual(job_queue.get(done.id), done)
+        self.assertEqual((job_queue.metrics()['completed'], job_queue.metrics()['failed']), (1, 1))
+
+
+class AsyncUploadTests(SimpleTestCase):
+
+    def setUp(self):
+        self.job_queue = SynchronousJobQueue(lambda job: {'capture_type': job.payload['capture_type']})
+        for patch in (
+            mock.patch.object(views, 'initialize_services', return_value=True),
+            mock.patch.object(views, 'get_job_queue', return_value=self.job_queue),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def upload(self):
+        request = RequestFactory().post('/api/upload/', {
+            'image': jpeg_upload(), 'type': 'weight', 'roomId': 'room-1', 'async': '1'
+        })
+        return views.upload_image(request)
+
+    def test_upload_is_queued_and_its_status_reported(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.content)['job_id']
+
+        response = views.job_status(RequestFactory().get(f'/api/jobs/{job_id}/'), job_id)
+        data = json.loads(response.content)['data']
+        self.assertEqual((data['status'], data['result']), ('done', {'capture_type': 'weight'}))
+
+        response = views.job_status(RequestFactory().get('/api/jobs/nope/'), 'nope')
+        self.assertEqual(response.status_code, 404)
+
+    def test_full_queue_answers_503(self):
+        self.job_queue.submit = mock.Mock(side_effect=QueueFull("OCR queue is full (100 jobs pending)"))
+        response = self.upload()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class BatchUploadTests(SimpleTestCase):
+
+    def setUp(self):
+        self.run_ocr_batch = mock.Mock()
+        self.save = mock.Mock()
+        for patch in (
+            mock.patch.object(views, 'initialize_services', return_value=True),
+            mock.patch.object(views, 'run_ocr_batch', self.run_ocr_batch),
+            mock.patch.object(views, 'save_batch_to_firebase', self.save),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def upload(self, types, images=None):
+        request = RequestFactory().post('/api/upload-batch/', {
+            'images': images or [jpeg_upload(f'{t}.jpg') for t in types], 'types': types, 'roomId': 'room-1'
+        })
+        response = views.upload_batch(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_readable_captures_are_saved_in_one_write(self):
+        self.run_ocr_batch.return_value = [{'value': '70.5'}, {'error': "No glucose detected"}]
+        status, body = self.upload(['weight', 'glucose'])
+
+        self.assertEqual(status, 200)
+        self.assertEqual([item['status'] for item in body['data']['results']], ['success', 'error'])
+        room_id, to_save = self.save.call_args.args
+        self.assertEqual((room_id, list(to_save)), ('room-1', ['weight']))
+        self.assertIn('captured_image', to_save['weight'][1])
+
+    def test_nothing_readable_is_an_error(self):
+        self.run_ocr_batch.return_value = [{'error': "No weight detected"}]
+        status, body = self.upload(['weight'])
+        self.assertEqual((status, body['status']), (400, 'error'))
+        self.save.assert_not_called()
+
+    def test_images_and_types_must_match(self):
+        status, body = self.upload(['weight', 'glucose'], images=[jpeg_upload()])
+        self.assertEqual((status, body['message']), (400, "Got 1 images but 2 types"))
+        status, body = self.upload(['height'])
+        self.assertEqual((status, body['message']), (400, "Unknown capture type(s): height"))
+        self.run_ocr_batch.assert_not_called()
+
+
+class OCRCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.disk_dir = tmp.name
+        self.cache = OCRResultCache(max_entries=2, disk_dir=self.disk_dir)
+        self.process_image = mock.Mock(side_effect=lambda image_bytes, capture_type: {'value': '70.5'})
+        for patch in (
+            mock.patch.object(views, 'ocr_cache', self.cache),
+            mock.patch.object(OCRService, 'process_image', self.process_image),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_repeated_upload_skips_ocr(self):
+        first = views.run_ocr(b'jpeg', 'weight')
+        second = views.run_ocr(b'jpeg', 'weight')
+        self.assertEqual(self.process_image.call_count, 1)
+        self.assertEqual(second['value'], first['value'])
+        # The same bytes as another capture type are a different reading
+        views.run_ocr(b'jpeg', 'glucose')
+        self.assertEqual(self.process_image.call_count, 2)
+
+    def test_hits_are_copies(self):
+        views.run_ocr(b'jpeg', 'weight')['captured_image'] = 'abc'
+        self.assertNotIn('captured_image', views.run_ocr(b'jpeg', 'weight'))
+
+    def test_disk_tier_is_shared_between_caches(self):
+        key = self.cache.make_key(b'jpeg', 'weight')
+        self.cache.set(key, {'value': '70.5'})
+        other = OCRResultCache(disk_dir=self.disk_dir)
+        self.assertEqual(other.get(key), {'value': '70.5'})
+        self.assertEqual(other.stats()['disk_hits'], 1)
+
+    def test_expired_entries_miss(self):
+        cache = OCRResultCache(ttl=0)
+        key = cache.make_key(b'jpeg', 'weight')
+        cache.set(key, {'value': '70.5'})
+        with mock.patch('time.time', return_value=time.time() + 1):
+            self.assertIsNone(cache.get(key))
+
+
+class OCRBackendTests(SimpleTestCase):
+
+    @override_settings(OCR_BACKEND='fake', OCR_BACKEND_OVERRIDES={'weight': 'fake', 'glucose': 'tesseract'},
+                       OCR_BACKEND_OPTIONS={'fake': {'text': '70.5 kg'}})
+    def test_backends_per_capture_type_share_instances(self):
+        with mock.patch.dict(sys.modules, {'pytesseract': mock.Mock()}):
+            backends = build_backends(get_vision_client=None)
+        self.assertIs(backends['weight'], backends['default'])
+        self.assertIsInstance(backends['glucose'], TesseractBackend)
+        self.assertEqual(backends['weight'].detect_text(b'jpeg').text, '70.5 kg')
+
+    def test_fake_backend_answers_per_image(self):
+        backend = FakeBackend(text='36.5 °C', responses={hashlib.sha256(b'scale').hexdigest(): '70.5 kg'})
+        self.assertEqual(backend.detect_text(b'scale').text, '70.5 kg')
+        self.assertEqual([w.text for w in backend.detect_text(b'other').words], ['36.5', '°C'])
+
+    def test_results_name_the_backend(self):
+        backend = FakeBackend(text='Weight 70.5 kg')
+        with override_settings(SEVEN_SEGMENT_ENABLED=False), \
+                mock.patch.object(views, 'get_ocr_backend', return_value=backend):
+            result = OCRService.process_image(b'jpeg', 'weight')
+        self.assertEqual((result['value'], result['ocr_backend']), ('70.5', 'fake'))
+
+
+class ExportTests(SimpleTestCase):
+
+    def setUp(self):
+        record = {'formatted_value': '70.5 Kg', 'value': '70.5', 'unit': 'Kg',
+                  'timestamp': '2026-03-14T10:00:00', 'captured_image': 'abc'}
+        self.tree = {'room-1': {'weight': record}, 'room-2': {'weight': dict(record, value='80.0')}}
+        self.reads = []
+
+        def reference(path):
+            ref = mock.Mock()
+            room_id = path.partition('/')[2]
+            ref.get.side_effect = lambda shallow=False: (
+                self.reads.append(room_id) or (self.tree.get(room_id) if room_id else self.tree)
+            )
+            return ref
+
+        for patch in (
+            mock.patch.object(views, 'initialize_services', return_value=True),
+            mock.patch.object(views, 'db', mock.Mock(reference=reference)),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def export(self, **params):
+        return views.export_vitals(RequestFactory().get('/api/export/', params))
+
+    def test_rooms_are_read_as_the_body_streams(self):
+        response = self.export(types='weight')
+        self.assertTrue(response.streaming)
+        # Only the room list so far
+        self.assertEqual(self.reads, [''])
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(self.reads, ['', 'room-1', 'room-2'])
+        self.assertEqual([(r['room_id'], r['value']) for r in rows], [('room-1', '70.5'), ('room-2', '80.0')])
+        self.assertNotIn('captured_image', rows[0])
+
+    def test_csv_with_images(self):
+        response = self.export(format='csv', rooms='room-1', types='weight', images='1')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('room_id,capture_type,timestamp,'))
+        self.assertTrue(lines[0].endswith(',captured_image,captured_image_ref'))
+        self.assertEqual(len(lines), 2)
+        self.assertIn(',abc,', lines[1])
+
+    def test_history_source(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        history = VitalsHistory(os.path.join(tmp.name, 'history'))
+        history.append('room-1', 'weight', {'value': '70.5', 'unit': 'Kg', 'timestamp': '2026-03-14T10:00:00'})
+        with mock.patch.object(views, 'vitals_history', history):
+            response = self.export(source='history')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(r['room_id'], r['capture_type'], r['value']) for r in rows], [('room-1', 'weight', 70.5)])
+
+    def test_bad_parameters_are_rejected_up_front(self):
+        for params in ({'format': 'xml'}, {'types': 'height'}, {'source': 'archive'}):
+            self.assertEqual(self.export(**params).status_code, 400)
+        self.assertEqual(self.reads, [])
+
+
+class ServiceRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.registry = ServiceRegistry(retry_base=30.0)
+        self.registry._init_firebase = mock.Mock()
+        self.registry._init_vision = mock.Mock(side_effect=Exception("Missing Google Vision credentials"))
+
+    def test_services_are_initialized_once(self):
+        self.assertTrue(self.registry.ensure(vision=False))
+        self.assertTrue(self.registry.ensure(vision=False))
+        self.registry._init_firebase.assert_called_once_with()
+
+    def test_failed_initialization_backs_off(self):
+        self.assertFalse(self.registry.ensure())
+        self.assertFalse(self.registry.ensure())
+        self.registry._init_vision.assert_called_once_with()
+        vision = self.registry.readiness()['services']['vision']
+        self.assertEqual((vision['status'], vision['failures']), ('failed', 1))
+        self.assertGreater(vision['retry_in_seconds'], 0)
+
+        self.registry._states['vision'].next_attempt_at = 0.0
+        self.registry._init_vision.side_effect = None
+        self.assertTrue(self.registry.ensure())
+
+    def test_forked_child_starts_clean(self):
+        self.registry.ensure(vision=False)
+        self.registry.vision_client = mock.Mock()
+        self.registry._after_fork()
+        self.assertFalse(self.registry.firebase_ready)
+        self.assertIsNone(self.registry.vision_client)
+        self.registry.ensure(vision=False)
+        self.assertEqual(self.registry._init_firebase.call_count, 2)
+
+
+class TesseractDeadlineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pytesseract = mock.Mock()
+        self.pytesseract.image_to_data.return_value = {'text': []}
+        with mock.patch.dict(sys.modules, {'pytesseract': self.pytesseract}):
+            self.backend = TesseractBackend()
+        out = io.BytesIO()
+        Image.new('L', (10, 10)).save(out, format='PNG')
+        self.image = out.getvalue()
+
+    def timeout(self):
+        return self.pytesseract.image_to_data.call_args.kwargs['timeout']
+
+    def test_spent_budget_is_not_passed_as_no_limit(self):
+        with deadline(-1):
+            with self.assertRaises(DeadlineExceeded):
+                self.backend.detect_text(self.image)
+        self.pytesseract.image_to_data.assert_not_called()
+
+    def test_remaining_budget_is_the_timeout(self):
+        with deadline(5):
+            self.backend.detect_text(self.image)
+        self.assertTrue(0 < self.timeout() <= 5)
+
+    def test_no_deadline_means_no_timeout(self):
+        self.backend.detect_text(self.image)
+        self.assertEqual(self.timeout(), 0)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.circuit = CircuitBreaker('upstream', window=4, min_calls=4, failure_ratio=0.5, open_seconds=30.0)
+        patch = mock.patch.dict(resilience._breakers, {'upstream': self.circuit})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def trip(self):
+        for ok in (True, False, True, False):
+            self.circuit.allow()
+            self.circuit.record(ok)
+        self.assertEqual(self.circuit.state, CircuitBreaker.OPEN)
+
+    def half_open(self):
+        self.trip()
+        self.circuit._opened_at -= self.circuit.open_seconds
+
+    def test_opens_at_the_failure_ratio_and_rejects_calls(self):
+        for ok in (False, True, True):
+            self.circuit.allow()
+            self.circuit.record(ok)
+        self.assertEqual(self.circuit.state, CircuitBreaker.CLOSED)
+        self.trip()
+        with self.assertRaises(CircuitOpen):
+            self.circuit.allow()
+        self.assertEqual(self.circuit.stats()['rejected'], 1)
+
+    def test_one_trial_call_when_half_open(self):
+        self.half_open()
+        self.circuit.allow()
+        self.assertEqual(self.circuit.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.circuit.allow()
+
+    def test_trial_outcome_closes_or_reopens(self):
+        self.half_open()
+        self.circuit.allow()
+        self.circuit.record(False)
+        self.assertEqual(self.circuit.state, CircuitBreaker.OPEN)
+
+        self.circuit._opened_at -= self.circuit.open_seconds
+        self.circuit.allow()
+        self.circuit.record(True)
+        self.assertEqual(self.circuit.state, CircuitBreaker.CLOSED)
+
+    def test_non_transient_errors_do_not_count(self):
+        for _ in range(4):
+            with self.assertRaises(ValueError):
+                resilience.call_upstream('upstream', mock.Mock(side_effect=ValueError), retries=0)
+        self.assertEqual(self.circuit.state, CircuitBreaker.CLOSED)
+
+    async def test_cancelled_trial_releases_the_breaker(self):
+        self.half_open()
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(resilience.call_upstream_async('upstream', hang, retries=0))
+        await started.wait()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.circuit.state, CircuitBreaker.OPEN)
+
+        # The next trial goes through instead of being rejected forever
+        self.circuit._opened_at -= self.circuit.open_seconds
+
+        async def ok():
+            return 'ok'
+
+        self.assertEqual(await resilience.call_upstream_async('upstream', ok, retries=0), 'ok')
+        self.assertEqual(self.circuit.state, CircuitBreaker.CLOSED)
+
+
+class UpstreamCallTests(SimpleTestCase):
+
+    def setUp(self):
+        patch = mock.patch.dict(resilience._breakers, {'upstream': CircuitBreaker('upstream')})
+        patch.start()
+        self.addCleanup(patch.stop)
+        sleep = mock.patch('time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_transient_errors_are_retried(self):
+        fn = mock.Mock(side_effect=[ConnectionError("reset"), FirebaseError(503), 'ok'])
+        self.assertEqual(resilience.call_upstream('upstream', fn, retries=2, base_delay=0.1), 'ok')
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(resilience.breaker('upstream').stats()['retries'], 2)
+
+    def test_retries_stop_at_the_limit_and_the_deadline(self):
+        fn = mock.Mock(side_effect=ConnectionError("reset"))
+        with self.assertRaises(ConnectionError):
+            resilience.call_upstream('upstream', fn, retries=1, base_delay=0.1)
+        self.assertEqual(fn.call_count, 2)
+
+        fn.reset_mock()
+        with deadline(0.05), self.assertRaises(ConnectionError):
+            # The first backoff would outlast the budget
+            resilience.call_upstream('upstream', fn, retries=3, base_delay=1.0)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_spent_budget_fails_before_calling(self):
+        fn = mock.Mock()
+        with deadline(0), self.assertRaises(DeadlineExceeded):
+            resilience.call_upstream('upstream', fn)
+        fn.assert_not_called()
+
+    def test_failures_map_to_status_codes(self):
+        response = views.upload_failed('req-1', CircuitOpen('vision', 12.2))
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '13'))
+        self.assertEqual(views.upload_failed('req-1', DeadlineExceeded("No time budget left for ocr")).status_code, 504)
+
+
+class MetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(metrics, 'request_metrics', RequestMetrics())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        @timed('upload')
+        def view(request):
+            label(capture_type='weight')
+            with stage('ocr'):
+                pass
+            with stage('ocr'):
+                pass
+            return HttpResponse()
+        self.view = view
+
+    def test_stages_are_reported_in_server_timing(self):
+        with override_settings(SERVER_TIMING_ENABLED=True, METRICS_ENABLED=False):
+            header = self.view(RequestFactory().post('/api/upload/'))['Server-Timing']
+        self.assertRegex(header, r'^ocr;dur=\d+\.\d, total;dur=\d+\.\d$')
+
+    def test_histograms_are_labelled_by_capture_type(self):
+        with override_settings(SERVER_TIMING_ENABLED=False, METRICS_ENABLED=True):
+            response = self.view(RequestFactory().post('/api/upload/'))
+        self.assertNotIn('Server-Timing', response)
+        text = metrics.request_metrics.render()
+        self.assertIn('telehealth_request_duration_seconds_count{endpoint="upload",capture_type="weight",status="200"} 1', text)
+        self.assertIn('telehealth_stage_duration_seconds_count{endpoint="upload",capture_type="weight",stage="ocr"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('latency', 'Latency.', ('endpoint',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(('upload',), value)
+        lines = histogram.render()
+        self.assertIn('latency_bucket{endpoint="upload",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{endpoint="upload",le="1.0"} 2', lines)
+        self.assertIn('latency_bucket{endpoint="upload",le="+Inf"} 3', lines)
+        self.assertIn('latency_sum{endpoint="upload"} 5.550000', lines)
+
+    def test_stages_are_free_when_not_measuring(self):
+        self.assertIs(stage('ocr'), stage('decode'))
+
+
+class RoomEventHubTests(SimpleTestCase):
+
+    def setUp(self):
+        self.hub = RoomEventHub(replay_events=2, max_rooms=2)
+
+    def resume(self, room_id, seq):
+        subscriber, backlog, _ = self.hub.subscribe(room_id, self.hub.event_id(seq))
+        self.hub.unsubscribe(subscriber)
+        return backlog
+
+    async def test_resume_replays_missed_events(self):
+        self.hub.publish('a', {'weight': {'value': '70'}})
+        self.hub.publish('a', {'weight': {'value': '71'}})
+        self.assertEqual([seq for seq, _ in self.resume('a', 1)], [2])
+        self.assertEqual(self.resume('b', 2), [])
+
+    async def test_events_dropped_from_a_full_buffer_need_a_snapshot(self):
+        for value in ('70', '71', '72'):
+            self.hub.publish('a', {'weight': {'value': value}})
+        self.assertIsNone(self.resume('a', 0))
+        self.assertEqual(len(self.resume('a', 1)), 2)
+
+    async def test_room_evicted_past_max_rooms_needs_a_snapshot(self):
+        self.hub.publish('a', {'weight': {'value': '70'}})
+        self.hub.publish('b', {'weight': {'value': '70'}})
+        self.hub.publish('c', {'weight': {'value': '70'}})
+        self.hub.publish('a', {'weight': {'value': '71'}})
+        # Event 1 went with the evicted buffer; the new one only has event 4
+        self.assertIsNone(self.resume('a', 0))
+        self.assertEqual([seq for seq, _ in self.resume('a', 1)], [4])
+
+    async def test_buffered_events_leave_out_embedded_images(self):
+        self.hub.publish('a', {'weight': {'value': '70', 'captured_image': 'base64'}})
+        [(_, updates)] = self.resume('a', 0)
+        self.assertEqual(updates, {'weight': {'value': '70'}})
@@ -14,3 +14,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sample_app_project.settings')
 
 application = get_asgi_application()
+
+# Replay any writes left in the outbox by a previous process, and keep the
+# cached service readiness fresh for /health/
+from django.conf import settings  # noqa: E402
+from sample_app_project.ocr_backends import needs_vision  # noqa: E402
+from sample_app_project.views import resume_outbox, services  # noqa: E402
+
+resume_outbox()
+if settings.SERVICE_PROBE_ENABLED:
+    services.start_probe(vision=needs_vision())
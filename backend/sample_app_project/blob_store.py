@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobNotFound(Exception):
+    """Raised when no blob is stored under a digest"""
+
+
+class BlobStore:
+    """Content-addressed storage for captured images.
+
+    Blobs are stored under the sha256 hex digest of their bytes, so
+    identical uploads are stored once. Subclasses provide the storage; an
+    object-storage backend only needs ``_exists``, ``_write`` and ``open``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'stored': 0, 'deduplicated': 0, 'bytes_stored': 0}
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def validate(digest):
+        if not DIGEST_RE.match(digest):
+            raise BlobNotFound(f"Invalid blob digest '{digest}'")
+        return digest
+
+    def put(self, data, digest=None):
+        """Store bytes and return their digest (pass it if it is already known)"""
+        digest = digest or self.digest(data)
+        if self._exists(digest):
+            with self._lock:
+                self._counters['deduplicated'] += 1
+            return digest
+        self._write(digest, data)
+        with self._lock:
+            self._counters['stored'] += 1
+            self._counters['bytes_stored'] += len(data)
+        return digest
+
+    def open(self, digest):
+        """Return a binary file-like object for the blob"""
+        raise NotImplementedError
+
+    def size(self, digest):
+        raise NotImplementedError
+
+    def stats(self):
+        with self._lock:
+            return {'backend': type(self).__name__, **self._counters}
+
+    def _exists(self, digest):
+        raise NotImplementedError
+
+    def _write(self, digest, data):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under ``root/<first two hex chars>/<digest>``"""
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        self.validate(digest)
+        return os.path.join(self.root, digest[:2], digest)
+
+    def open(self, digest):
+        try:
+            return open(self.path(digest), 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(f"No blob stored under {digest}")
+
+    def size(self, digest):
+        try:
+            return os.path.getsize(self.path(digest))
+        except FileNotFoundError:
+            raise BlobNotFound(f"No blob stored under {digest}")
+
+    def _exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def _write(self, digest, data):
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial blob
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+        logger.info(f"Stored blob {digest} ({len(data)} bytes)")
+
+
+def build_blob_store():
+    """Create the blob store configured in settings"""
+    store_class = import_string(getattr(
+        settings, 'BLOB_STORE_BACKEND', 'sample_app_project.blob_store.LocalBlobStore'
+    ))
+    return store_class(**getattr(settings, 'BLOB_STORE_OPTIONS', {}))
@@ -0,0 +1,119 @@
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class BoundedExecutors:
+    """Named, fixed-size thread pools for blocking work started by async views.
+
+    ``cpu`` takes Pillow and NumPy work, ``io`` takes Firebase Admin calls
+    and multipart parsing. However many requests are in flight, at most
+    this many threads run blocking work; the rest wait in the pool's queue
+    without holding a thread. Threads start on first use, so building the
+    pools before a fork is safe.
+    """
+
+    def __init__(self, sizes):
+        self.sizes = dict(sizes)
+        self._pools = {}
+        self._pending = dict.fromkeys(self.sizes, 0)
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def get(self, pool):
+        with self._lock:
+            if pool not in self._pools:
+                self._pools[pool] = ThreadPoolExecutor(
+                    max_workers=self.sizes[pool], thread_name_prefix=f'async-{pool}'
+                )
+            return self._pools[pool]
+
+    async def run(self, pool, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)`` on ``pool``; context variables (deadline, stage timer) carry over"""
+        executor = self.get(pool)
+        with self._lock:
+            self._pending[pool] += 1
+        try:
+            return await sync_to_async(
+                functools.partial(fn, *args, **kwargs), thread_sensitive=False, executor=executor
+            )()
+        finally:
+            with self._lock:
+                self._pending[pool] -= 1
+
+    def shutdown(self, wait=True):
+        """Stop the pool threads; pools are started again on next use"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for executor in pools.values():
+            executor.shutdown(wait=wait)
+
+    def _after_fork(self):
+        # Pool threads do not survive a fork; the child starts its own
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._pending = dict.fromkeys(self.sizes, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                pool: {'threads': size, 'pending': self._pending[pool], 'started': pool in self._pools}
+                for pool, size in self.sizes.items()
+            }
+
+
+class InflightLimit:
+    """Admission control: at most ``limit`` requests in flight per process.
+
+    Async views hold no thread while they wait, so without a cap a burst
+    of uploads would hold every image in memory at once. Past the cap
+    requests are refused straight away rather than queued.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.inflight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.inflight >= self.limit:
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.inflight)
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'inflight': self.inflight,
+                'peak': self.peak,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
+
+
+def build_executors():
+    return BoundedExecutors({
+        'cpu': getattr(settings, 'ASYNC_CPU_WORKERS', 2),
+        'io': getattr(settings, 'ASYNC_IO_WORKERS', 16),
+    })
+
+
+def build_upload_limit():
+    return InflightLimit(getattr(settings, 'ASYNC_MAX_INFLIGHT_UPLOADS', 64))
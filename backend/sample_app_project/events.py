@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .room_data import project
+
+# Put on a subscriber's queue when it fell too far behind; the stream then
+# sends a fresh snapshot instead of the dropped events
+RESYNC = object()
+
+# Left out of buffered events: base64 JPEGs in every room's replay buffer
+# would take gigabytes. Live subscribers still get them
+UNBUFFERED_FIELDS = {'captured_image'}
+
+
+class ReplayBuffer:
+    """The last events of one room; every event after ``floor`` is still held"""
+
+    def __init__(self, maxlen, floor):
+        self.events = deque(maxlen=maxlen)
+        self.floor = floor
+
+    def append(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.floor = self.events[0][0]
+        self.events.append(event)
+
+
+class Subscriber:
+    def __init__(self, room_id, loop, max_queue):
+        self.room_id = room_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def deliver(self, event):
+        """Runs on the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class RoomEventHub:
+    """Per-process fan-out of room writes to server-sent event streams.
+
+    ``publish`` is called from sync code (views, queue workers, any
+    thread) and hands each event to every subscriber of the room on that
+    subscriber's event loop, so one write reaches all open dashboards
+    without further reads. The last ``replay_events`` events of each room
+    are kept, without embedded images, so a reconnecting client can resume
+    from ``Last-Event-ID``.
+
+    Event ids are ``<epoch>:<seq>``; the epoch changes with every process,
+    so ids from another process (or before a restart) are never replayed.
+    """
+
+    def __init__(self, replay_events=50, max_rooms=1024, max_queue=100):
+        self.replay_events = replay_events
+        self.max_rooms = max_rooms
+        self.max_queue = max_queue
+        self.epoch = f"{os.getpid():x}{int(time.time()):x}"
+        self._seq = 0
+        self._history = OrderedDict()
+        # Newest event dropped with a room evicted past max_rooms. A room
+        # seen again may have lost events up to here
+        self._evicted_seq = 0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._counters = {'published': 0, 'delivered': 0, 'replayed': 0, 'resyncs': 0}
+
+    @property
+    def last_seq(self):
+        with self._lock:
+            return self._seq
+
+    def event_id(self, seq):
+        return f"{self.epoch}:{seq}"
+
+    def parse_event_id(self, event_id):
+        """Sequence number of an id issued by this process, else None"""
+        epoch, _, seq = (event_id or '').partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, room_id, updates):
+        """Fan ``{capture_type: data}`` written for a room out to its subscribers"""
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, updates)
+            history = self._history.get(room_id)
+            if history is None:
+                history = self._history[room_id] = ReplayBuffer(self.replay_events, self._evicted_seq)
+            self._history.move_to_end(room_id)
+            history.append((self._seq, {
+                capture_type: project(data, exclude=UNBUFFERED_FIELDS) for capture_type, data in updates.items()
+            }))
+            while len(self._history) > self.max_rooms:
+                _, evicted = self._history.popitem(last=False)
+                self._evicted_seq = max(self._evicted_seq, evicted.events[-1][0])
+            subscribers = list(self._subscribers.get(room_id, ()))
+            self._counters['published'] += 1
+            self._counters['delivered'] += len(subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop closed; its stream unsubscribes itself
+                pass
+
+    def subscribe(self, room_id, last_event_id=None):
+        """Register the caller's loop for a room.
+
+        Returns ``(subscriber, backlog, seq)``: ``backlog`` holds the events
+        after ``last_event_id``, or is None when the client must be sent a
+        snapshot; ``seq`` is the id to tag that snapshot with.
+        """
+        subscriber = Subscriber(room_id, asyncio.get_running_loop(), self.max_queue)
+        last_seq = self.parse_event_id(last_event_id)
+        with self._lock:
+            self._subscribers.setdefault(room_id, set()).add(subscriber)
+            history = self._history.get(room_id)
+            floor = history.floor if history else self._evicted_seq
+            backlog = None
+            # Resumable only when no event of the room after last_seq was dropped
+            if last_seq is not None and last_seq >= floor:
+                backlog = [event for event in history.events if event[0] > last_seq] if history else []
+                self._counters['replayed'] += len(backlog)
+            if backlog is None:
+                self._counters['resyncs'] += 1
+            return subscriber, backlog, self._seq
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.room_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.room_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._subscribers),
+                'subscribers': sum(len(s) for s in self._subscribers.values()),
+                'buffered_rooms': len(self._history),
+                **self._counters,
+            }
+
+
+def format_event(event_id, event, data):
+    """Encode one server-sent event"""
+    payload = json.dumps(data, separators=(',', ':'), default=str)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode('utf-8')
@@ -0,0 +1,131 @@
+import csv
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from .room_data import IMAGE_FIELDS
+from .vitals_history import CANONICAL_UNITS, SERIES, record_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Columns of a "latest" export row; image fields are appended on request
+LATEST_COLUMNS = [
+    'room_id', 'capture_type', 'timestamp', 'formatted_value', 'value', 'unit',
+    'confidence', 'ocr_backend', 'raw_text',
+]
+HISTORY_COLUMNS = ['room_id', 'capture_type', 'timestamp', 'value', 'systolic', 'diastolic', 'unit']
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def latest_rows(load_room, rooms, capture_types, start=None, end=None, include_images=False):
+    """One row per stored capture record, reading one room at a time.
+
+    ``load_room(room_id)`` returns the room node; records whose timestamp
+    falls outside ``[start, end)`` are skipped.
+    """
+    for room_id in rooms:
+        room = load_room(room_id) or {}
+        for capture_type in capture_types:
+            record = room.get(capture_type)
+            if not isinstance(record, dict):
+                continue
+            if start is not None or end is not None:
+                try:
+                    ts = record_timestamp(record)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if (start is not None and ts < start) or (end is not None and ts >= end):
+                    continue
+            row = {'room_id': room_id, 'capture_type': capture_type}
+            row.update({column: record.get(column) for column in LATEST_COLUMNS[2:]})
+            if include_images:
+                row.update({field: record.get(field) for field in IMAGE_FIELDS})
+            yield row
+        # Drop the room before reading the next one
+        del room
+
+
+def history_rows(history, rooms, capture_types, start, end):
+    """Every recorded reading in ``[start, end)``, one series in memory at a time"""
+    for room_id in rooms:
+        for capture_type in capture_types:
+            if capture_type not in SERIES:
+                continue
+            data = history.load(room_id, capture_type, start, end)
+            unit = CANONICAL_UNITS[capture_type]
+            paired = len(SERIES[capture_type]) == 2
+            for ts, v0, v1 in zip(data['ts'].tolist(), data['v0'].tolist(), data['v1'].tolist()):
+                yield {
+                    'room_id': room_id,
+                    'capture_type': capture_type,
+                    'timestamp': iso(ts),
+                    'value': f"{v0:.0f}/{v1:.0f}" if paired else round(v0, 2),
+                    'systolic': round(v0, 2) if paired else None,
+                    'diastolic': round(v1, 2) if paired else None,
+                    'unit': unit,
+                }
+
+
+class ExportStats:
+    """Counts rows as they stream and logs throughput when the export ends"""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"Exported {self.rows} rows ({self.bytes} bytes) in {self.elapsed:.2f}s "
+                f"({self.rows_per_second:.0f} rows/s)")
+
+
+def ndjson_lines(rows, stats):
+    for row in rows:
+        line = (json.dumps(row, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        stats.rows += 1
+        stats.bytes += len(line)
+        yield line
+
+
+class _Line:
+    """File-like sink for csv.writer that hands back what was written"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns, stats):
+    writer = csv.DictWriter(_Line(), fieldnames=columns, extrasaction='ignore')
+    yield writer.writeheader().encode('utf-8')
+    for row in rows:
+        line = writer.writerow(row).encode('utf-8')
+        stats.rows += 1
+        stats.bytes += len(line)
+        yield line
+
+
+def encode(rows, columns, fmt, stats):
+    """Stream rows as NDJSON or CSV bytes, logging throughput once exhausted"""
+    lines = ndjson_lines(rows, stats) if fmt == 'ndjson' else csv_lines(rows, columns, stats)
+    try:
+        yield from lines
+    finally:
+        logger.info(f"{stats.label}: {stats.summary()}")
@@ -0,0 +1,174 @@
+import re
+from collections import namedtuple
+
+
+class Extraction(namedtuple('Extraction', ['capture_type', 'value', 'unit', 'span'])):
+    """A reading found in OCR text.
+
+    ``value`` is the normalized number as text (``'36.5'``, ``'120/80'``) so
+    no precision is lost, ``unit`` is the display unit and ``span`` the
+    ``(start, end)`` offsets of the match in the OCR text.
+    """
+
+    __slots__ = ()
+
+    def format(self):
+        if self.capture_type == 'endoscope':
+            return "Endoscopic data captured"
+        if self.capture_type == 'temperature':
+            return f"{self.value}{self.unit}"
+        return f"{self.value} {self.unit}"
+
+    def numbers(self):
+        """Numeric components of the value, e.g. ``(120.0, 80.0)`` for blood pressure"""
+        if self.capture_type == 'endoscope':
+            return ()
+        return tuple(float(part) for part in self.value.split('/'))
+
+
+def normalize_decimal(raw):
+    """Normalize a number string so '.' is the decimal separator.
+
+    A lone comma is a decimal comma. When both separators appear, the last
+    one is the decimal point and the others are thousands separators.
+    """
+    cut = max(raw.rfind(','), raw.rfind('.'))
+    if cut < 0:
+        return raw
+    head = raw[:cut]
+    if ',' in head or '.' in head:
+        head = head.replace(',', '').replace('.', '')
+    return f"{head}.{raw[cut + 1:]}"
+
+
+class VitalExtractor:
+    """Precompiled extractor for one numeric capture type.
+
+    The pattern must define a ``num`` group matching a whole number token
+    and may define a ``unit`` group; ``units`` maps a lower-cased unit as
+    read by OCR to its display form. Numbers with more than ``int_digits``
+    before the decimal point are rejected and decimals past ``decimals``
+    are truncated, as the device displays would. Matches outside
+    ``valid_range`` (memory slots, a scale idling at 0.0) are skipped in
+    favour of the next candidate.
+    """
+
+    def __init__(self, capture_type, pattern, default_unit, int_digits=None, decimals=None, units=None,
+                 valid_range=None):
+        self.capture_type = capture_type
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.default_unit = default_unit
+        self.int_digits = int_digits
+        self.decimals = decimals
+        self.units = units or {}
+        self.valid_range = valid_range
+
+    def extract(self, text):
+        for match in self.pattern.finditer(text):
+            value = self.parse(match)
+            if value is not None:
+                unit = match.group('unit') if 'unit' in self.pattern.groupindex else None
+                unit = self.units.get(unit.lower(), self.default_unit) if unit else self.default_unit
+                return Extraction(self.capture_type, value, unit, match.span())
+        return None
+
+    def parse(self, match):
+        value = self.truncate(normalize_decimal(match.group('num')))
+        if value is None:
+            return None
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        if self.valid_range and not self.valid_range[0] <= number <= self.valid_range[1]:
+            return None
+        return value
+
+    def truncate(self, value):
+        whole, _, fraction = value.partition('.')
+        if self.int_digits is not None and len(whole) > self.int_digits:
+            return None
+        if self.decimals is not None:
+            fraction = fraction[:self.decimals]
+        return f"{whole}.{fraction}" if fraction else whole
+
+
+class BloodPressureExtractor(VitalExtractor):
+    """Systolic/diastolic pair such as ``120/80 mmHg``"""
+
+    def __init__(self):
+        super().__init__(
+            'blood_pressure',
+            r"\b(?P<sys>\d{2,3})[/\-](?P<dia>\d{2,3})\s*(?P<unit>mmHg)?\b",
+            'mmHg',
+        )
+
+    def parse(self, match):
+        systolic, diastolic = int(match.group('sys')), int(match.group('dia'))
+        # Dates such as 2026-03-14 also look like pairs; a reading needs sys > dia
+        if not (50 <= systolic <= 300 and 20 <= diastolic < systolic):
+            return None
+        return f"{match.group('sys')}/{match.group('dia')}"
+
+
+class EndoscopeExtractor:
+    """Endoscope captures only need some text; the first non-blank line is kept"""
+
+    capture_type = 'endoscope'
+    pattern = re.compile(r"\S[^\n]*")
+
+    def extract(self, text):
+        match = self.pattern.search(text)
+        if match is None:
+            return None
+        return Extraction(self.capture_type, match.group().rstrip(), '', match.span())
+
+
+# A whole number token, thousands and decimal separators included.
+# Numbers glued to ':' are clock readings, never vitals. The lookarounds
+# also refuse to start or end next to a separator followed by a digit,
+# so the engine cannot backtrack to a prefix such as '36' of '36.555'.
+NUMBER = r"(?<![\d:])(?<!\d[,.])(?P<num>\d+(?:[,.]\d+)*)(?![\d:]|[,.]\d)"
+
+EXTRACTORS = {
+    'temperature': VitalExtractor(
+        'temperature',
+        NUMBER + r"(?:[ \t]?(?P<unit>°[CF]?|℃|[CF](?![a-z])))?",
+        '°C',
+        int_digits=3,
+        decimals=2,
+        units={'f': '°F', '°f': '°F'},
+        # Celsius or Fahrenheit body temperatures
+        valid_range=(25, 115),
+    ),
+    'weight': VitalExtractor(
+        'weight',
+        NUMBER + r"(?:[ \t]?(?P<unit>kg))?",
+        'Kg',
+        int_digits=4,
+        decimals=3,
+        valid_range=(0.5, 500),
+    ),
+    'glucose': VitalExtractor(
+        'glucose',
+        NUMBER + r"(?:[ \t]?(?P<unit>mg/dL|mmol/L))?",
+        'mg/dL',
+        int_digits=4,
+        decimals=2,
+        units={'mmol/l': 'mmol/L'},
+        # mmol/L or mg/dL
+        valid_range=(1, 1000),
+    ),
+    'blood_pressure': BloodPressureExtractor(),
+    'endoscope': EndoscopeExtractor(),
+}
+
+
+def extract(text, capture_type):
+    """Return the first valid reading of ``capture_type`` in ``text``, or None"""
+    extractor = EXTRACTORS.get(capture_type)
+    if extractor is None:
+        raise ValueError(f"Unknown capture type: {capture_type}")
+    if not text or text == "No text found":
+        return None
+    return extractor.extract(text)
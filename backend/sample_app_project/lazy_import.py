@@ -0,0 +1,68 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use (or by warm_up) instead of when the views load;
+# together they are most of a cold start
+HEAVY_MODULES = [
+    'firebase_admin',
+    'firebase_admin.credentials',
+    'firebase_admin.db',
+    'google.cloud.vision',
+    'numpy',
+    'PIL.Image',
+    'PIL.ImageOps',
+]
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access.
+
+    ``db = LazyModule('firebase_admin.db')`` keeps ``db.reference(...)``
+    call sites unchanged while moving the import cost to the first request
+    that needs it.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self.__dict__['_name'])
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def warm_up(modules=None, then=None):
+    """Import the heavy modules, then run ``then`` (e.g. service initialization).
+
+    Meant for a post-fork hook: the worker serves requests such as
+    ``/health/`` while this runs, and the first OCR request finds the stack
+    already loaded.
+    """
+    started = time.perf_counter()
+    for name in modules or HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Warm-up could not import {name}: {str(e)}")
+    if then is not None:
+        then()
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def warm_up_in_background(modules=None, then=None):
+    thread = threading.Thread(target=warm_up, args=(modules, then), name='warm-up', daemon=True)
+    thread.start()
+    return thread
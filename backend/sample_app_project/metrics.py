@@ -0,0 +1,226 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+from django.conf import settings
+
+# Stage timer of the request being handled, or None when nothing is measured
+_timer = contextvars.ContextVar('stage_timer', default=None)
+
+# Upper bounds in seconds, from a fast-path read to a slow Vision call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+class StageTimer:
+    """Per-request stage durations, in the order the stages first ran"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.labels = {}
+
+    def add(self, name, seconds):
+        # Repeated stages (e.g. one Firebase write per batch item) accumulate
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(parts)
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """``with stage('decode'):`` times a block for the current request; free when not measuring"""
+    timer = _timer.get()
+    return _NULL_STAGE if timer is None else _Stage(timer, name)
+
+
+def record_stage(name, milliseconds):
+    """Record a duration that was already measured elsewhere (e.g. preprocessing stats)"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(name, milliseconds / 1000)
+
+
+def label(**labels):
+    """Attach metric labels, such as the capture type, to the current request"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.labels.update(labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in sorted(self._series.items())]
+        for values, counts, total in series:
+            labels = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """Latency histograms per endpoint and capture type, whole requests and stages"""
+
+    def __init__(self):
+        self.requests = Histogram(
+            'telehealth_request_duration_seconds', 'Request latency by endpoint, capture type and status.',
+            ('endpoint', 'capture_type', 'status')
+        )
+        self.stages = Histogram(
+            'telehealth_stage_duration_seconds', 'Time spent per request stage.',
+            ('endpoint', 'capture_type', 'stage')
+        )
+
+    def observe(self, endpoint, timer, status, total):
+        capture_type = timer.labels.get('capture_type', '')
+        self.requests.observe((endpoint, capture_type, str(status)), total)
+        for name, seconds in timer.stages.items():
+            self.stages.observe((endpoint, capture_type, name), seconds)
+
+    def render(self, breakers=None):
+        """Prometheus text exposition of the histograms and upstream breaker state"""
+        lines = self.requests.render() + self.stages.render()
+        if breakers:
+            lines += render_breakers(breakers)
+        return '\n'.join(lines) + '\n'
+
+
+def render_breakers(breakers):
+    gauges = [
+        ('telehealth_upstream_circuit_state', 'gauge',
+         'Circuit breaker state (0 closed, 1 half-open, 2 open).',
+         lambda stats: CIRCUIT_STATES.get(stats['state'], 0)),
+        ('telehealth_upstream_calls_total', 'counter', 'Calls let through the breaker.',
+         lambda stats: stats['calls']),
+        ('telehealth_upstream_failures_total', 'counter', 'Transient upstream failures.',
+         lambda stats: stats['failures']),
+        ('telehealth_upstream_retries_total', 'counter', 'Retried upstream calls.',
+         lambda stats: stats['retries']),
+        ('telehealth_upstream_rejected_total', 'counter', 'Calls refused while the breaker was open.',
+         lambda stats: stats['rejected']),
+    ]
+    lines = []
+    for name, kind, help_text, value in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for upstream, stats in sorted(breakers.items()):
+            lines.append(f'{name}{{upstream="{escape(upstream)}"}} {value(stats)}')
+    return lines
+
+
+request_metrics = RequestMetrics()
+
+
+def measuring():
+    return settings.METRICS_ENABLED or settings.SERVER_TIMING_ENABLED
+
+
+def finish(endpoint, timer, response):
+    total = time.perf_counter() - timer.started
+    if settings.SERVER_TIMING_ENABLED:
+        response['Server-Timing'] = timer.server_timing(total)
+    if settings.METRICS_ENABLED:
+        request_metrics.observe(endpoint, timer, response.status_code, total)
+    return response
+
+
+def timed(endpoint):
+    """View decorator: time stages, add a ``Server-Timing`` header and feed the histograms.
+
+    Works for sync and async views. When both metrics and Server-Timing
+    are off the view runs as is, and every ``stage()`` inside it is a
+    shared no-op.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not measuring():
+                    return await view(request, *args, **kwargs)
+                timer = StageTimer()
+                token = _timer.set(timer)
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    _timer.reset(token)
+                return finish(endpoint, timer, response)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not measuring():
+                return view(request, *args, **kwargs)
+            timer = StageTimer()
+            token = _timer.set(timer)
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                _timer.reset(token)
+            return finish(endpoint, timer, response)
+        return wrapper
+    return decorator
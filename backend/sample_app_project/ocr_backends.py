@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import io
+import logging
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .lazy_import import LazyModule
+from .resilience import check_deadline, remaining
+
+logger = logging.getLogger(__name__)
+
+vision = LazyModule('google.cloud.vision')
+Image = LazyModule('PIL.Image')
+
+# box is a list of (x, y) vertices in image pixels
+WordBox = namedtuple('WordBox', ['text', 'box'])
+OCRText = namedtuple('OCRText', ['text', 'words'])
+
+# Vision accepts at most this many images per synchronous batch request,
+# so it is also the most images one batch upload may carry
+BATCH_LIMIT = 16
+
+
+class OCRBackendError(Exception):
+    """Raised (or returned per image from a batch) when a backend cannot read an image"""
+
+
+class OCRBackend:
+    """Interface for text detection engines.
+
+    ``detect_text`` returns an :class:`OCRText` with the full text and the
+    word boxes. ``detect_text_batch`` returns one entry per image, in
+    order, each an :class:`OCRText` or an :class:`OCRBackendError`.
+    ``detect_text_async`` is the awaitable form used by async views.
+    """
+
+    name = None
+    # Whether blocking detect_text calls burn CPU (vs waiting on the network)
+    cpu_bound = False
+
+    def detect_text(self, image_bytes):
+        raise NotImplementedError
+
+    async def detect_text_async(self, image_bytes, executor=None):
+        """Engines without an async client run ``detect_text`` on ``executor``"""
+        return await sync_to_async(self.detect_text, thread_sensitive=False, executor=executor)(image_bytes)
+
+    def detect_text_batch(self, images):
+        results = []
+        for image_bytes in images:
+            try:
+                results.append(self.detect_text(image_bytes))
+            except OCRBackendError as e:
+                results.append(e)
+        return results
+
+
+class GoogleVisionBackend(OCRBackend):
+    """Google Cloud Vision document text detection"""
+
+    name = 'google'
+
+    def __init__(self, get_client, get_async_client=None):
+        # The clients are created by initialize_services, so look them up per call
+        self.get_client = get_client
+        self.get_async_client = get_async_client
+
+    def client(self):
+        client = self.get_client()
+        if not client:
+            raise OCRBackendError("Vision client not initialized")
+        return client
+
+    @staticmethod
+    def call_options():
+        """Per-call timeout from the current request's deadline budget"""
+        left = remaining()
+        return {} if left is None else {'timeout': max(left, 0.1)}
+
+    @staticmethod
+    def to_ocr_text(response):
+        texts = response.text_annotations
+        words = [
+            WordBox(t.description, [(v.x, v.y) for v in t.bounding_poly.vertices])
+            for t in texts[1:]
+        ]
+        return OCRText(texts[0].description if texts else '', words)
+
+    def detect_text(self, image_bytes):
+        image = vision.Image(content=image_bytes)
+        response = self.client().document_text_detection(image=image, **self.call_options())
+
+        if response.error.message:
+            raise OCRBackendError(f"Vision API error: {response.error.message}")
+        return self.to_ocr_text(response)
+
+    async def detect_text_async(self, image_bytes, executor=None):
+        client = self.get_async_client() if self.get_async_client else None
+        if client is None:
+            return await super().detect_text_async(image_bytes, executor)
+
+        # The async client has no document_text_detection helper
+        batch = await client.batch_annotate_images(
+            requests=self.annotate_requests([image_bytes]), **self.call_options()
+        )
+        response = batch.responses[0]
+        if response.error.message:
+            raise OCRBackendError(f"Vision API error: {response.error.message}")
+        return self.to_ocr_text(response)
+
+    @staticmethod
+    def annotate_requests(images):
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        return [
+            vision.AnnotateImageRequest(image=vision.Image(content=image_bytes), features=[feature])
+            for image_bytes in images
+        ]
+
+    def detect_text_batch(self, images):
+        client = self.client()
+        results = []
+        for start in range(0, len(images), BATCH_LIMIT):
+            requests = self.annotate_requests(images[start:start + BATCH_LIMIT])
+            batch = client.batch_annotate_images(requests=requests, **self.call_options())
+            for response in batch.responses:
+                if response.error.message:
+                    results.append(OCRBackendError(f"Vision API error: {response.error.message}"))
+                else:
+                    results.append(self.to_ocr_text(response))
+        return results
+
+
+class TesseractBackend(OCRBackend):
+    """Local CPU OCR through Tesseract (needs the ``pytesseract`` package and binary).
+
+    ``--psm 6`` treats the crop as one block of text, which suits device
+    displays; digits and units are whitelisted to cut misreads.
+    """
+
+    name = 'tesseract'
+    cpu_bound = True
+    DEFAULT_CONFIG = "--psm 6 -c tessedit_char_whitelist=0123456789.,/-°CFckgKGmMLlodD%:"
+
+    def __init__(self, config=None):
+        try:
+            import pytesseract
+        except ImportError:
+            raise ImproperlyConfigured("The tesseract OCR backend requires the pytesseract package")
+        self.pytesseract = pytesseract
+        self.config = config if config is not None else self.DEFAULT_CONFIG
+
+    def detect_text(self, image_bytes):
+        # Checked first: pytesseract reads a timeout of 0 as no limit at all
+        left = check_deadline(self.name)
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                data = self.pytesseract.image_to_data(
+                    img, config=self.config, output_type=self.pytesseract.Output.DICT,
+                    timeout=left or 0
+                )
+        except Exception as e:
+            # Killed at the timeout: report the spent budget, not a bad image
+            check_deadline(self.name)
+            raise OCRBackendError(f"Tesseract error: {str(e)}")
+
+        words = []
+        lines = {}
+        for i, text in enumerate(data['text']):
+            text = text.strip()
+            if not text:
+                continue
+            left, top = data['left'][i], data['top'][i]
+            right, bottom = left + data['width'][i], top + data['height'][i]
+            words.append(WordBox(text, [(left, top), (right, top), (right, bottom), (left, bottom)]))
+            line = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(line, []).append(text)
+        return OCRText('\n'.join(' '.join(parts) for parts in lines.values()), words)
+
+
+class FakeBackend(OCRBackend):
+    """Deterministic stand-in for tests and benchmarks.
+
+    Images whose sha256 is in ``responses`` get that text; anything else
+    gets ``text``. ``latency`` seconds are slept per call to mimic a
+    remote engine.
+    """
+
+    name = 'fake'
+
+    def __init__(self, text="36.5 °C", responses=None, latency=0.0):
+        self.text = text
+        self.responses = responses or {}
+        self.latency = latency
+
+    def detect_text(self, image_bytes):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.read(image_bytes)
+
+    async def detect_text_async(self, image_bytes, executor=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.read(image_bytes)
+
+    def read(self, image_bytes):
+        text = self.responses.get(hashlib.sha256(image_bytes).hexdigest(), self.text)
+        return OCRText(text, [WordBox(word, []) for word in text.split()])
+
+
+BACKEND_CLASSES = {
+    'google': GoogleVisionBackend,
+    'tesseract': TesseractBackend,
+    'fake': FakeBackend,
+}
+
+
+def backend_names():
+    """Backend name configured for each capture type, plus the default"""
+    names = {'default': getattr(settings, 'OCR_BACKEND', 'google')}
+    names.update(getattr(settings, 'OCR_BACKEND_OVERRIDES', {}))
+    return names
+
+
+def needs_vision():
+    return 'google' in backend_names().values()
+
+
+def build_backends(get_vision_client, get_vision_async_client=None):
+    """Instantiate the configured backends, sharing one instance per name"""
+    options = getattr(settings, 'OCR_BACKEND_OPTIONS', {})
+    instances = {}
+    backends = {}
+    for capture_type, name in backend_names().items():
+        if name not in instances:
+            if name == 'google':
+                instances[name] = GoogleVisionBackend(get_vision_client, get_vision_async_client)
+            else:
+                backend_class = BACKEND_CLASSES.get(name) or import_string(name)
+                instances[name] = backend_class(**options.get(name, {}))
+            logger.info(f"OCR backend '{name}' ready")
+        backends[capture_type] = instances[name]
+    return backends
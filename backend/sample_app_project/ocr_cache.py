@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OCRResultCache:
+    """Content-addressed cache of OCR results.
+
+    Entries are keyed on a digest of the normalized JPEG bytes plus the
+    capture type. A bounded in-memory LRU sits in front of an optional
+    on-disk tier that several worker processes can share.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_bytes, capture_type, digest=None):
+        """Cache key for an image; pass ``digest`` when the sha256 is already known"""
+        return f"{capture_type}-{digest or hashlib.sha256(image_bytes).hexdigest()}"
+
+    def get(self, key):
+        """Return a copy of the cached result, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return dict(result)
+                del self._entries[key]
+                self._counters['expired'] += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._remember(key, *entry)
+        return dict(entry[1])
+
+    def set(self, key, result):
+        stored_at = time.time()
+        result = dict(result)
+        with self._lock:
+            self._remember(key, stored_at, result)
+        self._write_disk(key, stored_at, result)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['disk_hits'] + self._counters['misses']
+            hits = self._counters['hits'] + self._counters['disk_hits']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk_tier': bool(self.disk_dir),
+                'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+                **self._counters,
+            }
+
+    def _remember(self, key, stored_at, result):
+        """Insert into the LRU (caller holds the lock)"""
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _disk_path(self, key):
+        digest = key.rsplit('-', 1)[-1]
+        return os.path.join(self.disk_dir, digest[:2], f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable OCR cache entry {path}: {str(e)}")
+            return None
+        if now - entry['stored_at'] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['stored_at'], entry['result']
+
+    def _write_disk(self, key, stored_at, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial JSON
+            with tempfile.NamedTemporaryFile(
+                'w', dir=os.path.dirname(path), suffix='.tmp', delete=False
+            ) as f:
+                json.dump({'stored_at': stored_at, 'result': result}, f)
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning(f"Could not write OCR cache entry {path}: {str(e)}")
+
+
+def build_ocr_cache():
+    """Create the OCR result cache configured in settings"""
+    return OCRResultCache(
+        max_entries=getattr(settings, 'OCR_CACHE_MAX_ENTRIES', 256),
+        ttl=getattr(settings, 'OCR_CACHE_TTL_SECONDS', 3600),
+        disk_dir=getattr(settings, 'OCR_CACHE_DIR', None) or None,
+    )
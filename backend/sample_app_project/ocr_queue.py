@@ -0,0 +1,239 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class OCRJob:
+    """A single queued OCR request and its outcome"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = self.PENDING
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def to_dict(self):
+        def iso(ts):
+            return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'enqueued_at': iso(self.enqueued_at),
+            'started_at': iso(self.started_at),
+            'finished_at': iso(self.finished_at),
+        }
+
+
+class JobQueue:
+    """Interface for OCR job queues.
+
+    A queue is constructed with a ``handler(job)`` callable that performs the
+    work and returns the job result. Implementations decide where jobs wait
+    and which process runs them.
+    """
+
+    def __init__(self, handler, maxsize=100, workers=2, job_ttl=600):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self.job_ttl = job_ttl
+
+    def start(self):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
+
+    def submit(self, payload):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def metrics(self):
+        raise NotImplementedError
+
+    def _execute(self, job):
+        """Run the handler for a job and record its outcome"""
+        job.status = OCRJob.RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = self.handler(job)
+            job.status = OCRJob.DONE
+        except Exception as e:
+            logger.error(f"OCR job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = OCRJob.FAILED
+        finally:
+            job.finished_at = time.time()
+            # Drop the image bytes as soon as the job is done
+            job.payload = None
+
+
+class InProcessJobQueue(JobQueue):
+    """Bounded in-memory queue drained by a pool of daemon worker threads.
+
+    Job state lives in this process only, so with several gunicorn workers a
+    status lookup must reach the worker that accepted the job.
+    """
+
+    def __init__(self, handler, maxsize=100, workers=2, job_ttl=600):
+        super().__init__(handler, maxsize=maxsize, workers=workers, job_ttl=job_ttl)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs = OrderedDict()
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._busy = 0
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"ocr-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"OCR job queue started with {self.workers} workers")
+
+    def shutdown(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def submit(self, payload):
+        job = OCRJob(payload)
+        with self._lock:
+            self._prune()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counters['rejected'] += 1
+                raise QueueFull(f"OCR queue is full ({self.maxsize} jobs pending)")
+            self._jobs[job.id] = job
+            self._pending[job.id] = job.enqueued_at
+            self._counters['submitted'] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def metrics(self):
+        now = time.time()
+        with self._lock:
+            oldest = next(iter(self._pending.values()), None)
+            finished = self._counters['completed'] + self._counters['failed']
+            return {
+                'backend': type(self).__name__,
+                'depth': self._queue.qsize(),
+                'capacity': self.maxsize,
+                'workers': len(self._threads),
+                'busy_workers': self._busy,
+                'oldest_pending_age_seconds': round(now - oldest, 3) if oldest else 0.0,
+                'avg_wait_seconds': round(self._wait_total / finished, 3) if finished else 0.0,
+                'avg_run_seconds': round(self._run_total / finished, 3) if finished else 0.0,
+                'tracked_jobs': len(self._jobs),
+                **self._counters,
+            }
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._pending.pop(job.id, None)
+                self._busy += 1
+            try:
+                self._execute(job)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._counters['completed' if job.status == OCRJob.DONE else 'failed'] += 1
+                    self._wait_total += job.started_at - job.enqueued_at
+                    self._run_total += job.finished_at - job.started_at
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+            elif not job.finished:
+                # Jobs are ordered by submission; stop at the first live one
+                break
+
+
+class SynchronousJobQueue(InProcessJobQueue):
+    """Stand-in queue that runs each job inline on submit (dev and tests)"""
+
+    def start(self):
+        pass
+
+    def submit(self, payload):
+        job = OCRJob(payload)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._counters['submitted'] += 1
+        self._execute(job)
+        with self._lock:
+            self._counters['completed' if job.status == OCRJob.DONE else 'failed'] += 1
+            self._run_total += job.finished_at - job.started_at
+        return job
+
+
+def build_job_queue(handler):
+    """Create the job queue configured in settings and start its workers"""
+    queue_class = import_string(getattr(
+        settings, 'OCR_QUEUE_BACKEND', 'sample_app_project.ocr_queue.InProcessJobQueue'
+    ))
+    job_queue = queue_class(
+        handler,
+        maxsize=getattr(settings, 'OCR_QUEUE_MAXSIZE', 100),
+        workers=getattr(settings, 'OCR_QUEUE_WORKERS', 2),
+        job_ttl=getattr(settings, 'OCR_JOB_TTL_SECONDS', 600),
+    )
+    job_queue.start()
+    return job_queue
@@ -0,0 +1,244 @@
+import fcntl
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .resilience import is_permanent
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_id TEXT NOT NULL,
+    capture_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS outbox_room ON outbox (room_id)"
+# Rows Firebase refused for good (invalid path, permission denied), kept
+# with the error so they can be inspected instead of blocking every room
+DEAD_LETTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox_dead (
+    id INTEGER PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    capture_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    error TEXT NOT NULL
+)
+"""
+
+
+class FirebaseOutbox:
+    """Durable write-behind queue for room writes.
+
+    Writes are committed to a local SQLite file and acknowledged
+    immediately. A background flusher groups pending rows by room, keeps
+    the newest record per capture type and applies each room as one
+    multi-path ``update()`` via ``writer(room_id, updates)``. Rows are only
+    deleted once Firebase accepted them, so anything left in the file when
+    the process dies is replayed by the next flusher. A room Firebase
+    rejects for good is moved to the ``outbox_dead`` table and the other
+    rooms keep flushing; transient failures stop the batch so the flusher
+    backs off.
+
+    Every worker process can enqueue, but only the process holding the
+    file lock flushes, so writes for a room are never reordered.
+    """
+
+    def __init__(self, path, writer, flush_interval=0.5, batch_size=500, max_backoff=60.0):
+        self.path = path
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._stats_lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'flushed_rows': 0, 'coalesced_rows': 0,
+                          'room_updates': 0, 'failures': 0, 'dead_lettered': 0}
+        self._last_error = None
+        self._last_flush_at = None
+        self._backoff = 0.0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            conn.execute(INDEX)
+            conn.execute(DEAD_LETTER_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, room_id, updates):
+        """Durably record ``{capture_type: data}`` writes for a room"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO outbox (room_id, capture_type, payload, created_at) VALUES (?, ?, ?, ?)',
+                [(room_id, capture_type, json.dumps(data), now) for capture_type, data in updates.items()]
+            )
+        with self._stats_lock:
+            self._counters['enqueued'] += len(updates)
+        self._wakeup.set()
+
+    def has_pending(self, room_id):
+        """Whether writes for a room are still waiting to reach Firebase"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT 1 FROM outbox WHERE room_id = ? LIMIT 1', (room_id,)).fetchone()
+        return row is not None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='firebase-outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush(self):
+        """Flush one batch; returns the number of rows written to Firebase"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id, room_id, capture_type, payload FROM outbox ORDER BY id LIMIT ?',
+                (self.batch_size,)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        rooms = {}
+        for row_id, room_id, capture_type, payload in rows:
+            ids, updates = rooms.setdefault(room_id, ([], {}))
+            ids.append(row_id)
+            # Later rows win: only the newest record per capture type is sent
+            updates[capture_type] = payload
+
+        written = 0
+        for room_id, (ids, updates) in rooms.items():
+            try:
+                self.writer(room_id, {k: json.loads(v) for k, v in updates.items()})
+            except Exception as e:
+                if not is_permanent(e):
+                    raise
+                self._dead_letter(room_id, ids, e)
+                continue
+            with self._connect() as conn:
+                conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+            written += len(ids)
+            with self._stats_lock:
+                self._counters['flushed_rows'] += len(ids)
+                self._counters['coalesced_rows'] += len(ids) - len(updates)
+                self._counters['room_updates'] += 1
+        self._last_flush_at = time.time()
+        return written
+
+    def _dead_letter(self, room_id, ids, error):
+        """Move a room's rows out of the queue after Firebase refused them for good"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO outbox_dead (id, room_id, capture_type, payload, created_at, failed_at, error) '
+                'SELECT id, room_id, capture_type, payload, created_at, ?, ? FROM outbox WHERE id = ?',
+                [(now, str(error), i) for i in ids]
+            )
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+        with self._stats_lock:
+            self._counters['dead_lettered'] += len(ids)
+        logger.error(f"Firebase rejected {len(ids)} outbox rows for room {room_id}, moved to outbox_dead: {str(error)}")
+
+    def stats(self):
+        with self._connect() as conn:
+            pending, oldest = conn.execute('SELECT COUNT(*), MIN(created_at) FROM outbox').fetchone()
+            dead = conn.execute('SELECT COUNT(*) FROM outbox_dead').fetchone()[0]
+        with self._stats_lock:
+            return {
+                'pending': pending,
+                'dead_letter': dead,
+                'lag_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+                'flusher': self._lock_file is not None,
+                'backoff_seconds': round(self._backoff, 2),
+                'last_error': self._last_error,
+                'last_flush_at': self._last_flush_at,
+                **self._counters,
+            }
+
+    def _acquire_flusher_lock(self):
+        lock_file = open(f"{self.path}.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Firebase outbox flusher running in pid {os.getpid()}")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._lock_file is None and not self._acquire_flusher_lock():
+                # Another process flushes; check again later in case it exits
+                self._stop.wait(5)
+                continue
+            try:
+                while self.flush() >= self.batch_size:
+                    pass
+                self._backoff = 0.0
+                self._last_error = None
+            except Exception as e:
+                with self._stats_lock:
+                    self._counters['failures'] += 1
+                self._last_error = str(e)
+                self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+                delay = self._backoff * random.uniform(0.5, 1.0)
+                logger.error(f"Firebase outbox flush failed, retrying in {delay:.1f}s: {str(e)}")
+                self._stop.wait(delay)
+                continue
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+
+def outbox_path():
+    return getattr(settings, 'OUTBOX_PATH', 'outbox.sqlite3')
+
+
+def pending_rows(path):
+    """Rows waiting in the outbox file at ``path``; 0 when there is no outbox yet"""
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+    except sqlite3.OperationalError:
+        # The file exists but the table was never created
+        return 0
+    finally:
+        conn.close()
+
+
+def build_outbox(writer):
+    """Create the outbox configured in settings"""
+    return FirebaseOutbox(
+        outbox_path(),
+        writer,
+        flush_interval=getattr(settings, 'OUTBOX_FLUSH_INTERVAL', 0.5),
+    )
@@ -0,0 +1,150 @@
+import io
+import logging
+import time
+
+from django.conf import settings
+
+from .lazy_import import LazyModule
+from .upload_handlers import UploadRejected, max_upload_pixels
+
+logger = logging.getLogger(__name__)
+
+Image = LazyModule('PIL.Image')
+ImageOps = LazyModule('PIL.ImageOps')
+
+# Longest edge sent to OCR per capture type. Seven-segment displays read fine
+# at 1024px; endoscope frames keep more detail for the doctor
+MAX_EDGE = {
+    'temperature': 1024,
+    'weight': 1024,
+    'glucose': 1024,
+    'blood_pressure': 1280,
+    'endoscope': 2048,
+}
+DEFAULT_MAX_EDGE = 1600
+
+EXIF_ORIENTATION = 0x0112
+
+# JPEG segments that may be passed through: the JFIF and Adobe headers. EXIF,
+# XMP and comment segments can carry GPS positions, device serial numbers
+# and timestamps, so JPEGs with them are re-encoded without them
+PASSTHROUGH_SEGMENTS = {'APP0', 'APP14'}
+
+
+def has_metadata(img):
+    """Whether a decoded JPEG carries segments other than its JFIF/Adobe header"""
+    return any(marker not in PASSTHROUGH_SEGMENTS for marker, _ in getattr(img, 'applist', ()))
+
+
+def parse_roi(value):
+    """Parse a client region of interest ``"x,y,w,h"`` given as fractions of the image.
+
+    Returns a ``(left, top, right, bottom)`` box in fractions, or None.
+    """
+    if not value:
+        return None
+    try:
+        x, y, w, h = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError(f"Invalid roi '{value}': expected x,y,w,h fractions")
+    if not (0 <= x < 1 and 0 <= y < 1 and 0 < w <= 1 - x and 0 < h <= 1 - y):
+        raise ValueError(f"Invalid roi '{value}': box must lie within the image")
+    return x, y, x + w, y + h
+
+
+def upload_size(image_file):
+    size = getattr(image_file, 'size', None)
+    if size is None:
+        image_file.seek(0, io.SEEK_END)
+        size = image_file.tell()
+        image_file.seek(0)
+    return size
+
+
+def preprocess_image(image_file, capture_type, roi=None):
+    """Prepare an upload for OCR.
+
+    Pillow reads straight from the upload handle, so the original bytes are
+    only copied into memory when they are passed through unchanged. The
+    pixel limit is checked from the header before anything is decoded.
+    Large JPEGs are decoded at reduced size (draft mode), EXIF orientation is
+    applied, the optional ROI is cropped and the longest edge capped for the
+    capture type. A JPEG that already fits the budget, needs no rotation or
+    crop and carries no metadata is passed through without decoding or
+    re-encoding; everything else is re-encoded without EXIF, XMP or comments.
+
+    Returns ``(jpeg_bytes, stats)``. ``stats['upload_copies']`` counts the
+    full-size in-memory copies of the upload made here.
+    """
+    bytes_in = upload_size(image_file)
+    max_edge = MAX_EDGE.get(capture_type, DEFAULT_MAX_EDGE)
+    max_pixels = max_upload_pixels(capture_type)
+    budget = getattr(settings, 'IMAGE_PASSTHROUGH_MAX_BYTES', 500_000)
+    stats = {
+        'bytes_in': bytes_in,
+        'decode_ms': 0.0,
+        'encode_ms': 0.0,
+        'reencoded': True,
+        'upload_copies': 0,
+    }
+
+    try:
+        started = time.perf_counter()
+        image_file.seek(0)
+        with Image.open(image_file) as img:
+            width, height = img.size
+            stats['source_size'] = [width, height]
+            if width * height > max_pixels:
+                raise UploadRejected(
+                    f"{capture_type} image is {width}x{height}; the limit is {max_pixels} pixels"
+                )
+            orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+
+            if (img.format == 'JPEG' and roi is None and orientation == 1
+                    and img.mode in ('RGB', 'L') and max(img.size) <= max_edge
+                    and bytes_in <= budget and not has_metadata(img)):
+                image_file.seek(0)
+                raw = image_file.read()
+                stats.update(
+                    reencoded=False, bytes_out=len(raw), size=[width, height], upload_copies=1,
+                    # Identical bytes go to OCR, so the upload hash is reusable
+                    sha256=getattr(image_file, 'sha256', None)
+                )
+                return raw, stats
+
+            if img.format == 'JPEG':
+                # Let libjpeg scale by 1/2, 1/4 or 1/8 while decoding; the
+                # result is still at least max_edge on its longest side
+                img.draft('RGB', (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+
+            if roi is not None:
+                width, height = img.size
+                left, top, right, bottom = roi
+                img = img.crop((
+                    round(left * width), round(top * height),
+                    round(right * width), round(bottom * height)
+                ))
+            if max(img.size) > max_edge:
+                img.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            stats['decode_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+            started = time.perf_counter()
+            out = io.BytesIO()
+            # Pillow carries a source comment over unless told otherwise
+            img.save(out, format='JPEG', quality=90, comment=b'')
+            stats['encode_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            stats['size'] = list(img.size)
+    except UploadRejected:
+        raise
+    except Image.DecompressionBombError as e:
+        # Pillow's own pixel guard, for headers past twice MAX_IMAGE_PIXELS
+        raise UploadRejected(f"{capture_type} image is too large: {e}")
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {str(e)}")
+
+    image_bytes = out.getvalue()
+    stats['bytes_out'] = len(image_bytes)
+    return image_bytes, stats
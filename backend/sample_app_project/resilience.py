@@ -0,0 +1,291 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current request (or job) must finish
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+# Upstream status codes worth retrying: HTTP codes from google-api-core
+# errors, gRPC/Firebase code names from firebase_admin errors
+TRANSIENT_CODES = {
+    429, 500, 502, 503, 504,
+    'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'RESOURCE_EXHAUSTED', 'UNKNOWN',
+}
+
+# Codes that fail the same way on every retry: the request itself is
+# refused. Authentication errors are left out on purpose, they usually
+# mean the whole service is misconfigured rather than one write is bad
+PERMANENT_CODES = {
+    400, 403, 404,
+    'INVALID_ARGUMENT', 'PERMISSION_DENIED', 'NOT_FOUND', 'FAILED_PRECONDITION', 'OUT_OF_RANGE',
+}
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before a stage could start or finish"""
+
+
+class CircuitOpen(Exception):
+    """An upstream's breaker is open; callers should fail fast or degrade"""
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"{upstream} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+@contextmanager
+def deadline(seconds):
+    """Give the enclosed work a budget of ``seconds``; nested scopes only tighten it"""
+    limit = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(limit if current is None else min(current, limit))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds):
+    """View decorator running the whole request under one deadline budget (sync or async views)"""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                with deadline(seconds):
+                    return await view(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def remaining():
+    """Seconds left in the current budget, or None when there is no deadline"""
+    limit = _deadline.get()
+    if limit is None:
+        return None
+    return limit - time.monotonic()
+
+
+def check_deadline(stage):
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"No time budget left for {stage}")
+    return left
+
+
+def is_transient(exc):
+    """Network failures, timeouts and 5xx/429-style upstream errors"""
+    if isinstance(exc, (OSError, TimeoutError)):
+        return True
+    return getattr(exc, 'code', None) in TRANSIENT_CODES
+
+
+def is_permanent(exc):
+    """Errors no retry will fix: rejected arguments (e.g. an invalid database path) or refused permissions"""
+    if isinstance(exc, (ValueError, TypeError)):
+        return True
+    return getattr(exc, 'code', None) in PERMANENT_CODES
+
+
+class CircuitBreaker:
+    """Rolling-window breaker for one upstream.
+
+    Opens when at least ``min_calls`` of the last ``window`` calls were
+    made and ``failure_ratio`` of them failed transiently. While open,
+    calls are rejected for ``open_seconds``; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, window=20, min_calls=10, failure_ratio=0.5, open_seconds=30.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'failures': 0, 'retries': 0, 'rejected': 0, 'opened': 0}
+
+    def retry_after(self):
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self):
+        """Reserve a call, or raise :class:`CircuitOpen`"""
+        with self._lock:
+            if self.state == self.OPEN and self.retry_after() <= 0:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._trial_running):
+                self._counters['rejected'] += 1
+                raise CircuitOpen(self.name, self.retry_after() or self.open_seconds)
+            if self.state == self.HALF_OPEN:
+                self._trial_running = True
+            self._counters['calls'] += 1
+
+    def record(self, ok):
+        with self._lock:
+            if not ok:
+                self._counters['failures'] += 1
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit for {self.name} closed")
+                else:
+                    self._open()
+                return
+            self._outcomes.append(ok)
+            failed = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failed / len(self._outcomes) >= self.failure_ratio:
+                self._open()
+
+    def record_retry(self):
+        with self._lock:
+            self._counters['retries'] += 1
+
+    def _open(self):
+        # Caller holds the lock
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._counters['opened'] += 1
+        logger.warning(f"Circuit for {self.name} opened for {self.open_seconds:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'retry_after_seconds': round(self.retry_after(), 1) if self.state == self.OPEN else 0.0,
+                'window_failures': self._outcomes.count(False),
+                'window_calls': len(self._outcomes),
+                **self._counters,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name):
+    """The process-wide breaker for an upstream, created from settings on first use"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                window=getattr(settings, 'CIRCUIT_WINDOW', 20),
+                min_calls=getattr(settings, 'CIRCUIT_MIN_CALLS', 10),
+                failure_ratio=getattr(settings, 'CIRCUIT_FAILURE_RATIO', 0.5),
+                open_seconds=getattr(settings, 'CIRCUIT_OPEN_SECONDS', 30.0),
+            )
+        return _breakers[name]
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
+
+
+def _retry_delay(name, circuit, error, attempt, retries, base_delay):
+    """Record a failed call; return the wait before the next attempt, or None to give up"""
+    transient = is_transient(error)
+    circuit.record(not transient)
+    if not transient or attempt >= retries:
+        return None
+    delay = base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+    left = remaining()
+    if left is not None and left <= delay:
+        return None
+    circuit.record_retry()
+    logger.warning(f"{name} call failed ({str(error)}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+    return delay
+
+
+def _retry_settings(retries, base_delay):
+    if retries is None:
+        retries = getattr(settings, 'UPSTREAM_RETRIES', 2)
+    if base_delay is None:
+        base_delay = getattr(settings, 'UPSTREAM_RETRY_BASE_SECONDS', 0.2)
+    return retries, base_delay
+
+
+def call_upstream(name, fn, retries=None, base_delay=None):
+    """Call ``fn()`` against upstream ``name`` under its breaker and the current deadline.
+
+    Transient failures are retried with jittered exponential backoff, but
+    only while the remaining budget covers the wait. Other exceptions are
+    raised at once and do not count against the upstream; a call that is
+    cancelled or interrupted counts as a failure.
+    """
+    circuit = breaker(name)
+    retries, base_delay = _retry_settings(retries, base_delay)
+
+    attempt = 0
+    while True:
+        check_deadline(name)
+        circuit.allow()
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _retry_delay(name, circuit, e, attempt, retries, base_delay)
+            if delay is None:
+                raise
+            attempt += 1
+            time.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled or interrupted mid-call: count it as a failure so a
+            # half-open trial gives its slot back instead of wedging the breaker
+            circuit.record(False)
+            raise
+        circuit.record(True)
+        return result
+
+
+async def call_upstream_async(name, fn, retries=None, base_delay=None):
+    """:func:`call_upstream` for coroutines: ``fn()`` returns an awaitable and backoff does not block the loop"""
+    circuit = breaker(name)
+    retries, base_delay = _retry_settings(retries, base_delay)
+
+    attempt = 0
+    while True:
+        check_deadline(name)
+        circuit.allow()
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = _retry_delay(name, circuit, e, attempt, retries, base_delay)
+            if delay is None:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled or interrupted mid-call: count it as a failure so a
+            # half-open trial gives its slot back instead of wedging the breaker
+            circuit.record(False)
+            raise
+        circuit.record(True)
+        return result
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def room_version(room):
+    """Content version of a room node: equal data gives an equal version in every worker"""
+    return room_encoding(room)[0]
+
+
+def room_encoding(room):
+    """``(version, size)`` of a room node, size being its encoded length in bytes"""
+    encoded = json.dumps(room, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:20], len(encoded)
+
+
+class RoomCache:
+    """Read-through cache of room nodes for dashboard polling.
+
+    A bounded in-memory LRU holds ``(version, room)`` per room, capped at
+    ``max_entries`` rooms and ``max_bytes`` of encoded room data, since
+    records can carry base64 images. With
+    ``shared_alias`` set, a Django cache (e.g. Redis) is the shared tier:
+    it holds each room's current version and snapshot, so a write in one
+    worker invalidates the copies in all others. Without it, other workers
+    can serve a stale room for at most ``ttl`` seconds.
+
+    Every write to a room bumps its generation. A read-through takes the
+    generation before reading Firebase and :meth:`fill` drops the result
+    if a write landed meanwhile, so an older read never replaces it.
+    """
+
+    def __init__(self, max_entries=512, ttl=60, shared_alias=None, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._shared = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0,
+                          'updates': 0, 'stale_fills': 0, 'responses': 0, 'not_modified': 0}
+
+    def shared(self):
+        if self.shared_alias and self._shared is None:
+            from django.core.cache import caches
+            self._shared = caches[self.shared_alias]
+        return self._shared
+
+    @staticmethod
+    def _keys(room_id):
+        return f"room-version:{room_id}", f"room-snapshot:{room_id}"
+
+    def get(self, room_id):
+        """Return ``(version, room)`` or None when the room must be read from Firebase"""
+        shared = self.shared()
+        version_key, snapshot_key = self._keys(room_id)
+        current = shared.get(version_key) if shared else None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(room_id)
+            if entry is not None:
+                version, stored_at, room, _ = entry
+                fresh = now - stored_at <= self.ttl
+                if fresh and (shared is None or version == current):
+                    self._entries.move_to_end(room_id)
+                    self._counters['hits'] += 1
+                    return version, room
+                self._forget(room_id)
+
+        snapshot = shared.get(snapshot_key) if current else None
+        with self._lock:
+            if snapshot is None or snapshot['version'] != current:
+                self._counters['misses'] += 1
+                return None
+            self._counters['shared_hits'] += 1
+            self._remember(room_id, current, snapshot['room'], room_encoding(snapshot['room'])[1])
+        return current, snapshot['room']
+
+    def generation(self, room_id):
+        """Write count for a room; take it before reading the room from Firebase"""
+        with self._lock:
+            return self._generations.get(room_id, 0)
+
+    def fill(self, room_id, room, generation):
+        """Cache a room read from Firebase and return its version.
+
+        ``generation`` is :meth:`generation` from before the read. If the
+        room was written since, the read may predate that write and is
+        returned without being cached.
+        """
+        version, size = room_encoding(room)
+        with self._lock:
+            if self._generations.get(room_id, 0) != generation:
+                self._counters['stale_fills'] += 1
+                return version
+            self._remember(room_id, version, room, size)
+        self._publish(room_id, version, room)
+        return version
+
+    def apply(self, room_id, updates):
+        """Merge ``{capture_type: data}`` written for a room into its cached copy.
+
+        Rooms that are not cached here are invalidated instead, so no
+        worker keeps serving the old snapshot.
+        """
+        with self._lock:
+            self._bump(room_id)
+            entry = self._entries.get(room_id)
+            if entry is not None:
+                room = dict(entry[2] or {})
+                room.update({capture_type: dict(data) for capture_type, data in updates.items()})
+                version, size = room_encoding(room)
+                self._remember(room_id, version, room, size)
+                self._counters['updates'] += 1
+        if entry is None:
+            self.invalidate(room_id)
+        else:
+            self._publish(room_id, version, room)
+
+    def invalidate(self, room_id):
+        with self._lock:
+            self._bump(room_id)
+            self._forget(room_id)
+            self._counters['invalidations'] += 1
+        shared = self.shared()
+        if shared:
+            shared.delete_many(self._keys(room_id))
+
+    def record_response(self, not_modified):
+        with self._lock:
+            self._counters['responses'] += 1
+            if not_modified:
+                self._counters['not_modified'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['shared_hits'] + self._counters['misses']
+            hits = self._counters['hits'] + self._counters['shared_hits']
+            responses = self._counters['responses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'shared_tier': self.shared_alias or None,
+                'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+                'not_modified_ratio': round(self._counters['not_modified'] / responses, 3) if responses else 0.0,
+                **self._counters,
+            }
+
+    def _remember(self, room_id, version, room, size):
+        # Caller holds the lock
+        self._forget(room_id)
+        if size > self.max_bytes:
+            return
+        self._entries[room_id] = (version, time.time(), room, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def _forget(self, room_id):
+        # Caller holds the lock
+        entry = self._entries.pop(room_id, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def _bump(self, room_id):
+        # Caller holds the lock
+        self._generations[room_id] = self._generations.get(room_id, 0) + 1
+
+    def _publish(self, room_id, version, room):
+        shared = self.shared()
+        if shared:
+            version_key, snapshot_key = self._keys(room_id)
+            # Snapshot first, so a reader never sees a version without its data
+            shared.set(snapshot_key, {'version': version, 'room': room}, self.ttl)
+            shared.set(version_key, version, self.ttl)
+
+
+def build_room_cache():
+    """Create the room cache configured in settings"""
+    return RoomCache(
+        max_entries=getattr(settings, 'ROOM_CACHE_MAX_ENTRIES', 512),
+        max_bytes=getattr(settings, 'ROOM_CACHE_MAX_BYTES', 32 * 1024 * 1024),
+        ttl=getattr(settings, 'ROOM_CACHE_TTL_SECONDS', 60),
+        shared_alias=getattr(settings, 'ROOM_CACHE_ALIAS', None) or None,
+    )
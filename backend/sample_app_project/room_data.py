@@ -0,0 +1,73 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Record fields that carry the captured image; "-images" in a projection
+# drops both
+IMAGE_FIELDS = ('captured_image', 'captured_image_ref')
+
+# Characters Firebase does not allow in a key; '/' would nest the room
+# under another path
+ROOM_ID_FORBIDDEN = set('.#$[]/') | {chr(c) for c in range(32)} | {chr(127)}
+ROOM_ID_MAX_BYTES = 768
+
+
+def validate_room_id(room_id):
+    """Return ``room_id`` if Firebase accepts it as a key, else raise ValueError"""
+    if not room_id:
+        raise ValueError("roomId must not be empty")
+    if len(room_id.encode('utf-8')) > ROOM_ID_MAX_BYTES:
+        raise ValueError(f"roomId must be at most {ROOM_ID_MAX_BYTES} bytes")
+    if ROOM_ID_FORBIDDEN.intersection(room_id):
+        raise ValueError("roomId must not contain '.', '#', '$', '[', ']', '/' or control characters")
+    return room_id
+
+
+def parse_fields(value):
+    """Parse a ``fields=`` projection into ``(include, exclude)`` sets.
+
+    ``fields=formatted_value,timestamp`` keeps only those record fields;
+    ``fields=-images`` or ``fields=-captured_image`` drops fields. Returns
+    ``(None, set())`` when no projection is requested.
+    """
+    include, exclude = set(), set()
+    for name in (value or '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        target = exclude if name.startswith('-') else include
+        name = name.lstrip('-')
+        if name == 'images':
+            target.update(IMAGE_FIELDS)
+        else:
+            target.add(name)
+    return include or None, exclude
+
+
+def project(record, include=None, exclude=()):
+    """Apply a field projection to one capture record"""
+    if not isinstance(record, dict):
+        return record
+    return {
+        key: value for key, value in record.items()
+        if (include is None or key in include) and key not in exclude
+    }
+
+
+def room_snapshot(room, capture_types, include=None, exclude=()):
+    """Pick the capture records out of a room node read in one ``get()``"""
+    room = room or {}
+    return {
+        capture_type: project(room.get(capture_type), include, exclude)
+        for capture_type in capture_types
+    }
+
+
+def dumps(payload):
+    """Serialize to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
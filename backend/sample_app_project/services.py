@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from .lazy_import import LazyModule
+
+logger = logging.getLogger(__name__)
+
+firebase_admin = LazyModule('firebase_admin')
+credentials = LazyModule('firebase_admin.credentials')
+db = LazyModule('firebase_admin.db')
+vision = LazyModule('google.cloud.vision')
+service_account = LazyModule('google.oauth2.service_account')
+
+
+class ServiceState:
+    """Initialization state and backoff of one upstream service"""
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.ready = False
+        self.failures = 0
+        self.last_error = None
+        self.next_attempt_at = 0.0
+        self.initialized_at = None
+
+    def failed(self, error, base, cap):
+        self.ready = False
+        self.failures += 1
+        self.last_error = str(error)
+        delay = min(cap, base * 2 ** (self.failures - 1)) * random.uniform(0.5, 1.0)
+        self.next_attempt_at = time.monotonic() + delay
+        return delay
+
+    def succeeded(self):
+        self.ready = True
+        self.failures = 0
+        self.last_error = None
+        self.initialized_at = time.time()
+
+    def to_dict(self):
+        return {
+            'status': 'active' if self.ready else ('failed' if self.failures else 'inactive'),
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'retry_in_seconds': round(max(0.0, self.next_attempt_at - time.monotonic()), 1)
+            if not self.ready and self.failures else None,
+        }
+
+
+class ServiceRegistry:
+    """Process-wide Firebase app and Vision client, initialized exactly once.
+
+    Credentials are parsed from the environment and kept in memory; nothing
+    is written to disk. A failed initialization is retried only after a
+    jittered exponential backoff, so requests during an outage fail fast
+    instead of re-running the setup. After ``fork()`` the child drops the
+    parent's clients (gRPC channels and HTTP pools must not cross a fork)
+    and initializes its own on first use.
+
+    ``start_probe`` runs a background thread that keeps services
+    initialized and records a cached readiness snapshot for health checks.
+    """
+
+    def __init__(self, retry_base=1.0, retry_max=60.0, probe_interval=30.0):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.probe_interval = probe_interval
+        self.firebase_app = None
+        self.vision_client = None
+        self.vision_credentials = None
+        # Async Vision clients, one per event loop: gRPC aio channels are bound to their loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._states = {'firebase': ServiceState('firebase'), 'vision': ServiceState('vision')}
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self._probe = None
+        self._pid = os.getpid()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def firebase_ready(self):
+        return self._states['firebase'].ready
+
+    @property
+    def vision_ready(self):
+        return self._states['vision'].ready
+
+    def ensure(self, vision=True):
+        """Initialize what is missing; returns True when the needed services are ready"""
+        ok = self._ensure('firebase', self._init_firebase)
+        if vision:
+            ok = self._ensure('vision', self._init_vision) and ok
+        return ok
+
+    def _ensure(self, name, initializer):
+        state = self._states[name]
+        if state.ready:
+            return True
+        with self._lock:
+            if state.ready:
+                return True
+            if time.monotonic() < state.next_attempt_at:
+                return False
+            try:
+                initializer()
+            except Exception as e:
+                delay = state.failed(e, self.retry_base, self.retry_max)
+                logger.error(f"{name} initialization failed (attempt {state.failures}, "
+                             f"next try in {delay:.1f}s): {str(e)}")
+                return False
+            state.succeeded()
+            logger.info(f"{name} initialized in pid {os.getpid()}")
+            return True
+
+    def _init_firebase(self):
+        firebase_creds_json = os.environ.get('FIREBASE_CREDENTIALS_JSON')
+        firebase_url = os.environ.get('FIREBASE_DATABASE_URL')
+        if not firebase_creds_json or not firebase_url:
+            raise Exception("Missing Firebase credentials or database URL")
+
+        # Bounds every Realtime Database HTTP call; firebase_admin has no per-call timeout
+        options = {'databaseURL': firebase_url, 'httpTimeout': getattr(settings, 'FIREBASE_HTTP_TIMEOUT', 10)}
+        cert = credentials.Certificate(json.loads(firebase_creds_json))
+        try:
+            self.firebase_app = firebase_admin.initialize_app(cert, options)
+        except ValueError:
+            # Already initialized in this process (e.g. inherited across a fork)
+            firebase_admin.delete_app(firebase_admin.get_app())
+            self.firebase_app = firebase_admin.initialize_app(cert, options)
+
+    def _init_vision(self):
+        vision_creds_json = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS_JSON') or os.environ.get('VISION_KEY')
+        if vision_creds_json:
+            info = json.loads(vision_creds_json) if isinstance(vision_creds_json, str) else vision_creds_json
+            creds = service_account.Credentials.from_service_account_info(info)
+            self.vision_client = vision.ImageAnnotatorClient(credentials=creds)
+            self.vision_credentials = creds
+        elif os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
+            # Key file written by manage.py, or application default credentials
+            self.vision_client = vision.ImageAnnotatorClient()
+        else:
+            raise Exception("Missing Google Vision credentials")
+
+    def _after_fork(self):
+        # Runs in the child with only the forking thread alive
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.vision_client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._probe_thread = None
+        self._probe = None
+        for state in self._states.values():
+            state.reset()
+
+    def vision_async_client(self):
+        """Vision client for async views, created for the running event loop once Vision is ready"""
+        if not self.vision_ready:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            if self.vision_credentials is not None:
+                client = vision.ImageAnnotatorAsyncClient(credentials=self.vision_credentials)
+            else:
+                client = vision.ImageAnnotatorAsyncClient()
+            self._async_clients[loop] = client
+        return client
+
+    def start_probe(self, vision=True):
+        """Start the background readiness probe for this process"""
+        with self._lock:
+            if self._probe_thread is not None:
+                return
+            self._probe_thread = threading.Thread(
+                target=self._run_probe, args=(vision,), name='service-probe', daemon=True
+            )
+            self._probe_thread.start()
+
+    def _run_probe(self, vision):
+        while True:
+            self.probe(vision)
+            time.sleep(self.probe_interval)
+
+    def probe(self, vision=True):
+        """Initialize if needed and check Firebase with a tiny read; caches the result"""
+        started = time.perf_counter()
+        ready = self.ensure(vision)
+        firebase = {'reachable': False, 'latency_ms': None, 'error': None}
+        if self.firebase_ready:
+            read_started = time.perf_counter()
+            try:
+                db.reference('_health').get()
+                firebase['reachable'] = True
+                firebase['latency_ms'] = round((time.perf_counter() - read_started) * 1000, 1)
+            except Exception as e:
+                firebase['error'] = str(e)
+                ready = False
+        self._probe = {
+            'ready': ready,
+            'checked_at': time.time(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'firebase': firebase,
+        }
+        return self._probe
+
+    def readiness(self):
+        """Cached readiness for health checks; does no work in the request path"""
+        probe = self._probe
+        return {
+            'ready': probe['ready'] if probe else self.firebase_ready,
+            'probe': probe,
+            'pid': self._pid,
+            'services': {name: state.to_dict() for name, state in self._states.items()},
+        }
+
+
+def build_service_registry():
+    return ServiceRegistry(
+        retry_base=getattr(settings, 'SERVICE_RETRY_BASE_SECONDS', 1.0),
+        retry_max=getattr(settings, 'SERVICE_RETRY_MAX_SECONDS', 60.0),
+        probe_interval=getattr(settings, 'SERVICE_PROBE_INTERVAL_SECONDS', 30.0),
+    )
@@ -103,3 +103,137 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# OCR job queue: when OCR_ASYNC_MODE is on, /api/upload/ enqueues the OCR work
+# and returns a job id instead of waiting for Vision and Firebase
+OCR_ASYNC_MODE = os.environ.get('OCR_ASYNC_MODE', 'False') == 'True'
+OCR_QUEUE_BACKEND = os.environ.get('OCR_QUEUE_BACKEND', 'sample_app_project.ocr_queue.InProcessJobQueue')
+OCR_QUEUE_MAXSIZE = int(os.environ.get('OCR_QUEUE_MAXSIZE', '100'))
+OCR_QUEUE_WORKERS = int(os.environ.get('OCR_QUEUE_WORKERS', '2'))
+OCR_JOB_TTL_SECONDS = int(os.environ.get('OCR_JOB_TTL_SECONDS', '600'))
+
+# OCR result cache keyed on the uploaded image digest. Set OCR_CACHE_DIR to a
+# shared directory to let several worker processes reuse each other's results
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'True') == 'True'
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '256'))
+OCR_CACHE_TTL_SECONDS = int(os.environ.get('OCR_CACHE_TTL_SECONDS', '3600'))
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', '')
+
+# JPEG uploads at or below this size that need no rotation, crop or resize are
+# sent to OCR as-is instead of being decoded and re-encoded
+IMAGE_PASSTHROUGH_MAX_BYTES = int(os.environ.get('IMAGE_PASSTHROUGH_MAX_BYTES', '500000'))
+
+# Content-addressed image storage. When enabled, Firebase records keep only a
+# captured_image_ref and the bytes are served from /api/images/<digest>/
+BLOB_STORE_ENABLED = os.environ.get('BLOB_STORE_ENABLED', 'False') == 'True'
+BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND', 'sample_app_project.blob_store.LocalBlobStore')
+BLOB_STORE_OPTIONS = {
+    'root': os.environ.get('BLOB_STORE_ROOT', os.path.join(BASE_DIR, 'blobs')),
+}
+
+# Upload limits, enforced while the body streams in (bytes) and from the image
+# header before Pillow decodes anything (pixels)
+UPLOAD_MAX_BYTES = {
+    'default': int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024))),
+    'endoscope': int(os.environ.get('UPLOAD_MAX_BYTES_ENDOSCOPE', str(20 * 1024 * 1024))),
+}
+UPLOAD_MAX_PIXELS = {
+    'default': int(os.environ.get('UPLOAD_MAX_PIXELS', '25000000')),
+    'endoscope': int(os.environ.get('UPLOAD_MAX_PIXELS_ENDOSCOPE', '40000000')),
+}
+# Uploads up to this size stay in memory while streaming; larger ones spill to disk
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))
+
+# OCR engine per capture type: 'google' (Cloud Vision), 'tesseract' (local CPU,
+# needs pytesseract) or 'fake' (deterministic stand-in for tests and load
+# tests). OCR_BACKEND_OVERRIDES takes "type=backend" pairs, e.g.
+# "temperature=tesseract,weight=tesseract"
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'google')
+OCR_BACKEND_OVERRIDES = dict(
+    pair.split('=', 1) for pair in os.environ.get('OCR_BACKEND_OVERRIDES', '').split(',') if '=' in pair
+)
+OCR_BACKEND_OPTIONS = {
+    'fake': {'text': os.environ.get('OCR_FAKE_TEXT', '36.5 °C')},
+}
+
+# Local seven-segment recognizer tried before the OCR backend for weight and
+# blood pressure; readings under the confidence threshold fall back to the
+# backend. Displays read digits only, so temperature and glucose are only read
+# locally with the unit their devices show, as "type=unit" pairs in
+# SEVEN_SEGMENT_UNITS, e.g. "temperature=°F,glucose=mmol/L"
+SEVEN_SEGMENT_ENABLED = os.environ.get('SEVEN_SEGMENT_ENABLED', 'True') == 'True'
+SEVEN_SEGMENT_MIN_CONFIDENCE = float(os.environ.get('SEVEN_SEGMENT_MIN_CONFIDENCE', '0.6'))
+SEVEN_SEGMENT_UNITS = dict(
+    pair.split('=', 1) for pair in os.environ.get('SEVEN_SEGMENT_UNITS', '').split(',') if '=' in pair
+)
+
+# Write-behind persistence: results are committed to a local SQLite outbox and
+# acknowledged at once; a background flusher applies them to Firebase per room
+FIREBASE_WRITE_BEHIND = os.environ.get('FIREBASE_WRITE_BEHIND', 'False') == 'True'
+OUTBOX_PATH = os.environ.get('OUTBOX_PATH', os.path.join(BASE_DIR, 'outbox.sqlite3'))
+OUTBOX_FLUSH_INTERVAL = float(os.environ.get('OUTBOX_FLUSH_INTERVAL', '0.5'))
+
+# Read-through cache of room snapshots for /api/get-data/ polling. Writes update
+# or invalidate it. ROOM_CACHE_ALIAS names a CACHES entry (e.g. Redis) shared by
+# all workers; without one, other workers may serve a room for up to the TTL
+ROOM_CACHE_ENABLED = os.environ.get('ROOM_CACHE_ENABLED', 'True') == 'True'
+ROOM_CACHE_TTL_SECONDS = int(os.environ.get('ROOM_CACHE_TTL_SECONDS', '60'))
+ROOM_CACHE_MAX_ENTRIES = int(os.environ.get('ROOM_CACHE_MAX_ENTRIES', '512'))
+# Records can carry base64 images, so the cache is bounded by encoded size too
+ROOM_CACHE_MAX_BYTES = int(os.environ.get('ROOM_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+ROOM_CACHE_ALIAS = os.environ.get('ROOM_CACHE_ALIAS', '')
+
+# Server-sent events for /api/events/ (served by the ASGI app): heartbeat
+# interval, client reconnect delay and per-room events kept for Last-Event-ID
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', '3000'))
+SSE_REPLAY_EVENTS = int(os.environ.get('SSE_REPLAY_EVENTS', '50'))
+
+# Append-only history of numeric readings per room and capture type, kept as
+# packed per-day segment files for /api/history/ range queries
+VITALS_HISTORY_ENABLED = os.environ.get('VITALS_HISTORY_ENABLED', 'True') == 'True'
+VITALS_HISTORY_ROOT = os.environ.get('VITALS_HISTORY_ROOT', os.path.join(BASE_DIR, 'history'))
+
+# Firebase and Vision are initialized once per process; failed initialization
+# is retried with jittered exponential backoff. A background probe keeps the
+# readiness reported by /health/ current
+SERVICE_RETRY_BASE_SECONDS = float(os.environ.get('SERVICE_RETRY_BASE_SECONDS', '1'))
+SERVICE_RETRY_MAX_SECONDS = float(os.environ.get('SERVICE_RETRY_MAX_SECONDS', '60'))
+SERVICE_PROBE_ENABLED = os.environ.get('SERVICE_PROBE_ENABLED', 'True') == 'True'
+SERVICE_PROBE_INTERVAL_SECONDS = float(os.environ.get('SERVICE_PROBE_INTERVAL_SECONDS', '30'))
+
+# Time budgets: every upload/get-data request (and each queued OCR job) gets a
+# deadline. OCR calls get what is left as their timeout; Firebase calls are not
+# started or retried once it is spent and are each bounded by
+# FIREBASE_HTTP_TIMEOUT. Keep REQUEST_DEADLINE_SECONDS under the gunicorn worker timeout
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', '25'))
+OCR_JOB_DEADLINE_SECONDS = float(os.environ.get('OCR_JOB_DEADLINE_SECONDS', '60'))
+FIREBASE_HTTP_TIMEOUT = float(os.environ.get('FIREBASE_HTTP_TIMEOUT', '10'))
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', '2'))
+UPSTREAM_RETRY_BASE_SECONDS = float(os.environ.get('UPSTREAM_RETRY_BASE_SECONDS', '0.2'))
+
+# Circuit breakers per upstream (each OCR backend, Firebase): open when half of
+# the last 20 calls failed (at least 10 calls), then fail fast for 30 seconds.
+# Firebase writes refused while open are kept in the outbox
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '10'))
+CIRCUIT_FAILURE_RATIO = float(os.environ.get('CIRCUIT_FAILURE_RATIO', '0.5'))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+FIREBASE_DEGRADE_TO_OUTBOX = os.environ.get('FIREBASE_DEGRADE_TO_OUTBOX', 'True') == 'True'
+
+# Per-stage request timing: SERVER_TIMING_ENABLED adds a Server-Timing header
+# to upload and get-data responses; METRICS_ENABLED also aggregates latency
+# histograms served as Prometheus text from /metrics/. With both off the
+# stage timers are no-ops
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'True') == 'True'
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+
+# Async views: with ASYNC_VIEWS=True, /api/upload/ and /api/get-data/ are
+# served by async views (run under uvicorn via asgi.py). Blocking work goes to
+# fixed pools: ASYNC_CPU_WORKERS threads for Pillow/NumPy, ASYNC_IO_WORKERS for
+# Firebase Admin calls. ASYNC_MAX_INFLIGHT_UPLOADS caps uploads held in memory
+# per worker; past it uploads get 503
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', '2'))
+ASYNC_IO_WORKERS = int(os.environ.get('ASYNC_IO_WORKERS', '16'))
+ASYNC_MAX_INFLIGHT_UPLOADS = int(os.environ.get('ASYNC_MAX_INFLIGHT_UPLOADS', '64'))
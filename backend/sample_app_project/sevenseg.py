@@ -0,0 +1,280 @@
+import io
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Segment order: a (top), b (top right), c (bottom right), d (bottom),
+# e (bottom left), f (top left), g (middle)
+DIGIT_SEGMENTS = {
+    '0': 'abcdef',
+    '1': 'bc',
+    '2': 'abdeg',
+    '3': 'abcdg',
+    '4': 'bcfg',
+    '5': 'acdfg',
+    '6': 'acdefg',
+    '7': 'abc',
+    '8': 'abcdefg',
+    '9': 'abcdfg',
+}
+SEGMENTS = 'abcdefg'
+
+# Sampling zones per segment as (top, bottom, left, right) fractions of the
+# digit box, kept clear of the corners where segments meet
+ZONES = {
+    'a': (0.00, 0.14, 0.30, 0.70),
+    'b': (0.18, 0.40, 0.72, 1.00),
+    'c': (0.60, 0.82, 0.72, 1.00),
+    'd': (0.86, 1.00, 0.30, 0.70),
+    'e': (0.60, 0.82, 0.00, 0.28),
+    'f': (0.18, 0.40, 0.00, 0.28),
+    'g': (0.43, 0.57, 0.30, 0.70),
+}
+# Negative zones: the two holes of an 8, background for every digit. A
+# solid blob or smudge lights them and so cannot match '8' confidently
+HOLES = (
+    (0.20, 0.38, 0.34, 0.66),
+    (0.62, 0.80, 0.34, 0.66),
+)
+
+TEMPLATES = {
+    digit: np.array([1.0 if s in on else 0.0 for s in SEGMENTS] + [0.0] * len(HOLES))
+    for digit, on in DIGIT_SEGMENTS.items()
+}
+TEMPLATE_DIGITS = list(TEMPLATES)
+TEMPLATE_MATRIX = np.stack([TEMPLATES[d] for d in TEMPLATE_DIGITS])
+
+# Working resolution: displays are decoded down to this width
+WORK_WIDTH = 480
+
+SevenSegmentReading = namedtuple('SevenSegmentReading', ['text', 'confidence'])
+
+
+def otsu_threshold(gray):
+    """Otsu's threshold for a uint8 image"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    background = weights[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    mean_bg = np.where(valid, means[:-1] / np.maximum(background, 1), 0)
+    mean_fg = np.where(valid, (means[-1] - means[:-1]) / np.maximum(foreground, 1), 0)
+    between = np.where(valid, background * foreground * (mean_bg - mean_fg) ** 2, 0)
+    return int(np.argmax(between))
+
+
+def runs(profile, min_value):
+    """(start, end) index ranges where profile > min_value"""
+    on = np.concatenate(([False], profile > min_value, [False]))
+    edges = np.flatnonzero(np.diff(on.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def load_mask(image_bytes):
+    """Decode to a small grayscale array and binarize it, digits as True"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft('L', (WORK_WIDTH, WORK_WIDTH))
+        img = ImageOps.exif_transpose(img).convert('L')
+        if img.width > WORK_WIDTH:
+            img = img.resize((WORK_WIDTH, max(1, round(img.height * WORK_WIDTH / img.width))))
+        gray = np.asarray(img, dtype=np.uint8)
+
+    mask = gray > otsu_threshold(gray)
+    # Digits are the minority class: dark on LCDs, bright on LED displays
+    if mask.mean() > 0.5:
+        mask = ~mask
+    return mask
+
+
+def zone_fill(box, zone):
+    """Fraction of lit pixels in a (top, bottom, left, right) zone of a box"""
+    height, width = box.shape
+    top, bottom, left, right = zone
+    return box[int(top * height):max(int(bottom * height), int(top * height) + 1),
+               int(left * width):max(int(right * width), int(left * width) + 1)].mean()
+
+
+def digit_height(box, line_height):
+    """How close a box comes to the full height of the digits in its line"""
+    return min(1.0, box.shape[0] / (0.7 * line_height)) ** 2
+
+
+def classify_digit(box, line_height):
+    """Template-match a digit box; returns (digit, confidence)"""
+    fills = np.array([zone_fill(box, ZONES[s]) for s in SEGMENTS] + [zone_fill(box, hole) for hole in HOLES])
+    lit = np.clip(fills / 0.6, 0.0, 1.0)
+
+    distances = np.abs(TEMPLATE_MATRIX - lit).mean(axis=1)
+    order = np.argsort(distances)
+    best, second = distances[order[0]], distances[order[1]]
+    confidence = (1.0 - best) * (second - best) / (second + best + 1e-9)
+    return TEMPLATE_DIGITS[order[0]], float(confidence * digit_height(box, line_height))
+
+
+def classify_one(box, line_height):
+    """Confidence that a narrow bar is a '1': segments b and c lit over the digit height"""
+    upper = zone_fill(box, (0.10, 0.40, 0.0, 1.0))
+    lower = zone_fill(box, (0.60, 0.90, 0.0, 1.0))
+    lit = min(1.0, min(upper, lower) / 0.6)
+    return float(lit * digit_height(box, line_height))
+
+
+def read_line(mask):
+    """Read the digits and decimal points in one text line of the mask.
+
+    A dot-sized blob low in the line that is not clearly a decimal point,
+    or a blob joined to the bottom right of a digit, may be a decimal point
+    that was misread. When digits follow it the reading is returned with
+    confidence 0, since 45.5 read as 455 still looks like a valid weight.
+    """
+    line_height = mask.shape[0]
+    columns = runs(mask.sum(axis=0), 0)
+    if not columns:
+        return None
+
+    text = []
+    confidences = []
+    doubtful = []
+    for left, right in columns:
+        piece = mask[:, left:right]
+        rows = np.flatnonzero(piece.any(axis=1))
+        top, bottom = rows[0], rows[-1] + 1
+        height, width = bottom - top, right - left
+
+        if height < 0.3 * line_height:
+            # Small blob: a decimal point sits on the baseline, anything
+            # higher (colons, degree signs) is noise
+            if bottom > 0.6 * line_height and text:
+                if width < 0.35 * line_height and bottom > 0.75 * line_height:
+                    text.append('.')
+                else:
+                    doubtful.append(len(text))
+            continue
+        if piece[:, -1].argmax() >= 0.75 * line_height:
+            # The right edge is lit only at the baseline: a decimal point touching the digit
+            doubtful.append(len(text) + 1)
+        box = piece[top:bottom]
+        if width < 0.35 * height:
+            # Only the right-hand verticals are lit, so the box is just that bar
+            text.append('1')
+            confidences.append(classify_one(box, line_height))
+            continue
+        digit, confidence = classify_digit(box, line_height)
+        text.append(digit)
+        confidences.append(confidence)
+
+    if any(position < len(text) for position in doubtful) or text.count('.') > 1:
+        confidences.append(0.0)
+    text = ''.join(text).strip('.')
+    if not confidences or not text:
+        return None
+    return SevenSegmentReading(text, min(confidences))
+
+
+def recognize(image_bytes, lines=1):
+    """Read a seven-segment display.
+
+    Returns the ``lines`` tallest text lines joined by newlines, in reading
+    order, with the lowest per-digit confidence, or None when no digits are
+    found.
+    """
+    mask = load_mask(image_bytes)
+    bands = runs(mask.sum(axis=1), max(2, int(0.01 * mask.shape[1])))
+    if not bands:
+        return None
+    tallest = sorted(bands, key=lambda band: band[1] - band[0], reverse=True)[:lines]
+
+    readings = []
+    for top, bottom in sorted(tallest):
+        reading = read_line(mask[top:bottom])
+        if reading is None:
+            return None
+        readings.append(reading)
+    return SevenSegmentReading(
+        '\n'.join(r.text for r in readings),
+        min(r.confidence for r in readings),
+    )
+
+
+class FastPath:
+    """Local seven-segment pass run before the configured OCR backend.
+
+    Only readings at or above ``min_confidence`` are used; anything else
+    falls through to the backend. Counters feed the hit-rate metric.
+
+    The recognizer reads digits only. Thermometers and glucose meters come
+    in two units, so those types are only read locally when ``units`` says
+    which unit the deployment's devices show; the unit is appended to the
+    reading.
+    """
+
+    # Blood pressure monitors show systolic and diastolic on separate lines
+    LINES = {'temperature': 1, 'weight': 1, 'glucose': 1, 'blood_pressure': 2}
+    # Types whose bare digits have only one unit, the extractor's default
+    FIXED_UNIT = {'weight', 'blood_pressure'}
+    # Thermometers and scales always show a decimal point, so a reading of
+    # theirs without one lost it: 45.5 kg read as 455 is still in range
+    POINTED = {'temperature', 'weight'}
+
+    def __init__(self, min_confidence=0.6, units=None):
+        self.min_confidence = min_confidence
+        self.units = {t: u for t, u in (units or {}).items() if t in self.LINES and t not in self.FIXED_UNIT}
+        self._lock = threading.Lock()
+        self._counters = {
+            capture_type: {'attempts': 0, 'hits': 0, 'low_confidence': 0, 'no_reading': 0, 'errors': 0}
+            for capture_type in self.LINES
+        }
+
+    def handles(self, capture_type):
+        return capture_type in self.FIXED_UNIT or capture_type in self.units
+
+    def read(self, image_bytes, capture_type):
+        """Return OCR-style text for the display, or None to fall back"""
+        outcome = 'no_reading'
+        text = None
+        try:
+            reading = recognize(image_bytes, lines=self.LINES[capture_type])
+            if reading is not None and capture_type in self.POINTED and '.' not in reading.text:
+                reading = reading._replace(confidence=0.0)
+            if reading is not None:
+                if reading.confidence >= self.min_confidence:
+                    outcome = 'hits'
+                    text = reading.text.replace('\n', '/') if capture_type == 'blood_pressure' else reading.text
+                    if capture_type in self.units:
+                        text = f"{text} {self.units[capture_type]}"
+                else:
+                    outcome = 'low_confidence'
+                    logger.info(
+                        f"Seven-segment {capture_type} read '{reading.text}' at "
+                        f"confidence {reading.confidence:.2f}; falling back"
+                    )
+        except Exception as e:
+            outcome = 'errors'
+            logger.warning(f"Seven-segment recognizer failed: {str(e)}")
+        with self._lock:
+            self._counters[capture_type]['attempts'] += 1
+            self._counters[capture_type][outcome] += 1
+        return text
+
+    def miss(self, capture_type):
+        """Record a fast-path reading that the extractor rejected"""
+        with self._lock:
+            self._counters[capture_type]['hits'] -= 1
+            self._counters[capture_type]['no_reading'] += 1
+
+    def stats(self):
+        with self._lock:
+            attempts = sum(c['attempts'] for c in self._counters.values())
+            hits = sum(c['hits'] for c in self._counters.values())
+            return {
+                'min_confidence': self.min_confidence,
+                'hit_rate': round(hits / attempts, 3) if attempts else 0.0,
+                'by_type': {t: dict(c) for t, c in self._counters.items()},
+            }
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import logging
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+class UploadRejected(Exception):
+    """Raised when an upload breaks a byte or pixel limit (answered with 413)"""
+
+
+def limit_for(limits, capture_type):
+    return limits.get(capture_type, limits['default'])
+
+
+def max_upload_bytes(capture_type=None):
+    limits = settings.UPLOAD_MAX_BYTES
+    if capture_type is None:
+        return max(limits.values())
+    return limit_for(limits, capture_type)
+
+
+def max_upload_pixels(capture_type):
+    return limit_for(settings.UPLOAD_MAX_PIXELS, capture_type)
+
+
+class HashedUploadedFile(UploadedFile):
+    """Uploaded file backed by a spooled temp file, with its sha256 already known"""
+
+    def __init__(self, file, name, content_type, size, charset, sha256, content_type_extra=None):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Stream each file to a SpooledTemporaryFile while hashing it.
+
+    Small files stay in memory, larger ones roll over to disk, so the body
+    is never held twice. A file past the largest per-type byte limit is
+    skipped as soon as it crosses the limit and the reason is recorded on
+    ``request.upload_errors``.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = max_upload_bytes()
+        self.spool_bytes = settings.UPLOAD_SPOOL_BYTES
+        if request is not None:
+            request.upload_errors = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.file.close()
+            if self.request is not None:
+                self.request.upload_errors.append(
+                    f"{self.file_name} exceeds the {self.max_bytes} byte upload limit"
+                )
+            raise SkipFile()
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return HashedUploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            sha256=self.hasher.hexdigest(),
+            content_type_extra=self.content_type_extra,
+        )
+
+
+def check_upload(image_file, capture_type):
+    """Enforce the per-capture-type byte limit on a parsed upload"""
+    limit = max_upload_bytes(capture_type)
+    if image_file.size > limit:
+        raise UploadRejected(
+            f"{capture_type} image is {image_file.size} bytes; the limit is {limit}"
+        )
+
+
+def refuse_oversized(request, max_files):
+    """413 response for a declared body too large for ``max_files`` images, else None"""
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    limit = max_upload_bytes() * max_files
+    if content_length > limit:
+        logger.warning(f"Refused {content_length} byte upload (limit {limit})")
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Request body of {content_length} bytes exceeds the {limit} byte limit"
+        }, status=413)
+    return None
+
+
+def streaming_uploads(max_files=1):
+    """Decorate an upload view to parse multipart bodies with HashingUploadHandler.
+
+    Requests whose declared body is larger than ``max_files`` maximum-size
+    images are refused before any of the body is read. Works for sync and
+    async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                refused = refuse_oversized(request, max_files)
+                if refused is not None:
+                    return refused
+                request.upload_handlers = [HashingUploadHandler(request)]
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            refused = refuse_oversized(request, max_files)
+            if refused is not None:
+                return refused
+            request.upload_handlers = [HashingUploadHandler(request)]
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
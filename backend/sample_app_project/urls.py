@@ -22,9 +22,14 @@ URL configuration for sample_app_project project.
 URL configuration for sample_app_project project.
 """
 
+from django.conf import settings
 from django.urls import path
 from django.http import JsonResponse
-from .views import upload_image, get_captured_data, health_check, debug_env
+from .views import (
+    upload_image, upload_batch, get_captured_data, health_check, debug_env, job_status,
+    job_metrics, captured_image, room_events, vitals_history_view,
+    export_vitals, metrics, upload_image_async, get_captured_data_async
+)
 
 def root_handler(request):
     """Root URL handler for health checks"""
@@ -37,7 +42,19 @@ def root_handler(request):
 urlpatterns = [
     path('', root_handler, name='root'),  # Handle root path
     path('health/', health_check, name='health-check'),
+    path('metrics/', metrics, name='metrics'),
     path('debug/', debug_env, name='debug-env'),  # Debug endpoint
-    path('api/upload/', upload_image, name='upload-image'),
-    path('api/get-data/', get_captured_data, name='get-data'),
+    # Under uvicorn (ASGI) the async views hold many uploads per worker without a thread each
+    path('api/upload/', upload_image_async if settings.ASYNC_VIEWS else upload_image, name='upload-image'),
+    path('api/upload-batch/', upload_batch, name='upload-batch'),
+    path('api/get-data/', get_captured_data_async if settings.ASYNC_VIEWS else get_captured_data, name='get-data'),
+    path('api/history/', vitals_history_view, name='vitals-history'),
+    path('api/export/', export_vitals, name='export-vitals'),
+    path('api/images/<str:digest>/', captured_image, name='captured-image'),
+    path('api/jobs/metrics/', job_metrics, name='job-metrics'),
+    path('api/jobs/<str:job_id>/', job_status, name='job-status'),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Event streams stay open: under a sync WSGI worker each one would hold the worker for good
+    urlpatterns.append(path('api/events/', room_events, name='room-events'))
@@ -1,18 +1,38 @@
 import os
 import json
-import io
-import re
+import math
+import asyncio
+import base64
 import logging
+import threading
 import traceback
-import firebase_admin
-from firebase_admin import credentials, db
-from google.cloud import vision
-from PIL import Image
-from django.http import JsonResponse
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from . import extraction
+from .blob_store import BlobNotFound, build_blob_store
+from .concurrency import build_executors, build_upload_limit
+from .events import RESYNC, RoomEventHub, format_event
+from .lazy_import import LazyModule
+from .metrics import label, record_stage, request_metrics, stage, timed
+from . import export
+from .ocr_backends import BATCH_LIMIT, OCRBackendError, build_backends, needs_vision
+from .ocr_cache import build_ocr_cache
+from .ocr_queue import QueueFull, build_job_queue
+from .outbox import build_outbox, outbox_path, pending_rows
+from .preprocessing import parse_roi, preprocess_image
+from .room_cache import build_room_cache, room_version
+from .services import build_service_registry
+from .resilience import (
+    CircuitOpen, DeadlineExceeded, breaker_stats, call_upstream, call_upstream_async, deadline, is_transient, with_deadline
+)
+from .room_data import dumps, parse_fields, project, room_snapshot, validate_room_id
+from .upload_handlers import UploadRejected, check_upload, streaming_uploads
+from .vitals_history import SERIES, build_vitals_history
 
 # Load environment variables
 load_dotenv()
@@ -27,186 +47,471 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Heavy client libraries load on first use (or in the post-fork warm-up), so a
+# cold worker answers /health/ without importing them
+db = LazyModule('firebase_admin.db')
+
 # Global variables for services
-vision_client = None
-firebase_initialized = False
+services = build_service_registry()
+job_queue = None
+_job_queue_lock = threading.Lock()
+ocr_cache = build_ocr_cache() if settings.OCR_CACHE_ENABLED else None
+blob_store = None
+_blob_store_lock = threading.Lock()
+ocr_backends = None
+_ocr_backends_lock = threading.Lock()
+outbox = None
+room_cache = build_room_cache() if settings.ROOM_CACHE_ENABLED else None
+_outbox_lock = threading.Lock()
+vitals_history = build_vitals_history() if settings.VITALS_HISTORY_ENABLED else None
+event_hub = RoomEventHub(settings.SSE_REPLAY_EVENTS)
+fast_path = None
+_fast_path_lock = threading.Lock()
+# Async views hand blocking work to bounded pools and cap uploads in flight
+executors = build_executors()
+async_uploads = build_upload_limit()
 
 def initialize_services():
-    """Initialize Firebase and Google Vision services"""
-    global vision_client, firebase_initialized
-    
-    try:
-        # Initialize Firebase if not already done
-        if not firebase_initialized:
-            firebase_creds_json = os.environ.get('FIREBASE_CREDENTIALS_JSON')
-            firebase_url = os.environ.get('FIREBASE_DATABASE_URL')
-            
-            if not firebase_creds_json or not firebase_url:
-                logger.error("Missing Firebase credentials or database URL")
-                return False
-            
-            try:
-                firebase_creds = credentials.Certificate(json.loads(firebase_creds_json))
-                firebase_admin.initialize_app(
-                    firebase_creds,
-                    {'databaseURL': firebase_url}
-                )
-                firebase_initialized = True
-                logger.info("Firebase initialized successfully")
-            except Exception as e:
-                logger.error(f"Firebase initialization failed: {str(e)}")
-                return False
-        
-        # Initialize Google Vision
-        if vision_client is None:
-            # Check for credentials in environment
-            vision_creds_json = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS_JSON') or os.environ.get('VISION_KEY')
-            if vision_creds_json:
-                try:
-                    # Create temporary credentials file
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as f:
-                        if isinstance(vision_creds_json, str):
-                            f.write(vision_creds_json)
-                        else:
-                            json.dump(vision_creds_json, f)
-                        temp_creds_path = f.name
-                    
-                    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = temp_creds_path
-                    vision_client = vision.ImageAnnotatorClient()
-                    logger.info("Google Vision initialized successfully")
-                except Exception as e:
-                    logger.error(f"Google Vision initialization failed: {str(e)}")
-                    return False
-            else:
-                logger.error("Missing Google Vision credentials")
-                return False
-                
-        return True
-    except Exception as e:
-        logger.error(f"Service initialization failed: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        return False
+    """Make sure Firebase, and Vision when a capture type uses it, are ready.
+
+    Cheap once the services are up; after a failure it returns False at
+    once until the registry's backoff allows another attempt.
+    """
+    return services.ensure(vision=needs_vision())
 
 class OCRService:
-    PATTERNS = {
-        'temperature': r"(\d{1,3}[,.]?\d{0,2}\s?[°℃CF])|(\d{1,3}[,.]?\d{0,2})",
-        'weight': r"(\d{1,4}[,.]?\d{0,3}\s?[kK][gG])|(\d{1,4}[,.]?\d{0,3})",
-        'glucose': r"(\d{1,4}[,.]?\d{0,2}\s?(mg/dL|mmol/L)?)|(\d{1,4}[,.]?\d{0,2})",
-        'blood_pressure': r"\b(\d{2,3})[\/\-](\d{2,3})\s*(mmHg|mmhg|MMHG)?\b",
-        'endoscope': r".+"
-    }
+    CAPTURE_TYPES = tuple(extraction.EXTRACTORS)
+
+    @classmethod
+    def extract(cls, text, capture_type):
+        """Extract the structured reading (value, unit, span) from OCR text"""
+        return extraction.extract(text, capture_type)
 
     @classmethod
     def extract_value(cls, text, capture_type):
-        """Extract formatted value from OCR text with exact decimal preservation"""
-        if not text or text == "No text found":
-            return None
+        """Formatted reading from OCR text; decimals past the capture type's precision are truncated"""
+        reading = cls.extract(text, capture_type)
+        return reading.format() if reading else None
 
-        matches = re.findall(cls.PATTERNS[capture_type], text, re.IGNORECASE)
-        flat_matches = [m for group in matches for m in group if m]
+    @classmethod
+    def build_result(cls, raw_text, capture_type, backend_name=None):
+        """Turn raw OCR text into the result record stored for a capture"""
+        reading = cls.extract(raw_text, capture_type)
+        
+        return {
+            'raw_text': raw_text,
+            'formatted_value': reading.format() if reading else f"No {capture_type} detected",
+            'value': reading.value if reading else None,
+            'unit': reading.unit if reading else None,
+            'confidence': 'high' if reading else 'low',
+            'ocr_backend': backend_name,
+            'timestamp': datetime.utcnow().isoformat()
+        }
 
-        if not flat_matches:
+    @classmethod
+    def read_fast_path(cls, image_bytes, capture_type):
+        """Try the local seven-segment recognizer; returns a result record or None"""
+        seven_segment = get_fast_path()
+        if seven_segment is None or not seven_segment.handles(capture_type):
+            return None
+        
+        raw_text = seven_segment.read(image_bytes, capture_type)
+        if raw_text is None:
             return None
+        result = cls.build_result(raw_text, capture_type, 'sevenseg')
+        unit = seven_segment.units.get(capture_type)
+        if result['value'] is None or (unit and result['unit'] != unit):
+            # Confident digits that still don't make a valid reading, or a
+            # configured unit the extractor does not recognise
+            seven_segment.miss(capture_type)
+            return None
+        return result
 
-        # Get the first match and preserve original decimal formatting
-        raw_value = flat_matches[0]
-        
-        # Extract only digits, decimal points, and commas
-        clean_value = re.sub(r"[^\d.,]", "", raw_value)
-        
-        # Handle comma vs decimal point - preserve as found in OCR
-        if ',' in clean_value and '.' not in clean_value:
-            # If only comma exists, it's likely a decimal separator
-            numeric_value = clean_value.replace(',', '.')
-        elif '.' in clean_value and ',' not in clean_value:
-            # If only period exists, use as is
-            numeric_value = clean_value
-        elif ',' in clean_value and '.' in clean_value:
-            # Both exist - assume European format (comma as decimal)
-            # Remove thousand separators (dots) and convert decimal comma to dot
-            parts = clean_value.split(',')
-            if len(parts) == 2:
-                # Last comma is decimal separator
-                integer_part = parts[0].replace('.', '')
-                decimal_part = parts[1]
-                numeric_value = f"{integer_part}.{decimal_part}"
-            else:
-                # Fallback - use original
-                numeric_value = clean_value.replace(',', '.')
-        else:
-            # No decimal separators
-            numeric_value = clean_value
+    @classmethod
+    def process_image(cls, image_bytes, capture_type):
+        """Process image with the OCR backend configured for the capture type.
 
+        Seven-segment displays are read locally first when the fast path is
+        enabled; the backend only sees images it could not read confidently.
+        """
         try:
-            # Validate that we can parse it as a number, but don't convert to float
-            # to avoid precision loss
-            float(numeric_value)  # Just for validation
+            with stage('sevenseg'):
+                result = cls.read_fast_path(image_bytes, capture_type)
+            if result is not None:
+                return result
             
-            if capture_type == 'temperature':
-                return f"{numeric_value}°C"
-            elif capture_type == 'weight':
-                return f"{numeric_value} Kg"
-            elif capture_type == 'glucose':
-                return f"{numeric_value} mg/dL"
-            elif capture_type == 'blood_pressure':
-                return f"{clean_value} mmHg"
-            elif capture_type == 'endoscope':
-                return "Endoscopic data captured"
-            else:
-                return numeric_value
-                
-        except ValueError:
-            # If we can't parse as number, return None
-            return None
+            backend = get_ocr_backend(capture_type)
+            with stage('ocr'):
+                detected = call_upstream(backend.name, lambda: backend.detect_text(image_bytes))
+            raw_text = detected.text or "No text found"
+            return cls.build_result(raw_text, capture_type, backend.name)
+        except Exception as e:
+            logger.error(f"OCR processing failed: {str(e)}")
+            raise
 
     @classmethod
-    def process_image(cls, image_bytes, capture_type):
-        """Process image with Google Vision OCR"""
+    async def process_image_async(cls, image_bytes, capture_type):
+        """process_image for async views: the OCR call is awaited, NumPy work runs in the CPU pool"""
         try:
-            if not vision_client:
-                raise Exception("Vision client not initialized")
+            if settings.SEVEN_SEGMENT_ENABLED:
+                with stage('sevenseg'):
+                    result = await executors.run('cpu', cls.read_fast_path, image_bytes, capture_type)
+                if result is not None:
+                    return result
             
-            image = vision.Image(content=image_bytes)
-            response = vision_client.document_text_detection(image=image)
-            
-            if response.error.message:
-                raise Exception(f"Vision API error: {response.error.message}")
-                
-            texts = response.text_annotations
-            raw_text = texts[0].description if texts else "No text found"
-            formatted_value = cls.extract_value(raw_text, capture_type)
-            
-            return {
-                'raw_text': raw_text,
-                'formatted_value': formatted_value or f"No {capture_type} detected",
-                'confidence': 'high' if formatted_value else 'low',
-                'timestamp': datetime.utcnow().isoformat()
-            }
+            backend = get_ocr_backend(capture_type)
+            pool = executors.get('cpu' if backend.cpu_bound else 'io')
+            with stage('ocr'):
+                detected = await call_upstream_async(
+                    backend.name, lambda: backend.detect_text_async(image_bytes, pool)
+                )
+            raw_text = detected.text or "No text found"
+            return cls.build_result(raw_text, capture_type, backend.name)
         except Exception as e:
             logger.error(f"OCR processing failed: {str(e)}")
             raise
 
-def save_to_firebase(room_id, capture_type, data, image_base64=None):
-    """Save data to Firebase with optional image"""
-    try:
-        if not firebase_initialized:
-            raise Exception("Firebase not initialized")
+    @classmethod
+    def process_batch(cls, items):
+        """OCR several (image_bytes, capture_type) pairs, one batch call per backend.
+
+        Returns one entry per item, in order: the result record, or an
+        ``{'error': message}`` dict when the backend could not read that image.
+        """
+        results = [None] * len(items)
+        by_backend = {}
+        for i, (image_bytes, capture_type) in enumerate(items):
+            with stage('sevenseg'):
+                results[i] = cls.read_fast_path(image_bytes, capture_type)
+            if results[i] is None:
+                backend = get_ocr_backend(capture_type)
+                by_backend.setdefault(id(backend), (backend, []))[1].append(i)
+        
+        for backend, indexes in by_backend.values():
+            try:
+                images = [items[i][0] for i in indexes]
+                with stage('ocr'):
+                    detected = call_upstream(backend.name, lambda: backend.detect_text_batch(images))
+            except Exception as e:
+                logger.error(f"Batch OCR processing failed: {str(e)}")
+                raise
             
+            for i, entry in zip(indexes, detected):
+                capture_type = items[i][1]
+                if isinstance(entry, OCRBackendError):
+                    logger.error(f"OCR failed for {capture_type}: {str(entry)}")
+                    results[i] = {'error': str(entry)}
+                    continue
+                results[i] = cls.build_result(entry.text or "No text found", capture_type, backend.name)
+        return results
+
+def get_fast_path():
+    """Return the seven-segment recognizer, or None when it is disabled"""
+    global fast_path
+    
+    if not settings.SEVEN_SEGMENT_ENABLED:
+        return None
+    with _fast_path_lock:
+        if fast_path is None:
+            # Imported here: the recognizer pulls in NumPy and Pillow
+            from .sevenseg import FastPath
+            fast_path = FastPath(settings.SEVEN_SEGMENT_MIN_CONFIDENCE, getattr(settings, 'SEVEN_SEGMENT_UNITS', {}))
+    return fast_path
+
+def get_ocr_backend(capture_type):
+    """Return the OCR backend configured for a capture type"""
+    global ocr_backends
+    
+    with _ocr_backends_lock:
+        if ocr_backends is None:
+            ocr_backends = build_backends(lambda: services.vision_client, services.vision_async_client)
+    return ocr_backends.get(capture_type, ocr_backends['default'])
+
+def run_ocr(image_bytes, capture_type, digest=None):
+    """OCR an image, answering repeated uploads of the same bytes from the cache"""
+    if ocr_cache is None:
+        return OCRService.process_image(image_bytes, capture_type)
+    
+    key = ocr_cache.make_key(image_bytes, capture_type, digest=digest)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        logger.info(f"OCR cache hit for {capture_type}")
+        # A retried upload is still a new capture for the room
+        cached['timestamp'] = datetime.utcnow().isoformat()
+        return cached
+    
+    ocr_results = OCRService.process_image(image_bytes, capture_type)
+    ocr_cache.set(key, ocr_results)
+    return ocr_results
+
+async def run_ocr_async(image_bytes, capture_type, digest=None):
+    """run_ocr for async views; cache lookups may touch disk, so they run in the I/O pool"""
+    if ocr_cache is None:
+        return await OCRService.process_image_async(image_bytes, capture_type)
+    
+    key = ocr_cache.make_key(image_bytes, capture_type, digest=digest)
+    cached = await executors.run('io', ocr_cache.get, key)
+    if cached is not None:
+        logger.info(f"OCR cache hit for {capture_type}")
+        cached['timestamp'] = datetime.utcnow().isoformat()
+        return cached
+    
+    ocr_results = await OCRService.process_image_async(image_bytes, capture_type)
+    await executors.run('io', ocr_cache.set, key, ocr_results)
+    return ocr_results
+
+def run_ocr_batch(items, digests=None):
+    """Batch counterpart of run_ocr: only cache misses are sent to Vision"""
+    if ocr_cache is None:
+        return OCRService.process_batch(items)
+    
+    results = [None] * len(items)
+    keys = [
+        ocr_cache.make_key(image_bytes, capture_type, digest=digest)
+        for (image_bytes, capture_type), digest in zip(items, digests or [None] * len(items))
+    ]
+    misses = []
+    for i, key in enumerate(keys):
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            cached['timestamp'] = datetime.utcnow().isoformat()
+            results[i] = cached
+        else:
+            misses.append(i)
+    
+    if misses:
+        fresh = OCRService.process_batch([items[i] for i in misses])
+        for i, ocr_results in zip(misses, fresh):
+            if 'error' not in ocr_results:
+                ocr_cache.set(keys[i], ocr_results)
+            results[i] = ocr_results
+    return results
+
+def room_written(room_id, updates):
+    """Refresh the room cache, notify event streams and record history after a room write"""
+    # Copy: callers go on to strip image payloads from their dicts
+    updates = {capture_type: dict(data) for capture_type, data in updates.items()}
+    if room_cache:
+        room_cache.apply(room_id, updates)
+    event_hub.publish(room_id, updates)
+    if vitals_history:
+        for capture_type, data in updates.items():
+            try:
+                vitals_history.append(room_id, capture_type, data)
+            except Exception as e:
+                logger.warning(f"Failed to record {capture_type} history for room {room_id}: {str(e)}")
+
+def save_to_firebase(room_id, capture_type, data, image_fields=None):
+    """Save data to Firebase with optional image fields from prepare_image"""
+    try:
         # Add image data if provided
-        if image_base64:
-            data['captured_image'] = image_base64
+        if image_fields:
+            data.update(image_fields)
+        
+        write_behind = outbox_for(room_id)
+        if write_behind:
+            with stage('outbox'):
+                write_behind.enqueue(room_id, {capture_type: data})
+            room_written(room_id, {capture_type: data})
+            logger.info(f"Queued {capture_type} data for Firebase for room {room_id}")
+            return
+        
+        if not services.firebase_ready:
+            raise Exception("Firebase not initialized")
             
         path = f'telehealth_data/{room_id}/{capture_type}'
         ref = db.reference(path)
-        ref.set(data)
+        try:
+            with stage('firebase_write'):
+                call_upstream('firebase', lambda: ref.set(data))
+        except Exception as e:
+            if degrade_to_outbox(room_id, {capture_type: data}, e):
+                return
+            raise
+        room_written(room_id, {capture_type: data})
         logger.info(f"Saved {capture_type} data to Firebase for room {room_id}")
     except Exception as e:
         logger.error(f"Firebase save failed: {str(e)}")
         raise
 
+def save_batch_to_firebase(room_id, results):
+    """Write several capture results for a room in one multi-path update.
+
+    ``results`` maps capture type to ``(data, image_fields)``.
+    """
+    try:
+        updates = {}
+        for capture_type, (data, image_fields) in results.items():
+            if image_fields:
+                data.update(image_fields)
+            updates[capture_type] = data
+        
+        write_behind = outbox_for(room_id)
+        if write_behind:
+            with stage('outbox'):
+                write_behind.enqueue(room_id, updates)
+            room_written(room_id, updates)
+            logger.info(f"Queued {', '.join(updates)} data for Firebase for room {room_id}")
+            return
+        
+        if not services.firebase_ready:
+            raise Exception("Firebase not initialized")
+        
+        try:
+            with stage('firebase_write'):
+                call_upstream('firebase', lambda: db.reference(f'telehealth_data/{room_id}').update(updates))
+        except Exception as e:
+            if degrade_to_outbox(room_id, updates, e):
+                return
+            raise
+        room_written(room_id, updates)
+        logger.info(f"Saved {', '.join(updates)} data to Firebase for room {room_id}")
+    except Exception as e:
+        logger.error(f"Firebase batch save failed: {str(e)}")
+        raise
+
+def write_room_updates(room_id, updates):
+    """Outbox writer: apply ``{capture_type: data}`` to a room in one update"""
+    if not services.firebase_ready and not initialize_services():
+        raise Exception("Firebase not initialized")
+    # No retries here: the outbox flusher backs off and retries on its own
+    call_upstream('firebase', lambda: db.reference(f'telehealth_data/{room_id}').update(updates), retries=0)
+    if room_cache:
+        # The cached copy already has these writes; drop it so the next read sees Firebase
+        room_cache.invalidate(room_id)
+    logger.info(f"Flushed {', '.join(updates)} data to Firebase for room {room_id}")
+
+def degrade_to_outbox(room_id, updates, error):
+    """Hand a write Firebase could not take to the outbox; returns False when that does not apply"""
+    if not settings.FIREBASE_DEGRADE_TO_OUTBOX:
+        return False
+    if not isinstance(error, (CircuitOpen, DeadlineExceeded)) and not is_transient(error):
+        return False
+    get_outbox(force=True).enqueue(room_id, updates)
+    room_written(room_id, updates)
+    logger.warning(f"Firebase unavailable ({str(error)}); queued {', '.join(updates)} for room {room_id} in the outbox")
+    return True
+
+def get_outbox(force=False):
+    """Return the write-behind outbox, starting its flusher, or None when writes go straight to Firebase.
+
+    ``force`` creates it even without write-behind mode, as a fallback while Firebase is down.
+    """
+    global outbox
+    
+    if not (settings.FIREBASE_WRITE_BEHIND or force):
+        return None
+    with _outbox_lock:
+        if outbox is None:
+            outbox = build_outbox(write_room_updates)
+            # Rows left by a previous process are replayed on the first flush
+            outbox.start()
+    return outbox
+
+def resume_outbox():
+    """Start the outbox at startup when write-behind is on or a previous process left rows in it"""
+    return get_outbox(force=pending_rows(outbox_path()) > 0)
+
+def outbox_for(room_id):
+    """Return the outbox when writes for a room must go through it, else None.
+
+    That is every write in write-behind mode. Otherwise it is writes to a
+    room that still has rows queued during a Firebase outage: written
+    directly, they would land first and be overwritten by the older rows
+    when the flusher catches up.
+    """
+    write_behind = get_outbox()
+    if write_behind is not None:
+        return write_behind
+    if outbox is None and not os.path.exists(outbox_path()):
+        return None
+    write_behind = get_outbox(force=True)
+    return write_behind if write_behind.has_pending(room_id) else None
+
+def prepare_image(image_file, capture_type, roi=None):
+    """Preprocess an upload for OCR.
+
+    Returns the JPEG bytes, the image fields to store with the result and
+    the preprocessing stats. With the blob store enabled the record only
+    gets a small ``captured_image_ref``; otherwise the base64 JPEG is
+    embedded as ``captured_image``.
+    """
+    check_upload(image_file, capture_type)
+    image_bytes, stats = preprocess_image(image_file, capture_type, roi=roi)
+    record_stage('decode', stats['decode_ms'])
+    record_stage('encode', stats['encode_ms'])
+    store = get_blob_store()
+    if store is None:
+        with stage('base64'):
+            image_fields = {'captured_image': base64.b64encode(image_bytes).decode('utf-8')}
+        stats['buffered_bytes'] = len(image_bytes) + len(image_fields['captured_image'])
+    else:
+        with stage('blob_store'):
+            digest = store.put(image_bytes, digest=stats.get('sha256'))
+        stats['sha256'] = digest
+        stats['buffered_bytes'] = len(image_bytes)
+        width, height = stats['size']
+        image_fields = {'captured_image_ref': {
+            'digest': digest,
+            'url': f"/api/images/{digest}/",
+            'content_type': 'image/jpeg',
+            'bytes': len(image_bytes),
+            'width': width,
+            'height': height
+        }}
+    return image_bytes, image_fields, stats
+
+def get_blob_store():
+    """Return the process-wide blob store, or None when images stay in Firebase"""
+    global blob_store
+    
+    if not settings.BLOB_STORE_ENABLED:
+        return None
+    with _blob_store_lock:
+        if blob_store is None:
+            blob_store = build_blob_store()
+    return blob_store
+
+def run_ocr_job(job):
+    """Worker stage: OCR the image and save the result to Firebase"""
+    payload = job.payload
+    capture_type = payload['capture_type']
+    room_id = payload['room_id']
+    
+    with deadline(settings.OCR_JOB_DEADLINE_SECONDS):
+        ocr_results = run_ocr(payload['image_bytes'], capture_type, digest=payload['image_digest'])
+        save_to_firebase(room_id, capture_type, ocr_results, image_fields=payload['image_fields'])
+    
+    # The image already lives in Firebase; don't keep it in the job table
+    ocr_results.pop('captured_image', None)
+    logger.info(f"[{payload['request_id']}] OCR job {job.id} completed")
+    return {
+        'room_id': room_id,
+        'capture_type': capture_type,
+        **ocr_results
+    }
+
+def get_job_queue():
+    """Return the process-wide OCR job queue, starting it on first use"""
+    global job_queue
+    
+    with _job_queue_lock:
+        if job_queue is None:
+            job_queue = build_job_queue(run_ocr_job)
+    return job_queue
+
+def wants_async(request):
+    """Whether this upload should be queued instead of processed inline"""
+    flag = request.POST.get('async')
+    if flag is None:
+        return settings.OCR_ASYNC_MODE
+    return flag.lower() in ('1', 'true', 'yes')
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@timed('upload')
+@streaming_uploads()
+@with_deadline(settings.REQUEST_DEADLINE_SECONDS)
 def upload_image(request):
     """Handle image upload and OCR processing"""
     request_id = f"req-{datetime.now().timestamp()}"
@@ -217,62 +522,310 @@ def upload_image(request):
         if not initialize_services():
             raise Exception("Failed to initialize required services")
         
-        # Validate request
-        if not request.FILES.get('image'):
+        # Validate request; reading FILES streams the multipart body in
+        with stage('upload'):
+            image_file = request.FILES.get('image')
+        if request.upload_errors:
+            raise UploadRejected('; '.join(request.upload_errors))
+        if not image_file:
             raise ValueError("No image file uploaded")
         
-        image_file = request.FILES['image']
         capture_type = request.POST.get('type', 'temperature')
-        room_id = request.POST.get('roomId', 'default-room')
+        room_id = validate_room_id(request.POST.get('roomId', 'default-room'))
+        label(capture_type=capture_type)
         
         logger.info(f"[{request_id}] Processing {capture_type} for room {room_id}")
         
         # Process image
-        try:
-            with Image.open(image_file) as img:
-                if img.mode == 'RGBA':
-                    img = img.convert('RGB')
-                
-                img_bytes = io.BytesIO()
-                img.save(img_bytes, format='JPEG', quality=90, optimize=True)
-                image_bytes = img_bytes.getvalue()
-                import base64
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                
-        except Exception as e:
-            raise ValueError(f"Invalid image file: {str(e)}")
+        image_bytes, image_fields, image_stats = prepare_image(
+            image_file, capture_type, roi=parse_roi(request.POST.get('roi'))
+        )
+        logger.info(
+            f"[{request_id}] Image {image_stats['bytes_in']}B -> {image_stats['bytes_out']}B "
+            f"(decode {image_stats['decode_ms']}ms, encode {image_stats['encode_ms']}ms, "
+            f"reencoded={image_stats['reencoded']}, upload copies {image_stats['upload_copies']}, "
+            f"buffered {image_stats['buffered_bytes']}B)"
+        )
+        
+        if wants_async(request):
+            return queue_upload(request_id, room_id, capture_type, image_bytes, image_fields, image_stats)
         
         # Perform OCR
-        ocr_results = OCRService.process_image(image_bytes, capture_type)
+        ocr_results = run_ocr(image_bytes, capture_type, digest=image_stats.get('sha256'))
         
         # Save to Firebase
-        save_to_firebase(room_id, capture_type, ocr_results, image_base64=image_base64)
+        save_to_firebase(room_id, capture_type, ocr_results, image_fields=image_fields)
         
-        # Return success response
-        response_data = {
-            'status': 'success',
+        logger.info(f"[{request_id}] Upload processed successfully")
+        return upload_succeeded(request_id, room_id, capture_type, ocr_results, image_stats)
+        
+    except Exception as e:
+        return upload_failed(request_id, e)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@timed('upload')
+@streaming_uploads()
+@with_deadline(settings.REQUEST_DEADLINE_SECONDS)
+async def upload_image_async(request):
+    """upload_image for the ASGI stack.
+
+    The OCR call is awaited, and Pillow work and Firebase writes run in
+    bounded pools, so a worker holds many uploads in flight without a
+    thread each.
+    """
+    request_id = f"req-{datetime.now().timestamp()}"
+    if not async_uploads.acquire():
+        logger.warning(f"[{request_id}] Upload rejected: too many uploads in flight")
+        response = JsonResponse({
+            'status': 'error',
+            'message': "Too many uploads in flight, try again shortly",
+            'request_id': request_id
+        }, status=503)
+        response['Retry-After'] = '1'
+        return response
+    
+    try:
+        if not await executors.run('io', initialize_services):
+            raise Exception("Failed to initialize required services")
+        
+        with stage('upload'):
+            # Parsing the multipart body reads and hashes the spooled upload
+            image_file = await executors.run('io', lambda: request.FILES.get('image'))
+        if request.upload_errors:
+            raise UploadRejected('; '.join(request.upload_errors))
+        if not image_file:
+            raise ValueError("No image file uploaded")
+        
+        capture_type = request.POST.get('type', 'temperature')
+        room_id = validate_room_id(request.POST.get('roomId', 'default-room'))
+        label(capture_type=capture_type)
+        
+        image_bytes, image_fields, image_stats = await executors.run(
+            'cpu', prepare_image, image_file, capture_type, roi=parse_roi(request.POST.get('roi'))
+        )
+        
+        if wants_async(request):
+            return queue_upload(request_id, room_id, capture_type, image_bytes, image_fields, image_stats)
+        
+        ocr_results = await run_ocr_async(image_bytes, capture_type, digest=image_stats.get('sha256'))
+        await executors.run('io', save_to_firebase, room_id, capture_type, ocr_results, image_fields=image_fields)
+        
+        logger.info(f"[{request_id}] Upload processed successfully")
+        return upload_succeeded(request_id, room_id, capture_type, ocr_results, image_stats)
+        
+    except Exception as e:
+        return upload_failed(request_id, e)
+    finally:
+        async_uploads.release()
+
+def queue_upload(request_id, room_id, capture_type, image_bytes, image_fields, image_stats):
+    """Hand a prepared upload to the OCR job queue and answer 202"""
+    job = get_job_queue().submit({
+        'request_id': request_id,
+        'room_id': room_id,
+        'capture_type': capture_type,
+        'image_bytes': image_bytes,
+        'image_digest': image_stats.get('sha256'),
+        'image_fields': image_fields
+    })
+    logger.info(f"[{request_id}] Queued as OCR job {job.id}")
+    return JsonResponse({
+        'status': 'accepted',
+        'job_id': job.id,
+        'status_url': f"/api/jobs/{job.id}/",
+        'preprocessing': image_stats,
+        'request_id': request_id
+    }, status=202)
+
+def upload_succeeded(request_id, room_id, capture_type, ocr_results, image_stats):
+    return JsonResponse({
+        'status': 'success',
+        'data': {
+            'room_id': room_id,
+            'capture_type': capture_type,
+            **ocr_results
+        },
+        'preprocessing': image_stats,
+        'request_id': request_id
+    })
+
+def upload_failed(request_id, error, action='Upload'):
+    """Error response for an upload, with the status code matching the failure"""
+    body = {
+        'status': 'error',
+        'message': str(error),
+        'request_id': request_id
+    }
+    if isinstance(error, QueueFull):
+        logger.warning(f"[{request_id}] {action} rejected: {str(error)}")
+        response = JsonResponse(body, status=503)
+        response['Retry-After'] = '5'
+        return response
+    if isinstance(error, UploadRejected):
+        logger.warning(f"[{request_id}] {action} rejected: {str(error)}")
+        return JsonResponse(body, status=413)
+    if isinstance(error, CircuitOpen):
+        logger.warning(f"[{request_id}] {action} failed fast: {str(error)}")
+        response = JsonResponse(body, status=503)
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+        return response
+    if isinstance(error, DeadlineExceeded):
+        logger.error(f"[{request_id}] {action} timed out: {str(error)}")
+        return JsonResponse(body, status=504)
+    logger.error(f"[{request_id}] {action} failed: {str(error)}")
+    return JsonResponse(body, status=400)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@timed('upload_batch')
+@streaming_uploads(max_files=BATCH_LIMIT)
+@with_deadline(settings.REQUEST_DEADLINE_SECONDS)
+def upload_batch(request):
+    """Handle several captures for one room in a single request.
+
+    Expects repeated ``images`` files with a parallel list of ``types``.
+    When a type appears more than once, the last image wins.
+    """
+    request_id = f"req-{datetime.now().timestamp()}"
+    logger.info(f"[{request_id}] Processing batch upload request")
+    
+    try:
+        if not initialize_services():
+            raise Exception("Failed to initialize required services")
+        
+        # Reading FILES streams the multipart body in
+        with stage('upload'):
+            image_files = request.FILES.getlist('images')
+        if request.upload_errors:
+            raise UploadRejected('; '.join(request.upload_errors))
+        
+        capture_types = request.POST.getlist('types')
+        room_id = validate_room_id(request.POST.get('roomId', 'default-room'))
+        
+        if not image_files:
+            raise ValueError("No image files uploaded")
+        if len(image_files) != len(capture_types):
+            raise ValueError(f"Got {len(image_files)} images but {len(capture_types)} types")
+        unknown = set(capture_types) - set(OCRService.CAPTURE_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown capture type(s): {', '.join(sorted(unknown))}")
+        
+        logger.info(f"[{request_id}] Processing {', '.join(capture_types)} for room {room_id}")
+        
+        rois = request.POST.getlist('rois') or [None] * len(image_files)
+        if len(rois) != len(image_files):
+            raise ValueError(f"Got {len(image_files)} images but {len(rois)} rois")
+        
+        prepared = [
+            prepare_image(image_file, capture_type, roi=parse_roi(roi))
+            for image_file, capture_type, roi in zip(image_files, capture_types, rois)
+        ]
+        ocr_results = run_ocr_batch(
+            [
+                (image_bytes, capture_type)
+                for (image_bytes, _, _), capture_type in zip(prepared, capture_types)
+            ],
+            digests=[image_stats.get('sha256') for _, _, image_stats in prepared]
+        )
+        
+        to_save = {}
+        items = []
+        for capture_type, (_, image_fields, image_stats), result in zip(capture_types, prepared, ocr_results):
+            if 'error' in result:
+                items.append({'capture_type': capture_type, 'status': 'error', 'message': result['error']})
+                continue
+            to_save[capture_type] = (result, image_fields)
+            items.append({
+                'capture_type': capture_type,
+                'status': 'success',
+                **result,
+                'preprocessing': image_stats
+            })
+        
+        if to_save:
+            save_batch_to_firebase(room_id, to_save)
+        
+        logger.info(f"[{request_id}] Batch processed: {len(to_save)} saved, {len(items) - len(to_save)} failed")
+        return JsonResponse({
+            'status': 'success' if to_save else 'error',
             'data': {
                 'room_id': room_id,
-                'capture_type': capture_type,
-                **ocr_results
+                'results': items
             },
             'request_id': request_id
-        }
-        
-        logger.info(f"[{request_id}] Upload processed successfully")
-        return JsonResponse(response_data)
+        }, status=200 if to_save else 400)
         
     except Exception as e:
-        logger.error(f"[{request_id}] Upload failed: {str(e)}")
+        return upload_failed(request_id, e, action='Batch upload')
+
+@require_http_methods(["GET"])
+def captured_image(request, digest):
+    """Stream a stored capture image; blobs never change, so cache them for good"""
+    store = get_blob_store()
+    if store is None:
         return JsonResponse({
             'status': 'error',
-            'message': str(e),
-            'request_id': request_id
-        }, status=400)
+            'message': "Image blob store is not enabled"
+        }, status=404)
+    
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    else:
+        try:
+            response = FileResponse(store.open(digest), content_type='image/jpeg')
+        except BlobNotFound as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=404)
+    response['ETag'] = etag
+    # Patient images: browsers may keep them, shared caches and CDNs must not
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 @require_http_methods(["GET"])
+def job_status(request, job_id):
+    """Report the state of a queued OCR job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Unknown job {job_id}"
+        }, status=404)
+    return JsonResponse({
+        'status': 'success',
+        'data': job.to_dict()
+    })
+
+@require_http_methods(["GET"])
+def job_metrics(request):
+    """Queue depth, age and throughput counters for the OCR job queue"""
+    return JsonResponse({
+        'status': 'success',
+        'data': get_job_queue().metrics(),
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+def load_room(room_id):
+    """Return ``(version, room)`` for a room, read through the room cache"""
+    cached = room_cache.get(room_id) if room_cache else None
+    if cached:
+        return cached
+    # Taken before the read, so a write landing during it keeps this read out of the cache
+    generation = room_cache.generation(room_id) if room_cache else None
+    # One read of the room node instead of one round trip per capture type
+    with stage('firebase_read'):
+        room = call_upstream('firebase', lambda: db.reference(f'telehealth_data/{room_id}').get())
+    version = room_cache.fill(room_id, room, generation) if room_cache else room_version(room)
+    return version, room
+
+@require_http_methods(["GET"])
+@timed('get_data')
+@with_deadline(settings.REQUEST_DEADLINE_SECONDS)
 def get_captured_data(request):
-    """Retrieve captured data from Firebase"""
+    """Retrieve captured data from Firebase, optionally projected with ``fields=``"""
     try:
         if not initialize_services():
             raise Exception("Failed to initialize Firebase")
@@ -281,31 +834,264 @@ def get_captured_data(request):
         if not room_id:
             raise ValueError("Missing roomId parameter")
         
-        # Get data from Firebase
-        temperature_ref = db.reference(f'telehealth_data/{room_id}/temperature')
-        weight_ref = db.reference(f'telehealth_data/{room_id}/weight')
-        glucose_ref = db.reference(f'telehealth_data/{room_id}/glucose')
-        blood_pressure = db.reference(f'telehealth_data/{room_id}/blood_pressure')
-        endoscope_ref = db.reference(f'telehealth_data/{room_id}/endoscope')
+        version, room = load_room(room_id)
+        return room_data_response(request, version, room)
+    except Exception as e:
+        return data_retrieval_failed(e)
+
+@require_http_methods(["GET"])
+@timed('get_data')
+@with_deadline(settings.REQUEST_DEADLINE_SECONDS)
+async def get_captured_data_async(request):
+    """get_captured_data for the ASGI stack; the Firebase read runs in the I/O pool"""
+    try:
+        if not await executors.run('io', initialize_services):
+            raise Exception("Failed to initialize Firebase")
+            
+        room_id = request.GET.get("roomId")
+        if not room_id:
+            raise ValueError("Missing roomId parameter")
         
-        temperature_data = temperature_ref.get()
-        weight_data = weight_ref.get()
-        glucose_data = glucose_ref.get()
-        blood_pressure_data = blood_pressure.get()
-        endoscope_data = endoscope_ref.get()
+        version, room = await executors.run('io', load_room, room_id)
+        return room_data_response(request, version, room)
+    except Exception as e:
+        return data_retrieval_failed(e)
+
+def room_data_response(request, version, room):
+    """get-data response for a room: projected with ``fields=``, 304 when the client's ETag matches"""
+    fields = request.GET.get("fields", "")
+    include, exclude = parse_fields(fields)
+    
+    # The body depends on the projection too, so it is part of the tag
+    etag = f'"{version}-{room_version(fields)[:8]}"' if fields else f'"{version}"'
+    not_modified = request.headers.get('If-None-Match') == etag
+    if room_cache:
+        room_cache.record_response(not_modified)
+    if not_modified:
+        response = HttpResponse(status=304)
+    else:
+        with stage('serialize'):
+            body = dumps({
+                'status': 'success',
+                'data': room_snapshot(room, OCRService.CAPTURE_TYPES, include, exclude)
+            })
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Let browsers keep the body but revalidate on every poll
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def data_retrieval_failed(error):
+    if isinstance(error, CircuitOpen):
+        logger.warning(f"Data retrieval failed fast: {str(error)}")
+        response = JsonResponse({
+            'status': 'error',
+            'message': str(error)
+        }, status=503)
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+        return response
+    logger.error(f"Data retrieval failed: {str(error)}")
+    return JsonResponse({
+        'status': 'error',
+        'message': str(error)
+    }, status=400)
+
+def parse_time(value, default):
+    """Epoch seconds from an ISO 8601 string or a number of seconds"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        stamp = datetime.fromisoformat(value)
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        return stamp.timestamp()
+
+@require_http_methods(["GET"])
+def vitals_history_view(request):
+    """Readings of one capture type for a room over a time range, optionally downsampled"""
+    try:
+        if vitals_history is None:
+            raise Exception("Vitals history is disabled")
         
-        return JsonResponse({
+        room_id = request.GET.get("roomId")
+        capture_type = request.GET.get("type")
+        if not room_id:
+            raise ValueError("Missing roomId parameter")
+        if capture_type not in SERIES:
+            raise ValueError(f"History is kept for {', '.join(SERIES)}, not '{capture_type}'")
+        
+        end = parse_time(request.GET.get("end"), datetime.now(timezone.utc).timestamp())
+        start = parse_time(request.GET.get("start"), end - 7 * 86400)
+        if start >= end:
+            raise ValueError("start must be before end")
+        bucket = request.GET.get("bucket")
+        buckets = request.GET.get("buckets")
+        if bucket:
+            try:
+                bucket = float(bucket)
+            except ValueError:
+                raise ValueError(f"bucket must be a number of seconds, not '{bucket}'")
+            if not math.isfinite(bucket) or bucket <= 0:
+                raise ValueError("bucket must be a positive number of seconds")
+        elif buckets:
+            if not buckets.isdigit() or int(buckets) == 0:
+                raise ValueError(f"buckets must be a positive integer, not '{buckets}'")
+            bucket = (end - start) / int(buckets)
+        
+        return HttpResponse(dumps({
             'status': 'success',
-            'data': {
-                'temperature': temperature_data,
-                'weight': weight_data,
-                'glucose': glucose_data,
-                'blood_pressure': blood_pressure_data,
-                'endoscope': endoscope_data
-            }
+            'room_id': room_id,
+            'capture_type': capture_type,
+            'start': start,
+            'end': end,
+            **vitals_history.query(room_id, capture_type, start, end, bucket)
+        }), content_type='application/json')
+    except Exception as e:
+        logger.error(f"History query failed: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+def export_vitals_stream(source='latest', rooms=None, capture_types=None, start=None, end=None,
+                         include_images=False, fmt='ndjson', label='Vitals export'):
+    """Build a streaming vitals export; returns ``(chunks, stats)``.
+
+    ``source`` is ``latest`` (current Firebase records, read one room at
+    a time) or ``history`` (every recorded reading). Rooms default to all
+    rooms of that source.
+    """
+    if fmt not in export.FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; use {', '.join(export.FORMATS)}")
+    capture_types = capture_types or list(OCRService.CAPTURE_TYPES)
+    unknown = set(capture_types) - set(OCRService.CAPTURE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown capture types: {', '.join(sorted(unknown))}")
+    
+    if source == 'latest':
+        if not initialize_services():
+            raise Exception("Failed to initialize Firebase")
+        if not rooms:
+            rooms = sorted(db.reference('telehealth_data').get(shallow=True) or {})
+        # Straight from Firebase: exports must not churn the polling cache
+        rows = export.latest_rows(
+            lambda room_id: db.reference(f'telehealth_data/{room_id}').get(),
+            rooms, capture_types, start, end, include_images
+        )
+        columns = export.LATEST_COLUMNS + (list(export.IMAGE_FIELDS) if include_images else [])
+    elif source == 'history':
+        if vitals_history is None:
+            raise Exception("Vitals history is disabled")
+        rows = export.history_rows(
+            vitals_history, rooms or vitals_history.rooms(), capture_types,
+            start if start is not None else 0.0,
+            end if end is not None else datetime.now(timezone.utc).timestamp() + 1
+        )
+        columns = export.HISTORY_COLUMNS
+    else:
+        raise ValueError(f"Unknown export source '{source}'; use latest or history")
+    
+    stats = export.ExportStats(label)
+    return export.encode(rows, columns, fmt, stats), stats
+
+@require_http_methods(["GET"])
+def export_vitals(request):
+    """Stream vitals for many rooms as NDJSON or CSV, without image payloads by default"""
+    try:
+        fmt = request.GET.get("format", "ndjson")
+        rooms = [r for r in request.GET.get("rooms", "").split(',') if r]
+        capture_types = [t for t in request.GET.get("types", "").split(',') if t]
+        chunks, stats = export_vitals_stream(
+            source=request.GET.get("source", "latest"),
+            rooms=rooms,
+            capture_types=capture_types,
+            start=parse_time(request.GET.get("start"), None),
+            end=parse_time(request.GET.get("end"), None),
+            include_images=request.GET.get("images", "").lower() in ('1', 'true', 'yes'),
+            fmt=fmt,
+            label=f"HTTP vitals export for {request.META.get('REMOTE_ADDR')}"
+        )
+        
+        response = StreamingHttpResponse(chunks, content_type=export.FORMATS[fmt])
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="vitals-{stamp}.{fmt}"'
+        return response
+    except Exception as e:
+        logger.error(f"Export failed: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+async def stream_room_events(subscriber, backlog, seq, include, exclude):
+    """Server-sent events for one subscriber: snapshot or replay, then live writes"""
+    room_id = subscriber.room_id
+    
+    async def snapshot(seq):
+        _, room = await sync_to_async(load_room)(room_id)
+        return format_event(event_hub.event_id(seq), 'snapshot', {
+            'room_id': room_id,
+            'data': room_snapshot(room, OCRService.CAPTURE_TYPES, include, exclude)
         })
+    
+    def vitals(event):
+        seq, updates = event
+        return format_event(event_hub.event_id(seq), 'vitals', {
+            'room_id': room_id,
+            'data': {capture_type: project(data, include, exclude) for capture_type, data in updates.items()}
+        })
+    
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n".encode('utf-8')
+        if backlog is None:
+            yield await snapshot(seq)
+        else:
+            for event in backlog:
+                yield vitals(event)
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield b": heartbeat\n\n"
+                continue
+            if event is RESYNC:
+                logger.warning(f"Event stream for room {room_id} fell behind; sending a snapshot")
+                yield await snapshot(event_hub.last_seq)
+            else:
+                yield vitals(event)
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+@require_http_methods(["GET"])
+async def room_events(request):
+    """Stream a room's vitals as server-sent events (serve through the ASGI app)"""
+    try:
+        if not await sync_to_async(initialize_services)():
+            raise Exception("Failed to initialize Firebase")
+        
+        room_id = request.GET.get("roomId")
+        if not room_id:
+            raise ValueError("Missing roomId parameter")
+        
+        include, exclude = parse_fields(request.GET.get("fields"))
+        # EventSource resends the last id it saw when it reconnects
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('lastEventId')
+        subscriber, backlog, seq = event_hub.subscribe(room_id, last_event_id)
+        
+        response = StreamingHttpResponse(
+            stream_room_events(subscriber, backlog, seq, include, exclude),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
     except Exception as e:
-        logger.error(f"Data retrieval failed: {str(e)}")
+        logger.error(f"Event stream failed: {str(e)}")
         return JsonResponse({
             'status': 'error',
             'message': str(e)
@@ -315,14 +1101,25 @@ def get_captured_data(request):
 def health_check(request):
     """Health check endpoint"""
     try:
-        services_ok = initialize_services()
+        # Readiness comes from the background probe; nothing is initialized here
+        readiness = services.readiness()
         return JsonResponse({
-            'status': 'healthy' if services_ok else 'unhealthy',
+            'status': 'healthy' if readiness['ready'] else 'unhealthy',
             'timestamp': datetime.utcnow().isoformat(),
             'services': {
-                'firebase': 'active' if firebase_initialized else 'inactive',
-                'vision': 'active' if vision_client else 'inactive'
+                'firebase': 'active' if services.firebase_ready else 'inactive',
+                'vision': 'active' if services.vision_client else 'inactive'
             },
+            'readiness': readiness,
+            'ocr_cache': ocr_cache.stats() if ocr_cache else None,
+            'blob_store': blob_store.stats() if blob_store else None,
+            'seven_segment': fast_path.stats() if fast_path else None,
+            'outbox': outbox.stats() if outbox else None,
+            'room_cache': room_cache.stats() if room_cache else None,
+            'events': event_hub.stats(),
+            'upstreams': breaker_stats(),
+            'async': {'executors': executors.stats(), 'uploads': async_uploads.stats()},
+            'vitals_history': vitals_history.stats() if vitals_history else None,
             'environment_vars': {
                 'firebase_creds': 'present' if os.environ.get('FIREBASE_CREDENTIALS_JSON') else 'missing',
                 'firebase_url': 'present' if os.environ.get('FIREBASE_DATABASE_URL') else 'missing',
@@ -337,6 +1134,19 @@ def health_check(request):
             'timestamp': datetime.utcnow().isoformat()
         }, status=500)
 
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus scrape endpoint: latency histograms and upstream breaker state"""
+    if not settings.METRICS_ENABLED:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Metrics are disabled'
+        }, status=404)
+    return HttpResponse(
+        request_metrics.render(breaker_stats()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 @require_http_methods(["GET"])
 def debug_env(request):
     """Debug endpoint to check environment variables"""
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+
+from .lazy_import import LazyModule
+
+np = LazyModule('numpy')
+
+# Numeric series stored per capture type; blood pressure keeps both numbers
+SERIES = {
+    'temperature': ('value',),
+    'weight': ('value',),
+    'glucose': ('value',),
+    'blood_pressure': ('systolic', 'diastolic'),
+}
+
+# Every series is stored in one unit so buckets never mix scales
+CANONICAL_UNITS = {'temperature': '°C', 'weight': 'Kg', 'glucose': 'mg/dL', 'blood_pressure': 'mmHg'}
+CONVERSIONS = {
+    '°F': lambda v: (v - 32) * 5 / 9,
+    'mmol/L': lambda v: v * 18.016,
+}
+
+SEGMENT_SECONDS = 86400
+
+
+# Records are fixed width, so a segment file is a packed array: a whole
+# segment loads with one np.fromfile and queries never parse records one by one
+@lru_cache(maxsize=None)
+def record_dtype():
+    return np.dtype([('ts', '<f8'), ('v0', '<f4'), ('v1', '<f4')])
+
+
+def record_timestamp(record):
+    """Epoch seconds of a capture record's (naive UTC) ISO timestamp"""
+    stamp = datetime.fromisoformat(record['timestamp'])
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def record_values(record):
+    """Numbers of a capture record in the canonical unit, or None when it has no reading"""
+    value = record.get('value')
+    if not value:
+        return None
+    try:
+        numbers = [float(part) for part in str(value).split('/')]
+    except ValueError:
+        return None
+    convert = CONVERSIONS.get(record.get('unit'))
+    if convert:
+        numbers = [convert(n) for n in numbers]
+    return numbers
+
+
+def room_dir_name(room_id):
+    """Directory name for a room id.
+
+    Percent-encoded with dots escaped too, so no room id can name ``.``,
+    ``..`` or a hidden file and reach outside the history root.
+    """
+    if not room_id:
+        raise ValueError("Missing room id")
+    return quote(room_id, safe='').replace('.', '%2E')
+
+
+class VitalsHistory:
+    """Append-only time series of readings per room and capture type.
+
+    Layout: ``root/<room>/<capture_type>/<day>.seg`` where ``<day>`` is
+    the UTC day number and each file is packed :func:`record_dtype`
+    records. Appends are single ``O_APPEND`` writes, so several worker
+    processes can record into the same segment; a torn record at the end
+    of a file (crash mid-write) is ignored on read.
+    """
+
+    def __init__(self, root):
+        # Directories are created by the first append, not at import time
+        self.root = root
+        self._lock = threading.Lock()
+        self._counters = {'appended': 0, 'skipped': 0, 'queries': 0, 'points_scanned': 0}
+
+    def series_dir(self, room_id, capture_type):
+        return os.path.join(self.root, room_dir_name(room_id), capture_type)
+
+    def rooms(self):
+        """Room ids with recorded history"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(unquote(name) for name in names)
+
+    def append(self, room_id, capture_type, record):
+        """Record a capture result; results without a numeric reading are skipped"""
+        if capture_type not in SERIES or not isinstance(record, dict):
+            return False
+        values = record_values(record)
+        if values is None or len(values) != len(SERIES[capture_type]):
+            with self._lock:
+                self._counters['skipped'] += 1
+            return False
+        try:
+            ts = record_timestamp(record)
+        except (KeyError, TypeError, ValueError):
+            ts = time.time()
+
+        row = np.zeros(1, dtype=record_dtype())
+        row['ts'] = ts
+        row['v0'] = values[0]
+        row['v1'] = values[1] if len(values) > 1 else np.nan
+        directory = self.series_dir(room_id, capture_type)
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(os.path.join(directory, f"{int(ts // SEGMENT_SECONDS)}.seg"),
+                     os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, row.tobytes())
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._counters['appended'] += 1
+        return True
+
+    def load(self, room_id, capture_type, start, end):
+        """Readings with ``start <= ts < end`` as a time-sorted structured array"""
+        directory = self.series_dir(room_id, capture_type)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return np.zeros(0, dtype=record_dtype())
+
+        first, last = int(start // SEGMENT_SECONDS), int(end // SEGMENT_SECONDS)
+        chunks = []
+        for name in names:
+            day = name.partition('.')[0]
+            if not name.endswith('.seg') or not day.isdigit() or not first <= int(day) <= last:
+                continue
+            path = os.path.join(directory, name)
+            count = os.path.getsize(path) // record_dtype().itemsize
+            chunks.append(np.fromfile(path, dtype=record_dtype(), count=count))
+        if not chunks:
+            return np.zeros(0, dtype=record_dtype())
+
+        data = np.concatenate(chunks)
+        with self._lock:
+            self._counters['queries'] += 1
+            self._counters['points_scanned'] += len(data)
+        data = data[(data['ts'] >= start) & (data['ts'] < end)]
+        # Concurrent writers can append slightly out of order
+        return data[np.argsort(data['ts'], kind='stable')]
+
+    def query(self, room_id, capture_type, start, end, bucket=None):
+        """Columnar readings, or per-bucket min/max/mean when ``bucket`` seconds is given"""
+        names = SERIES[capture_type]
+        data = self.load(room_id, capture_type, start, end)
+        columns = [data[f"v{i}"].astype(np.float64) for i in range(len(names))]
+        result = {
+            'unit': CANONICAL_UNITS[capture_type],
+            'count': int(len(data)),
+        }
+        if not bucket:
+            result['t'] = data['ts'].tolist()
+            result.update({name: column.round(2).tolist() for name, column in zip(names, columns)})
+            return result
+
+        index = ((data['ts'] - start) // bucket).astype(np.int64)
+        buckets, index = np.unique(index, return_inverse=True)
+        counts = np.bincount(index, minlength=len(buckets))
+        result['bucket_seconds'] = bucket
+        result['t'] = (start + buckets * bucket).tolist()
+        result['counts'] = counts.tolist()
+        for name, column in zip(names, columns):
+            lows = np.full(len(buckets), np.inf)
+            highs = np.full(len(buckets), -np.inf)
+            np.minimum.at(lows, index, column)
+            np.maximum.at(highs, index, column)
+            means = np.bincount(index, weights=column, minlength=len(buckets)) / np.maximum(counts, 1)
+            result[name] = {
+                'min': lows.round(2).tolist(),
+                'max': highs.round(2).tolist(),
+                'mean': means.round(2).tolist(),
+            }
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'root': self.root, **self._counters}
+
+
+def build_vitals_history():
+    """Create the history store configured in settings"""
+    return VitalsHistory(getattr(settings, 'VITALS_HISTORY_ROOT', 'history'))
@@ -0,0 +1,198 @@
+"""
+Measure cross-worker signaling through the pub/sub buses.
+
+Run from the video-conferencing-app directory:
+
+    python -m benchmarks.bench_pubsub [--workers 4] [--sockets 2] [--messages 20000] [--paced 2000]
+                                      [--pace-ms 0.5] [--redis-url redis://localhost:6379/0]
+
+Each worker runs its own ConnectionManager with ``--sockets`` in-memory
+sockets in one room. Worker 0 publishes; a message counts as delivered
+once every socket on every other worker has it. The burst run publishes
+``--messages`` as fast as the event loop allows and reports delivered
+messages per second; the paced run sends ``--paced`` messages one every
+``--pace-ms`` and reports publish-to-receive latency. ``memory`` runs the
+workers as managers in one process; ``unix`` runs them as separate
+processes, one of which hosts the hub, as under ``uvicorn --workers``.
+``redis`` runs only with ``--redis-url``.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from server.connection_manager import ConnectionManager
+from server.pubsub import InMemoryBus, MemoryHub, RedisBus, UnixSocketBus
+
+ROOM = "call"
+
+
+class RecordingSocket:
+    """Enough of starlette's WebSocket for the manager; records when each message arrived"""
+
+    def __init__(self):
+        self.latencies = []
+        self.last = 0.0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message):
+        # CLOCK_MONOTONIC on Linux, so comparable across processes
+        self.last = time.monotonic()
+        self.latencies.append(self.last - json.loads(message)["t"])
+
+    async def close(self, code=1000):
+        pass
+
+
+async def join(manager, count):
+    sockets = [RecordingSocket() for _ in range(count)]
+    for socket in sockets:
+        await manager.connect(socket, ROOM)
+    return sockets
+
+
+async def publish(manager, sender, messages, pace):
+    started = time.monotonic()
+    for i in range(messages):
+        manager.broadcast(json.dumps({"type": "answer", "sdp": "v=0", "i": i, "t": time.monotonic()}), sender)
+        if pace:
+            await asyncio.sleep(pace)
+        elif i % 100 == 99:
+            # Let the bus and writer tasks flush, as a real receive loop would
+            await asyncio.sleep(0)
+    return started
+
+
+async def received(sockets, messages, timeout):
+    deadline = time.monotonic() + timeout
+    while min(len(socket.latencies) for socket in sockets) < messages and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    return {
+        "latencies": [latency for socket in sockets for latency in socket.latencies],
+        "last": max(socket.last for socket in sockets),
+        "missing": sum(messages - len(socket.latencies) for socket in sockets),
+    }
+
+
+async def run_in_process(make_bus, workers, sockets, messages, pace, timeout):
+    managers = [ConnectionManager(queue_size=messages + 1, bus=make_bus()) for _ in range(workers)]
+    for manager in managers:
+        await manager.start()
+    rooms = [await join(manager, sockets) for manager in managers]
+    # Subscriptions reach a broker asynchronously
+    await asyncio.sleep(0.2)
+    started = await publish(managers[0], rooms[0][0], messages, pace)
+    results = [await received(room, messages, timeout) for room in rooms[1:]]
+    for manager in managers:
+        await manager.close()
+    return started, results
+
+
+def unix_worker(index, path, sockets, messages, pace, timeout, ready, go, done, results):
+    async def main():
+        manager = ConnectionManager(queue_size=messages + 1, bus=UnixSocketBus(path))
+        await manager.start()
+        room = await join(manager, sockets)
+        ready.put(index)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, go.wait)
+        if index == 0:
+            results.put(("started", await publish(manager, room[0], messages, pace)))
+        else:
+            results.put(("received", await received(room, messages, timeout)))
+        # Worker 0 may be hosting the hub; everyone stays up until all have reported
+        await loop.run_in_executor(None, done.wait)
+        await manager.close()
+
+    asyncio.run(main())
+
+
+def run_unix(workers, sockets, messages, pace, timeout):
+    context = multiprocessing.get_context("fork")
+    ready, results = context.Queue(), context.Queue()
+    go, done = context.Event(), context.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "signaling.sock")
+        processes = [
+            context.Process(target=unix_worker,
+                            args=(i, path, sockets, messages, pace, timeout, ready, go, done, results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get(timeout=30)
+        time.sleep(0.2)
+        go.set()
+        started, received_by = None, []
+        for _ in processes:
+            kind, value = results.get(timeout=timeout + 30)
+            if kind == "started":
+                started = value
+            else:
+                received_by.append(value)
+        done.set()
+        for process in processes:
+            process.join()
+    return started, received_by
+
+
+def summarize(name, mode, messages, started, results):
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    elapsed = max(result["last"] for result in results) - started
+    missing = sum(result["missing"] for result in results)
+
+    def percentile(q):
+        return latencies[max(0, int(len(latencies) * q) - 1)] * 1000
+
+    rate = messages / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<8} {mode:<7} {rate:>11.0f} {statistics.median(latencies) * 1000:>9.2f} "
+          f"{percentile(0.99):>9.2f} {missing:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sockets', type=int, default=2, help="sockets in the room on each worker")
+    parser.add_argument('--messages', type=int, default=20000, help="messages in the burst run")
+    parser.add_argument('--paced', type=int, default=2000, help="messages in the paced run")
+    parser.add_argument('--pace-ms', type=float, default=0.5)
+    parser.add_argument('--redis-url', help="also measure the Redis bus against this server")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.sockets} sockets in one room; burst of {args.messages}, "
+          f"{args.paced} paced every {args.pace_ms} ms")
+    print(f"{'bus':<8} {'run':<7} {'messages/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'missing':>8}")
+    runs = [('burst', args.messages, 0.0), ('paced', args.paced, args.pace_ms / 1000)]
+
+    for mode, messages, pace in runs:
+        hub = MemoryHub()
+        started, results = asyncio.run(run_in_process(
+            lambda: InMemoryBus(hub=hub), args.workers, args.sockets, messages, pace, args.timeout
+        ))
+        summarize('memory', mode, messages, started, results)
+
+    for mode, messages, pace in runs:
+        started, results = run_unix(args.workers, args.sockets, messages, pace, args.timeout)
+        summarize('unix', mode, messages, started, results)
+
+    if args.redis_url:
+        for mode, messages, pace in runs:
+            started, results = asyncio.run(run_in_process(
+                lambda: RedisBus(args.redis_url), args.workers, args.sockets, messages, pace, args.timeout
+            ))
+            summarize('redis', mode, messages, started, results)
+    else:
+        print("redis    skipped (pass --redis-url)")
+
+
+if __name__ == '__main__':
+    main()
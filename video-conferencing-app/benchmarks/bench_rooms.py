@@ -0,0 +1,210 @@
+"""
+Compare room-scoped signaling fan-out with the previous broadcast-to-all manager.
+
+Run from the video-conferencing-app directory:
+
+    python -m benchmarks.bench_rooms [--sockets 5000] [--rooms 500] [--messages 2000] [--churn 2000]
+
+Sockets are in-memory stand-ins whose ``send_text`` only counts bytes.
+Each message comes from a random socket, as SDP offers and ICE candidates
+do; a message counts as delivered once every peer's send completed.
+``--churn`` sockets are disconnected and reconnected to measure
+join/leave cost. The slow-peer case puts one socket that takes
+``--slow-ms`` per send in a room and times delivery to the others. The
+sweep case times one pass of the heartbeat sweeper over every socket.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from server.connection_manager import ConnectionManager
+
+
+class FakeSocket:
+    """Enough of starlette's WebSocket for the connection manager"""
+
+    # Sends completed by every socket, to tell when queued messages are out
+    sent_total = 0
+
+    def __init__(self, index, delay=0.0):
+        self.client = ('127.0.0.1', index)
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        FakeSocket.sent_total += 1
+
+    async def close(self, code=1000):
+        pass
+
+
+class LegacyConnectionManager:
+    """The manager this change replaced: one list, every message to everyone"""
+
+    def __init__(self):
+        self.active_connections = []
+
+    async def connect(self, websocket, room_id=None):
+        await websocket.accept()
+        self.active_connections.append(websocket)
+
+    def disconnect(self, websocket):
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+
+    async def broadcast(self, message, sender):
+        for connection in self.active_connections:
+            if connection != sender:
+                try:
+                    await connection.send_text(message)
+                except Exception:
+                    self.disconnect(connection)
+
+
+async def broadcast(manager, message, sender):
+    """Returns how many sends the message will take"""
+    result = manager.broadcast(message, sender)
+    # The legacy manager sends inline; the current one queues and returns a count
+    if asyncio.iscoroutine(result):
+        await result
+        return 0
+    return result
+
+
+async def drain(expected):
+    """Wait until the writer tasks have completed ``expected`` more sends"""
+    target = FakeSocket.sent_total + expected
+    while FakeSocket.sent_total < target:
+        await asyncio.sleep(0)
+
+
+async def run(manager, sockets, rooms, messages, churn, seed):
+    rng = random.Random(seed)
+    assignment = {socket: f"room-{i % rooms}" for i, socket in enumerate(sockets)}
+    started = time.perf_counter()
+    for socket in sockets:
+        await manager.connect(socket, assignment[socket])
+    connect_s = time.perf_counter() - started
+
+    message = '{"type": "candidate", "candidate": "candidate:1 1 udp 2122260223 10.0.0.1 54321 typ host"}'
+    senders = [rng.choice(sockets) for _ in range(messages)]
+    started = time.perf_counter()
+    queued = 0
+    sent_before = FakeSocket.sent_total
+    for sender in senders:
+        queued += await broadcast(manager, message, sender)
+    await drain(queued - (FakeSocket.sent_total - sent_before))
+    broadcast_s = time.perf_counter() - started
+
+    leaving = rng.sample(sockets, min(churn, len(sockets)))
+    started = time.perf_counter()
+    for socket in leaving:
+        manager.disconnect(socket)
+        await manager.connect(socket, assignment[socket])
+    churn_s = time.perf_counter() - started
+
+    deliveries = sum(socket.received for socket in sockets)
+    return connect_s, broadcast_s, churn_s, deliveries
+
+
+async def run_slow_peer(manager, peers, messages, slow_ms):
+    sockets = [FakeSocket(i) for i in range(peers)]
+    slow = FakeSocket(peers, delay=slow_ms / 1000)
+    # Coalescing needs clients that take "candidates" messages
+    options = {'batch': True} if isinstance(manager, ConnectionManager) else {}
+    for socket in sockets + [slow]:
+        await manager.connect(socket, 'call', **options)
+    sender, fast = sockets[0], sockets[1:]
+    started = time.perf_counter()
+    for _ in range(messages):
+        await broadcast(manager, '{"type": "candidate", "candidate": "candidate:1"}', sender)
+        # Messages arrive one receive_text() at a time, not all at once
+        await asyncio.sleep(0)
+    # Wait for the fast peers only
+    while min(socket.received for socket in fast) < messages:
+        await asyncio.sleep(0)
+    fast_s = time.perf_counter() - started
+    slow_state = manager.connections[slow].to_dict() if hasattr(manager, 'connections') else None
+    for socket in sockets + [slow]:
+        manager.disconnect(socket)
+    return fast_s, slow_state
+
+
+async def run_sweep(manager, sockets, rooms):
+    for i, socket in enumerate(sockets):
+        await manager.connect(socket, f"room-{i % rooms}")
+    timings = []
+    started = time.perf_counter()
+    manager.sweep()
+    timings.append(time.perf_counter() - started)
+    # Everyone quiet for a ping interval: each gets a ping
+    for connection in manager.connections.values():
+        connection.last_seen -= manager.ping_interval
+    started = time.perf_counter()
+    manager.sweep()
+    timings.append(time.perf_counter() - started)
+    # Nobody answered, though all have before: each is reaped and its room told
+    for connection in manager.connections.values():
+        connection.answers_pings = True
+        connection.pinged_at -= manager.ping_timeout + 1
+    started = time.perf_counter()
+    reaped = manager.sweep()
+    timings.append(time.perf_counter() - started)
+    await asyncio.sleep(0)
+    return timings, reaped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sockets', type=int, default=5000)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--churn', type=int, default=2000, help="disconnect/reconnect cycles")
+    parser.add_argument('--slow-ms', type=float, default=50.0, help="per-send delay of the slow peer")
+    args = parser.parse_args()
+    # One warning per reaped or dropped socket would swamp the results
+    logging.getLogger("server.connection_manager").setLevel(logging.ERROR)
+
+    print(f"{args.sockets} sockets in {args.rooms} rooms, {args.messages} messages, {args.churn} reconnects")
+    print(f"{'manager':<14} {'connect ms':>11} {'us/message':>11} {'us/reconnect':>13} {'deliveries':>11}")
+    for name, manager_class in [('legacy', LegacyConnectionManager), ('room-indexed', ConnectionManager)]:
+        sockets = [FakeSocket(i) for i in range(args.sockets)]
+        connect_s, broadcast_s, churn_s, deliveries = asyncio.run(
+            run(manager_class(), sockets, args.rooms, args.messages, args.churn, seed=1)
+        )
+        print(f"{name:<14} {connect_s * 1000:>11.1f} {broadcast_s / args.messages * 1e6:>11.1f} "
+              f"{churn_s / max(args.churn, 1) * 1e6:>13.2f} {deliveries:>11}")
+
+    print(f"\none peer taking {args.slow_ms:.0f} ms per send in a room of 10, 40 messages:")
+    for name, manager in [('legacy', LegacyConnectionManager()), ('queued', ConnectionManager(queue_size=16, batch_window=0))]:
+        fast_s, slow_state = asyncio.run(run_slow_peer(manager, 9, 40, args.slow_ms))
+        detail = ''
+        if slow_state:
+            detail = (f" (slow peer: {slow_state['queue_depth']} queued, {slow_state['dropped']} dropped, "
+                      f"{slow_state['coalesced']} coalesced)")
+        print(f"{name:<14} other peers had every message after {fast_s * 1000:.1f} ms{detail}")
+
+    manager = ConnectionManager()
+    sockets = [FakeSocket(i) for i in range(args.sockets)]
+    asyncio.run(run(manager, sockets, args.rooms, args.messages, 0, seed=1))
+    busiest = sorted(manager.stats()['per_room'].items(), key=lambda item: -item[1]['messages'])[:3]
+    print("busiest rooms:", ', '.join(f"{room} ({stats['messages']} msgs, {stats['occupancy']} sockets)"
+                                      for room, stats in busiest))
+
+    sockets = [FakeSocket(i) for i in range(args.sockets)]
+    (quiet_s, ping_s, reap_s), reaped = asyncio.run(run_sweep(ConnectionManager(), sockets, args.rooms))
+    print(f"sweep of {args.sockets} sockets: {quiet_s * 1000:.1f} ms with nothing due, "
+          f"{ping_s * 1000:.1f} ms pinging all, {reap_s * 1000:.1f} ms reaping {reaped}")
+
+
+if __name__ == '__main__':
+    main()
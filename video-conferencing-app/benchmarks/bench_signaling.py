@@ -0,0 +1,179 @@
+"""
+Compare bytes on the wire and frames for typical call setups per signaling encoding.
+
+Run from the video-conferencing-app directory:
+
+    python -m benchmarks.bench_signaling [--calls 500] [--candidates 12] [--batch-ms 20]
+
+Each call is two peers in a room. The caller sends an offer and the
+callee an answer (about 2.5 KB of SDP each), then each side trickles
+``--candidates`` ICE candidates in three waves: host at once, server
+reflexive after 30 ms and relay after 80 ms, as STUN and TURN answer.
+Every call runs at once on one event loop with in-memory sockets.
+
+Bytes count frame payloads plus WebSocket headers (masked from clients),
+before any permessage-deflate. ``CPU ms`` is process time for the whole
+run, including decoding client frames, and ``setups/CPU-s`` is call
+setups per second of server CPU.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from server import codec
+from server.connection_manager import ConnectionManager
+
+msgpack = codec.msgpack
+
+WAVES = ((0.0, "host"), (0.03, "srflx"), (0.08, "relay"))
+
+
+def ws_header(size, masked):
+    length = 1 if size < 126 else 3 if size < 65536 else 9
+    return 1 + length + (4 if masked else 0)
+
+
+class WireSocket:
+    """Enough of starlette's WebSocket for the manager; counts frames and bytes sent to the client"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message):
+        self.count(len(message.encode()))
+
+    async def send_bytes(self, data):
+        self.count(len(data))
+
+    def count(self, size):
+        self.frames += 1
+        self.bytes += size + ws_header(size, masked=False)
+
+    async def close(self, code=1000):
+        pass
+
+
+def sdp(kind, session):
+    lines = [
+        "v=0", f"o=- {session} 2 IN IP4 127.0.0.1", "s=-", "t=0 0", "a=group:BUNDLE 0 1",
+        "a=extmap-allow-mixed", "a=msid-semantic: WMS stream",
+        "m=audio 9 UDP/TLS/RTP/SAVPF 111 63 9 0 8 13 110 126", "c=IN IP4 0.0.0.0",
+        "a=rtcp:9 IN IP4 0.0.0.0", "a=ice-ufrag:EsAw", "a=ice-pwd:bP+XJMM09aR8AiX1jdukzR6Y",
+        "a=ice-options:trickle",
+        "a=fingerprint:sha-256 D2:FA:0E:C3:22:59:5E:14:95:69:92:3D:13:B4:84:24:2C:C2:A2:C0:3E:FD:34:8E:5E:EA:6F:AF:52:CE:E6:0F",
+        f"a=setup:{'actpass' if kind == 'offer' else 'active'}", "a=mid:0", "a=sendrecv", "a=rtcp-mux",
+        "a=rtpmap:111 opus/48000/2", "a=rtcp-fb:111 transport-cc", "a=fmtp:111 minptime=10;useinbandfec=1",
+        "m=video 9 UDP/TLS/RTP/SAVPF 96 97 102 103 104 105 106 107 108 109 127 125", "c=IN IP4 0.0.0.0",
+        "a=mid:1", "a=sendrecv", "a=rtcp-mux", "a=rtcp-rsize",
+    ]
+    for payload, codec_name in ((96, "VP8"), (98, "VP9"), (102, "H264"), (45, "AV1")):
+        lines += [
+            f"a=rtpmap:{payload} {codec_name}/90000", f"a=rtcp-fb:{payload} goog-remb",
+            f"a=rtcp-fb:{payload} transport-cc", f"a=rtcp-fb:{payload} ccm fir", f"a=rtcp-fb:{payload} nack",
+            f"a=rtcp-fb:{payload} nack pli", f"a=rtpmap:{payload + 1} rtx/90000", f"a=fmtp:{payload + 1} apt={payload}",
+        ]
+    lines += [f"a=ssrc:{1000 + session} cname:peer{session}", f"a=ssrc:{1000 + session} msid:stream track{session}"]
+    return json.dumps({"type": kind, "sdp": "\r\n".join(lines) + "\r\n"})
+
+
+def candidate(kind, i):
+    address = {"host": f"10.0.0.{i + 2}", "srflx": f"203.0.113.{i + 2}", "relay": f"198.51.100.{i + 2}"}[kind]
+    related = "" if kind == "host" else f" raddr 10.0.0.{i + 2} rport {50000 + i}"
+    return json.dumps({"type": "candidate", "candidate": {
+        "candidate": f"candidate:{842163049 + i} 1 udp {2122260223 - i * 1000} {address} {50000 + i} "
+                     f"typ {kind}{related} generation 0 ufrag EsAw network-cost 999",
+        "sdpMid": "0", "sdpMLineIndex": 0, "usernameFragment": "EsAw",
+    }})
+
+
+class Client:
+    """One peer: sends its script in the chosen encoding, as a browser would"""
+
+    def __init__(self, manager, encoding, kind, session, candidates):
+        self.manager = manager
+        self.socket = WireSocket()
+        self.bytes_in = 0
+        per_wave = candidates // len(WAVES)
+        # Encoded up front: that is the browser's CPU, not the server's
+        self.script = [(0.0, [self.encode(sdp(kind, session), encoding)])] + [
+            (delay, [self.encode(candidate(wave, i), encoding) for i in range(per_wave)])
+            for delay, wave in WAVES
+        ]
+
+    @staticmethod
+    def encode(message, encoding):
+        return msgpack.packb(json.loads(message)) if encoding == "msgpack" else message
+
+    def send(self, frame):
+        size = len(frame) if isinstance(frame, bytes) else len(frame.encode())
+        self.bytes_in += size + ws_header(size, masked=True)
+        # What the /ws endpoint does with a received frame
+        text = codec.unpack(frame) if isinstance(frame, bytes) else frame
+        if self.manager.heard(self.socket, text):
+            self.manager.broadcast(text, self.socket)
+
+    async def run(self):
+        started = time.monotonic()
+        for delay, frames in self.script:
+            await asyncio.sleep(max(0.0, started + delay - time.monotonic()))
+            for frame in frames:
+                self.send(frame)
+
+
+async def run(encoding, batch, calls, candidates, batch_ms):
+    manager = ConnectionManager(queue_size=256, batch_window=batch_ms / 1000, sweep_interval=0)
+    clients = []
+    for call in range(calls):
+        for side, kind in enumerate(("offer", "answer")):
+            client = Client(manager, encoding, kind, call * 2 + side, candidates)
+            await manager.connect(client.socket, f"call-{call}", encoding=encoding, batch=batch)
+            clients.append(client)
+
+    cpu = time.process_time()
+    await asyncio.gather(*(client.run() for client in clients))
+    # Let writers finish, including a batch window still open
+    while True:
+        await asyncio.sleep(batch_ms / 1000 + 0.005)
+        if not manager.pending():
+            break
+    cpu = time.process_time() - cpu
+
+    return {
+        "frames": sum(client.socket.frames for client in clients),
+        "bytes_out": sum(client.socket.bytes for client in clients),
+        "bytes_in": sum(client.bytes_in for client in clients),
+        "cpu": cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--candidates', type=int, default=12, help="ICE candidates per peer")
+    parser.add_argument('--batch-ms', type=float, default=20.0, help="ICE batching window")
+    args = parser.parse_args()
+
+    cases = [("json", False), ("json", True)]
+    if codec.msgpack is not None:
+        cases += [("msgpack", False), ("msgpack", True)]
+
+    print(f"{args.calls} call setups, {args.candidates} candidates per peer, {args.batch_ms:.0f} ms batch window")
+    print(f"{'encoding':<18} {'frames':>8} {'per call':>9} {'KB out':>9} {'KB in':>9} {'CPU ms':>8} {'setups/CPU-s':>13}")
+    for encoding, batch in cases:
+        result = asyncio.run(run(encoding, batch, args.calls, args.candidates, args.batch_ms))
+        name = f"{encoding}{' + batch' if batch else ''}"
+        print(f"{name:<18} {result['frames']:>8} {result['frames'] / args.calls:>9.1f} "
+              f"{result['bytes_out'] / 1024:>9.1f} {result['bytes_in'] / 1024:>9.1f} "
+              f"{result['cpu'] * 1000:>8.0f} {args.calls / result['cpu']:>13.0f}")
+    if codec.msgpack is None:
+        print("msgpack            skipped (pip install msgpack)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import json
+import logging
+from typing import Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Encodings a client can ask for, as a WebSocket subprotocol
+# (new WebSocket(url, ["signaling.msgpack"])) or with ?encoding=
+SUBPROTOCOLS = {"signaling.msgpack": "msgpack", "signaling.json": "json"}
+
+# Recently relayed messages and their MessagePack frames. One broadcast
+# packs the same message for every peer, and a message that arrived as
+# MessagePack goes back out as the frame it came in. Only small frames
+# (offers, answers, candidates) are kept and the cache is capped in bytes
+# too, so large relayed payloads cannot pin memory.
+PACKED_CACHE_SIZE = 1024
+PACKED_CACHE_MAX_FRAME = 4096
+PACKED_CACHE_BYTES = 1024 * 1024
+_packed: Dict[str, bytes] = {}
+_packed_bytes = 0
+
+
+def remember(message: str, frame: bytes):
+    global _packed_bytes
+    if len(frame) > PACKED_CACHE_MAX_FRAME or message in _packed:
+        return
+    size = len(message) + len(frame)
+    while _packed and (len(_packed) >= PACKED_CACHE_SIZE or _packed_bytes + size > PACKED_CACHE_BYTES):
+        # Oldest first; dicts keep insertion order
+        oldest = next(iter(_packed))
+        _packed_bytes -= len(oldest) + len(_packed.pop(oldest))
+    _packed[message] = frame
+    _packed_bytes += size
+
+
+def warn_if_unavailable():
+    """Log at startup when MessagePack clients would silently get JSON"""
+    if msgpack is None:
+        logger.warning("msgpack is not installed; clients asking for signaling.msgpack get JSON (pip install msgpack)")
+
+
+def negotiate(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """The encoding for a new socket and the subprotocol to accept it with.
+
+    Clients that ask for nothing, or for MessagePack when msgpack is not
+    installed, get JSON text frames as before.
+    """
+    for offered in websocket.scope.get("subprotocols", ()):
+        encoding = SUBPROTOCOLS.get(offered)
+        if encoding == "json" or (encoding == "msgpack" and msgpack is not None):
+            return encoding, offered
+    if websocket.query_params.get("encoding") == "msgpack" and msgpack is not None:
+        return "msgpack", None
+    return "json", None
+
+
+def pack(message: str) -> bytes:
+    """A relayed message as MessagePack"""
+    frame = _packed.get(message)
+    if frame is None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            # Plain-text notices such as "A user disconnected"
+            payload = message
+        frame = msgpack.packb(payload)
+        remember(message, frame)
+    return frame
+
+
+def unpack(data: bytes) -> str:
+    """A MessagePack frame as the JSON text the manager relays"""
+    payload = msgpack.unpackb(data)
+    if isinstance(payload, str):
+        return payload
+    try:
+        message = json.dumps(payload, separators=(",", ":"))
+    except TypeError as e:
+        # MessagePack bin and ext types have no JSON form
+        raise ValueError(f"not a signaling message: {e}")
+    remember(message, data)
+    return message
+
+
+def encode(message: str, encoding: str) -> Union[str, bytes]:
+    return pack(message) if encoding == "msgpack" else message
+
+
+async def receive(websocket: WebSocket) -> str:
+    """The next signaling message from a text or MessagePack client, as JSON text"""
+    while True:
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000))
+        if frame.get("text") is not None:
+            return frame["text"]
+        if msgpack is None:
+            logger.warning("Ignored a binary frame: msgpack is not installed")
+            continue
+        try:
+            return unpack(frame["bytes"])
+        except ValueError as e:
+            # msgpack's own errors (ExtraData, FormatError...) are ValueErrors too
+            logger.warning(f"Ignored a binary frame: {e!r}")
@@ -1,25 +1,607 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from itertools import count
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+
 from fastapi import WebSocket
-from typing import List
 
-class ConnectionManager:
+from server import codec
+from server.pubsub import Bus, build_bus
+
+logger = logging.getLogger(__name__)
+
+# Sockets that connect without a room id share this one, as every socket
+# did before messages were scoped to rooms
+DEFAULT_ROOM = "lobby"
+
+# Seconds over which the per-room message rate is averaged
+RATE_WINDOW = 10.0
+
+# What to do when a connection's send queue is full:
+#   drop_oldest - discard the oldest queued message
+#   coalesce    - merge queued ICE candidates into "candidates" messages, one
+#                 per envelope, for sockets that negotiated batching; otherwise
+#                 (or with nothing to merge) fall back to drop_oldest
+#   disconnect  - close the connection (close code 1013, try again later)
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Seconds without a signaling message after which a live connection
+# counts as idle in the gauges; it is never reaped for that alone
+IDLE_AFTER = 60.0
+
+# Sent by the sweeper; clients answer with PONG or any other message
+PING = '{"type":"ping"}'
+PONG = '{"type":"pong"}'
+
+_connection_ids = count(1)
+
+
+async def send_with_timeout(websocket: WebSocket, frame: Union[str, bytes], timeout: float):
+    send = websocket.send_bytes(frame) if isinstance(frame, bytes) else websocket.send_text(frame)
+    if hasattr(asyncio, "timeout"):
+        # wait_for can swallow a cancellation that races with the send
+        # finishing (fixed in 3.12), which would leave the writer running
+        async with asyncio.timeout(timeout):
+            await send
+    else:
+        await asyncio.wait_for(send, timeout)
+
+
+def parse_candidates(message: str) -> Optional[Tuple[dict, list]]:
+    """``(envelope, candidates)`` for an ICE candidate message, or None for other messages.
+
+    The envelope is every other field (e.g. sender or target ids), so
+    only candidates addressed the same way are merged.
+    """
+    if '"candidate' not in message:
+        return None
+    try:
+        payload = json.loads(message)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    kind = payload.pop("type", None)
+    if kind == "candidates" and isinstance(payload.get("candidates"), list):
+        return payload, payload.pop("candidates")
+    if kind in ("candidate", "ice-candidate") and "candidate" in payload:
+        return payload, [payload.pop("candidate")]
+    return None
+
+
+def ice_candidates(message: str) -> Optional[list]:
+    """The ICE candidates carried by a signaling message, or None for other messages"""
+    parsed = parse_candidates(message)
+    return parsed[1] if parsed is not None else None
+
+
+def candidates_message(envelope: dict, candidates: list) -> str:
+    return json.dumps({"type": "candidates", **envelope, "candidates": candidates})
+
+
+class Connection:
+    """One socket with a bounded outbound queue drained by its own writer task"""
+
+    def __init__(self, websocket: WebSocket, room_id: str, queue_size: int, policy: str, send_timeout: float,
+                 encoding: str = "json", batch: bool = False, batch_window: float = 0.0):
+        self.id = next(_connection_ids)
+        self.websocket = websocket
+        self.room_id = room_id
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.encoding = encoding
+        # Whether the client takes "candidates" messages
+        self.batch = batch
+        self.batch_window = batch_window
+        self.queue: Deque[str] = deque()
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.batched = 0
+        self.bytes_sent = 0
+        self.peak_depth = 0
+        self.connected_at = time.monotonic()
+        # Any frame from the client, pongs included
+        self.last_seen = self.connected_at
+        # Signaling messages only
+        self.last_active = self.connected_at
+        # Set when a ping goes out with no reply yet
+        self.pinged_at: Optional[float] = None
+        # Whether the client answers pings: unknown until it answers one
+        # (True) or lets one time out (False)
+        self.answers_pings: Optional[bool] = None
+
+    def enqueue(self, message: str) -> bool:
+        """Queue a message without waiting; False means the overflow policy wants the connection closed"""
+        if self.closed:
+            return True
+        if len(self.queue) >= self.queue_size and not self.make_room():
+            return False
+        self.queue.append(message)
+        self.peak_depth = max(self.peak_depth, len(self.queue))
+        self.wakeup.set()
+        return True
+
+    def make_room(self) -> bool:
+        if self.policy == "disconnect":
+            self.dropped += 1
+            return False
+        if self.policy == "coalesce" and self.batch and self.coalesce_candidates():
+            return True
+        self.queue.popleft()
+        self.dropped += 1
+        return True
+
+    def coalesce_candidates(self) -> bool:
+        """Merge queued ICE candidates into one message per envelope; True if that freed a slot.
+
+        Each merged message goes where the last of its candidates was:
+        candidates may arrive later than sent, never ahead of the offer
+        or answer they belong to.
+        """
+        groups: Dict[str, Tuple[dict, list, List[int]]] = {}
+        slots: List[Optional[str]] = []
+        for message in self.queue:
+            parsed = parse_candidates(message)
+            if parsed is not None:
+                envelope, candidates = parsed
+                group = groups.setdefault(json.dumps(envelope, sort_keys=True), (envelope, [], []))
+                group[1].extend(candidates)
+                group[2].append(len(slots))
+            slots.append(message)
+        merged = sum(len(positions) - 1 for _, _, positions in groups.values())
+        if not merged:
+            return False
+        for envelope, candidates, positions in groups.values():
+            if len(positions) > 1:
+                for position in positions[:-1]:
+                    slots[position] = None
+                slots[positions[-1]] = candidates_message(envelope, candidates)
+        self.queue = deque(message for message in slots if message is not None)
+        self.coalesced += merged
+        return True
+
+    async def run_writer(self, on_failure):
+        try:
+            while not self.closed:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue and not self.closed:
+                    message = self.queue.popleft()
+                    if self.batch_window:
+                        message = await self.batch_candidates(message)
+                    frame = codec.encode(message, self.encoding)
+                    # A half-dead client must not hold its writer forever
+                    await send_with_timeout(self.websocket, frame, self.send_timeout)
+                    self.sent += 1
+                    self.bytes_sent += len(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            on_failure(self, e)
+
+    async def batch_candidates(self, message: str) -> str:
+        """Hold an ICE candidate for ``batch_window`` and send it with the ones queued behind it.
+
+        Trickle ICE sends a burst of small messages per call setup; one
+        frame per burst saves a frame header and a send per candidate.
+        Only consecutive candidates with the same envelope are merged, so
+        nothing moves ahead of an offer or answer.
+        """
+        parsed = parse_candidates(message)
+        if parsed is None:
+            return message
+        await asyncio.sleep(self.batch_window)
+        envelope, candidates = parsed
+        merged = 1
+        while self.queue:
+            following = parse_candidates(self.queue[0])
+            if following is None or following[0] != envelope:
+                break
+            self.queue.popleft()
+            candidates.extend(following[1])
+            merged += 1
+        if merged == 1:
+            return message
+        self.batched += merged - 1
+        return candidates_message(envelope, candidates)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.wakeup.set()
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "room": self.room_id,
+            "queue_depth": len(self.queue),
+            "peak_depth": self.peak_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "batched": self.batched,
+            "bytes_sent": self.bytes_sent,
+            "encoding": self.encoding,
+            "batch": self.batch,
+            "age_seconds": round(time.monotonic() - self.connected_at, 1),
+            "idle_seconds": round(time.monotonic() - self.last_active, 1),
+            "awaiting_pong": self.pinged_at is not None,
+        }
+
+
+class RoomStats:
+    """Occupancy and traffic counters for one room"""
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New connection: {websocket.client}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"Disconnected: {websocket.client}")
-
-    async def broadcast(self, message: str, sender: WebSocket):
-        for connection in self.active_connections:
-            if connection != sender:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    print(f"Error sending message to {connection.client}: {e}")
-                    self.disconnect(connection)
\ No newline at end of file
+        self.created_at = time.time()
+        self.joins = 0
+        self.peak = 0
+        self.messages = 0
+        self.deliveries = 0
+        self.bytes = 0
+        self._rate = 0.0
+        self._rate_at = time.monotonic()
+
+    def record(self, size: int, fanout: int):
+        now = time.monotonic()
+        # Exponentially decayed count, so the rate costs O(1) per message
+        self._rate = self._rate * math.exp(-(now - self._rate_at) / RATE_WINDOW) + 1 / RATE_WINDOW
+        self._rate_at = now
+        self.messages += 1
+        self.deliveries += fanout
+        self.bytes += size
+
+    def rate(self) -> float:
+        return self._rate * math.exp(-(time.monotonic() - self._rate_at) / RATE_WINDOW)
+
+    def to_dict(self, occupancy: int) -> dict:
+        return {
+            "occupancy": occupancy,
+            "peak": self.peak,
+            "joins": self.joins,
+            "messages": self.messages,
+            "deliveries": self.deliveries,
+            "bytes": self.bytes,
+            "messages_per_second": round(self.rate(), 2),
+            "age_seconds": round(time.time() - self.created_at, 1),
+        }
+
+
+class ConnectionManager:
+    """Signaling sockets indexed by room.
+
+    A message is only relayed to the other sockets in the sender's room,
+    so fan-out costs O(room size) instead of O(all connections), and
+    join/leave are O(1) set operations. ``broadcast`` never waits on a
+    peer: each connection has a bounded queue drained by its own writer
+    task, so one slow client only delays itself. With a ``bus``, room
+    messages are also published to the other workers and nodes, and
+    theirs are relayed to the sockets here.
+
+    Sockets that vanish without a close frame are found by a periodic
+    sweep rather than by a later send failing: it pings connections that
+    have been quiet for ``ping_interval``, and reaps those that miss the
+    pong by ``ping_timeout``, send nothing at all for ``idle_timeout`` or
+    outlive ``max_lifetime`` (0 disables each). Only clients that have
+    answered a ping before are reaped for missing one. Older clients
+    never answer, so after their first ping times out they are no longer
+    pinged and are left to the server's protocol-level pings.
+    ``connect`` refuses sockets past ``max_connections`` or
+    ``max_per_room`` before accepting them.
+    """
+
+    def __init__(self, queue_size: int = 256, overflow_policy: str = "coalesce", send_timeout: float = 10.0,
+                 bus: Optional[Bus] = None, ping_interval: float = 20.0, ping_timeout: float = 20.0,
+                 idle_timeout: float = 0.0, max_lifetime: float = 14400.0, max_connections: int = 10000,
+                 max_per_room: int = 0, sweep_interval: float = 5.0, batch_window: float = 0.02):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow_policy!r}; use one of {', '.join(OVERFLOW_POLICIES)}")
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.rooms: Dict[str, Set[Connection]] = {}
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.room_stats: Dict[str, RoomStats] = {}
+        self.dropped_connections = 0
+        self.bus = bus
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.max_connections = max_connections
+        self.max_per_room = max_per_room
+        self.sweep_interval = sweep_interval
+        self.batch_window = batch_window
+        self.sweeper: Optional[asyncio.Task] = None
+        self.reaped = {"no_pong": 0, "idle": 0, "lifetime": 0}
+        self.rejected = {"server_full": 0, "room_full": 0}
+
+    async def start(self):
+        """Start the sweeper and relaying through the bus; call once the event loop is running"""
+        if self.bus is not None:
+            await self.bus.start(self._relay)
+        if self.sweep_interval:
+            self.sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+        if self.bus is not None:
+            await self.bus.close()
+
+    async def connect(self, websocket: WebSocket, room_id: Optional[str] = None, encoding: str = "json",
+                      subprotocol: Optional[str] = None, batch: Optional[bool] = None) -> bool:
+        """Accept and register a socket; False if it was refused for capacity.
+
+        ``encoding`` and ``subprotocol`` come from ``codec.negotiate``.
+        ICE candidates are batched for clients that ask with ``batch``,
+        and by default for MessagePack clients, which are new enough to
+        expect "candidates" messages.
+        """
+        room_id = room_id or DEFAULT_ROOM
+        refused = self._refusal(room_id)
+        if refused is not None:
+            self.rejected[refused] += 1
+            logger.warning(f"Refused a connection to room {room_id}: {refused.replace('_', ' ')}")
+            # Closing before accept answers the upgrade with a 403, so the
+            # client never gets a socket or a writer task
+            await websocket.close(code=1013)
+            return False
+        await websocket.accept(subprotocol=subprotocol)
+        if batch is None:
+            batch = encoding == "msgpack"
+        connection = Connection(
+            websocket, room_id, self.queue_size, self.overflow_policy, self.send_timeout,
+            encoding=encoding, batch=batch, batch_window=self.batch_window if batch else 0.0,
+        )
+        self.connections[websocket] = connection
+        self._add(connection)
+        connection.writer = asyncio.create_task(connection.run_writer(self._writer_failed))
+        return True
+
+    def _refusal(self, room_id: str) -> Optional[str]:
+        if self.max_connections and len(self.connections) >= self.max_connections:
+            return "server_full"
+        if self.max_per_room and self.occupancy(room_id) >= self.max_per_room:
+            return "room_full"
+        return None
+
+    def heard(self, websocket: WebSocket, message: str) -> bool:
+        """Record a frame from a client; False for heartbeat replies, which are not relayed"""
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return True
+        now = time.monotonic()
+        connection.last_seen = now
+        connection.pinged_at = None
+        if message == PONG or (len(message) < 32 and message.replace(" ", "") == PONG):
+            connection.answers_pings = True
+            return False
+        connection.last_active = now
+        return True
+
+    def join(self, websocket: WebSocket, room_id: str):
+        """Move a connected socket to another room"""
+        connection = self.connections.get(websocket)
+        if connection is None or connection.room_id == room_id:
+            return
+        self._remove(connection)
+        connection.room_id = room_id
+        self._add(connection)
+
+    def _add(self, connection: Connection):
+        peers = self.rooms.get(connection.room_id)
+        if peers is None:
+            peers = self.rooms[connection.room_id] = set()
+            if self.bus is not None:
+                self.bus.subscribe(connection.room_id)
+        peers.add(connection)
+        stats = self.room_stats.get(connection.room_id)
+        if stats is None:
+            stats = self.room_stats[connection.room_id] = RoomStats()
+        stats.joins += 1
+        stats.peak = max(stats.peak, len(peers))
+        logger.info(f"Joined room {connection.room_id}: {len(peers)} in room, {len(self.connections)} total")
+
+    def _remove(self, connection: Connection):
+        peers = self.rooms.get(connection.room_id)
+        if peers is not None:
+            peers.discard(connection)
+            if not peers:
+                # Room ids are per call, so empty rooms are not kept around
+                del self.rooms[connection.room_id]
+                self.room_stats.pop(connection.room_id, None)
+                if self.bus is not None:
+                    self.bus.unsubscribe(connection.room_id)
+
+    def disconnect(self, websocket: WebSocket) -> Optional[str]:
+        """Forget a socket and stop its writer; returns the room it was in, if any"""
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return None
+        self._remove(connection)
+        connection.close()
+        logger.info(f"Left room {connection.room_id}: {self.occupancy(connection.room_id)} in room, "
+                    f"{len(self.connections)} total")
+        return connection.room_id
+
+    def broadcast(self, message: str, sender: WebSocket, room_id: Optional[str] = None) -> int:
+        """Queue ``message`` for the other sockets in the sender's room (or ``room_id``).
+
+        Returns the number of local sockets it was queued for. Never waits
+        on a peer; a full queue is handled by the overflow policy.
+        """
+        if room_id is None:
+            connection = self.connections.get(sender)
+            room_id = connection.room_id if connection is not None else None
+        if room_id is None:
+            return 0
+        if self.bus is not None:
+            self.bus.publish(room_id, message)
+        return self._fan_out(room_id, message, sender)
+
+    def _relay(self, room_id: str, message: str):
+        """A message published by another worker or node to a room with sockets here"""
+        self._fan_out(room_id, message, None)
+
+    def _fan_out(self, room_id: str, message: str, sender: Optional[WebSocket]) -> int:
+        peers = self.rooms.get(room_id)
+        if not peers:
+            return 0
+
+        overflowed: List[Connection] = []
+        queued = 0
+        for connection in peers:
+            if connection.websocket is sender:
+                continue
+            if connection.enqueue(message):
+                queued += 1
+            else:
+                overflowed.append(connection)
+        for connection in overflowed:
+            if self._drop(connection, "send queue full", code=1013):
+                self.dropped_connections += 1
+
+        stats = self.room_stats.get(room_id)
+        if stats is not None:
+            stats.record(len(message), queued)
+        return queued
+
+    def _writer_failed(self, connection: Connection, error: Exception):
+        reason = "send timed out" if isinstance(error, asyncio.TimeoutError) else f"send failed: {error}"
+        if self._drop(connection, reason, code=1011):
+            self.dropped_connections += 1
+
+    def _drop(self, connection: Connection, reason: str, code: int) -> bool:
+        """Disconnect a socket from the server side and tell its room; False if it was already gone"""
+        if self.connections.get(connection.websocket) is not connection:
+            return False
+        logger.warning(f"Dropping connection {connection.id} in room {connection.room_id}: {reason}")
+        room_id = self.disconnect(connection.websocket)
+        asyncio.get_running_loop().create_task(self._close(connection.websocket, code))
+        self.broadcast("A user disconnected", connection.websocket, room_id=room_id)
+        return True
+
+    def sweep(self) -> int:
+        """Ping quiet connections and reap dead, idle and expired ones; returns how many were reaped"""
+        now = time.monotonic()
+        reaped = 0
+        for connection in list(self.connections.values()):
+            unanswered = connection.pinged_at is not None and now - connection.pinged_at > self.ping_timeout
+            if self.max_lifetime and now - connection.connected_at > self.max_lifetime:
+                reason = "lifetime"
+            elif self.idle_timeout and now - connection.last_seen > self.idle_timeout:
+                reason = "idle"
+            elif unanswered and connection.answers_pings:
+                reason = "no_pong"
+            else:
+                if unanswered:
+                    # A client from before heartbeats: it is not pinged again
+                    connection.answers_pings = False
+                    connection.pinged_at = None
+                elif (self.ping_interval and connection.pinged_at is None and connection.answers_pings is not False
+                        and now - connection.last_seen >= self.ping_interval):
+                    connection.pinged_at = now
+                    connection.enqueue(PING)
+                continue
+            # 1001: going away; the client may reconnect
+            if self._drop(connection, reason.replace("_", " "), code=1001):
+                self.reaped[reason] += 1
+                reaped += 1
+        return reaped
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Connection sweep failed")
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            # Already gone
+            pass
+
+    def pending(self) -> int:
+        """Messages queued but not yet sent, across all connections"""
+        return sum(len(connection.queue) for connection in self.connections.values())
+
+    def occupancy(self, room_id: str) -> int:
+        return len(self.rooms.get(room_id, ()))
+
+    def health(self) -> dict:
+        """Gauges for live, idle and unanswered-ping connections, and counts of reaped and refused ones"""
+        now = time.monotonic()
+        idle = awaiting_pong = 0
+        for connection in self.connections.values():
+            if now - connection.last_active > IDLE_AFTER:
+                idle += 1
+            if connection.pinged_at is not None:
+                awaiting_pong += 1
+        return {
+            "live": len(self.connections),
+            "idle": idle,
+            "awaiting_pong": awaiting_pong,
+            "reaped": dict(self.reaped),
+            "rejected": dict(self.rejected),
+            "dropped": self.dropped_connections,
+        }
+
+    def stats(self) -> dict:
+        per_room = {}
+        for room_id, peers in self.rooms.items():
+            room = self.room_stats[room_id].to_dict(len(peers))
+            room["queued"] = sum(len(connection.queue) for connection in peers)
+            room["dropped"] = sum(connection.dropped for connection in peers)
+            per_room[room_id] = room
+        return {
+            "connections": len(self.connections),
+            "rooms": len(self.rooms),
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "dropped_connections": self.dropped_connections,
+            "bus": self.bus.stats() if self.bus is not None else None,
+            "health": self.health(),
+            "per_room": per_room,
+        }
+
+    def connection_stats(self, room_id: Optional[str] = None) -> List[dict]:
+        """Queue depth and drop counters for every connection (or one room's)"""
+        if room_id is not None:
+            connections = self.rooms.get(room_id, ())
+        else:
+            connections = self.connections.values()
+        return [connection.to_dict() for connection in connections]
+
+
+def build_connection_manager() -> ConnectionManager:
+    return ConnectionManager(
+        queue_size=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")),
+        overflow_policy=os.getenv("WS_OVERFLOW_POLICY", "coalesce"),
+        send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "10")),
+        bus=build_bus(),
+        ping_interval=float(os.getenv("WS_PING_INTERVAL", "20")),
+        ping_timeout=float(os.getenv("WS_PING_TIMEOUT", "20")),
+        idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT", "0")),
+        max_lifetime=float(os.getenv("WS_MAX_LIFETIME", "14400")),
+        max_connections=int(os.getenv("WS_MAX_CONNECTIONS", "10000")),
+        max_per_room=int(os.getenv("WS_MAX_PER_ROOM", "0")),
+        sweep_interval=float(os.getenv("WS_SWEEP_INTERVAL", "5")),
+        batch_window=float(os.getenv("WS_ICE_BATCH_MS", "20")) / 1000,
+    )
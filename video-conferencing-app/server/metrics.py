@@ -0,0 +1,36 @@
+from server.connection_manager import ConnectionManager
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric(name: str, kind: str, help_text: str, samples) -> list:
+    """One metric family; ``samples`` is a list of ``(labels dict, value)``"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        rendered = ",".join(f'{key}="{escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+    return lines
+
+
+def render(manager: ConnectionManager) -> str:
+    """Prometheus text exposition of the signaling connection gauges"""
+    health = manager.health()
+    lines = []
+    lines += metric("signaling_connections", "gauge", "Open signaling sockets by state.", [
+        ({"state": "live"}, health["live"]),
+        ({"state": "idle"}, health["idle"]),
+        ({"state": "awaiting_pong"}, health["awaiting_pong"]),
+    ])
+    lines += metric("signaling_rooms", "gauge", "Rooms with at least one socket on this worker.",
+                    [({}, len(manager.rooms))])
+    lines += metric("signaling_queued_messages", "gauge", "Messages waiting in per-socket send queues.",
+                    [({}, manager.pending())])
+    lines += metric("signaling_reaped_total", "counter", "Sockets closed by the sweeper.",
+                    [({"reason": reason}, count) for reason, count in sorted(health["reaped"].items())])
+    lines += metric("signaling_rejected_total", "counter", "Sockets refused at the connection caps.",
+                    [({"reason": reason}, count) for reason, count in sorted(health["rejected"].items())])
+    lines += metric("signaling_dropped_total", "counter", "Sockets closed for a full queue or failed send.",
+                    [({}, health["dropped"])])
+    return "\n".join(lines) + "\n"
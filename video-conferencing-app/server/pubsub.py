@@ -0,0 +1,558 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Default rendezvous point for the Unix socket bus; every worker on the
+# host that uses the same path shares one hub
+DEFAULT_SOCKET_PATH = "/tmp/telehealth-signaling.sock"
+
+# Messages buffered per bus (or per hub subscriber) before new ones are dropped
+OUTBOX_SIZE = 10000
+
+# Bytes of unsent frames allowed on a Unix socket, about OUTBOX_SIZE messages
+HIGH_WATER_BYTES = OUTBOX_SIZE * 512
+
+# Seconds between attempts to reach the hub or broker after losing it
+RECONNECT_SECONDS = 0.5
+
+# Longest frame on the Unix socket bus, and the line limit of its streams.
+# asyncio's default of 64 KiB is within reach of an SDP offer; a frame past
+# the limit would break the connection, so the sender drops it instead
+MAX_FRAME_BYTES = 1024 * 1024
+
+Handler = Callable[[str, str], None]
+
+
+def node_name() -> str:
+    """This node's name in SIGNALING_NODES; shared by all of its workers"""
+    return os.getenv("SIGNALING_NODE_ID") or socket.gethostname()
+
+
+def default_bus_id() -> str:
+    # Per process: a worker must not mistake its siblings' messages for its own
+    return f"{node_name()}-{os.getpid()}"
+
+
+class Bus:
+    """Relays room messages between signaling workers and nodes.
+
+    ``publish``, ``subscribe`` and ``unsubscribe`` never wait: the manager
+    calls them from its synchronous broadcast path, and each transport
+    buffers them for a background task. A node only subscribes to rooms
+    it has sockets in, and never receives its own messages back.
+    Delivery is best effort, like the sockets themselves: messages
+    published while the transport is down are dropped and counted.
+    """
+
+    kind = "none"
+
+    def __init__(self, bus_id: Optional[str] = None):
+        self.id = bus_id or default_bus_id()
+        self.handler: Optional[Handler] = None
+        self.rooms: Set[str] = set()
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def close(self):
+        pass
+
+    def publish(self, room_id: str, message: str):
+        raise NotImplementedError
+
+    def subscribe(self, room_id: str):
+        self.rooms.add(room_id)
+
+    def unsubscribe(self, room_id: str):
+        self.rooms.discard(room_id)
+
+    def deliver(self, room_id: str, message: str):
+        self.received += 1
+        if self.handler is not None:
+            self.handler(room_id, message)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "id": self.id,
+            "rooms": len(self.rooms),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+class MemoryHub:
+    """Room subscriptions shared by the in-memory buses of one process"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InMemoryBus"]] = {}
+
+    def publish(self, source: "InMemoryBus", room_id: str, message: str):
+        for bus in self.subscribers.get(room_id, ()):
+            if bus is not source:
+                bus.deliver(room_id, message)
+
+    def subscribe(self, bus: "InMemoryBus", room_id: str):
+        self.subscribers.setdefault(room_id, set()).add(bus)
+
+    def unsubscribe(self, bus: "InMemoryBus", room_id: str):
+        buses = self.subscribers.get(room_id)
+        if buses is not None:
+            buses.discard(bus)
+            if not buses:
+                del self.subscribers[room_id]
+
+
+_memory_hub = MemoryHub()
+
+
+class InMemoryBus(Bus):
+    """Managers in one process, e.g. several apps under test; delivery is synchronous"""
+
+    kind = "memory"
+
+    def __init__(self, bus_id: Optional[str] = None, hub: Optional[MemoryHub] = None):
+        super().__init__(bus_id)
+        self.hub = hub or _memory_hub
+
+    async def close(self):
+        for room_id in list(self.rooms):
+            self.unsubscribe(room_id)
+
+    def publish(self, room_id: str, message: str):
+        self.published += 1
+        self.hub.publish(self, room_id, message)
+
+    def subscribe(self, room_id: str):
+        super().subscribe(room_id)
+        self.hub.subscribe(self, room_id)
+
+    def unsubscribe(self, room_id: str):
+        super().unsubscribe(room_id)
+        self.hub.unsubscribe(self, room_id)
+
+
+def encode(frame: dict) -> bytes:
+    return json.dumps(frame, separators=(",", ":")).encode() + b"\n"
+
+
+class UnixSocketHub:
+    """Forwards published frames to the other connections subscribed to the room.
+
+    Frames are newline-delimited JSON: ``{"op": "sub" | "unsub", "r": room}``
+    and ``{"op": "pub", "r": room, "n": bus id, "m": message}``. A subscriber
+    whose socket buffer is past ``high_water`` bytes misses messages
+    rather than growing the hub's memory.
+    """
+
+    def __init__(self, path: str, high_water: int = HIGH_WATER_BYTES):
+        self.path = path
+        self.high_water = high_water
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self.workers: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self.forwarded = 0
+        self.dropped = 0
+
+    async def start(self):
+        # Only called by the holder of the hub lock, so a socket file left
+        # here belongs to a hub that is gone
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._serve, self.path, limit=MAX_FRAME_BYTES)
+        logger.info(f"Signaling hub listening on {self.path}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Closing a worker's socket ends its handler at the next read
+        workers = list(self.workers.items())
+        for writer, _ in workers:
+            writer.close()
+        await asyncio.gather(*(task for _, task in workers), return_exceptions=True)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        rooms: Set[str] = set()
+        self.workers[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    frame = json.loads(line)
+                    room_id = frame["r"]
+                    op = frame["op"]
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Signaling hub ignored a malformed frame: {e!r}")
+                    continue
+                if op == "pub":
+                    self._forward(writer, room_id, line)
+                elif op == "sub":
+                    rooms.add(room_id)
+                    self.subscribers.setdefault(room_id, set()).add(writer)
+                elif op == "unsub":
+                    rooms.discard(room_id)
+                    self._unsubscribe(writer, room_id)
+        except (ConnectionError, ValueError) as e:
+            # ValueError: a line past the stream limit, after which the stream cannot resync
+            logger.warning(f"Signaling hub dropped a worker: {e}")
+        finally:
+            for room_id in rooms:
+                self._unsubscribe(writer, room_id)
+            self.workers.pop(writer, None)
+            writer.close()
+
+    def _forward(self, source: asyncio.StreamWriter, room_id: str, line: bytes):
+        for writer in self.subscribers.get(room_id, ()):
+            if writer is source:
+                continue
+            if writer.transport.get_write_buffer_size() > self.high_water:
+                self.dropped += 1
+                continue
+            writer.write(line)
+            self.forwarded += 1
+
+    def _unsubscribe(self, writer: asyncio.StreamWriter, room_id: str):
+        writers = self.subscribers.get(room_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[room_id]
+
+
+class UnixSocketBus(Bus):
+    """Workers on one host, e.g. ``uvicorn --workers N``, relaying through a hub.
+
+    The first worker to take an flock on ``<path>.lock`` runs the hub in
+    its own event loop and the others connect to it. If that worker
+    exits, the lock is released and the next worker to reconnect takes
+    over the hub and re-sends its subscriptions.
+    """
+
+    kind = "unix"
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, bus_id: Optional[str] = None):
+        super().__init__(bus_id)
+        self.path = path
+        self.hub: Optional[UnixSocketHub] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self._lock_file = None
+        self._closing = False
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        reader = await self._connect()
+        self.reader_task = asyncio.create_task(self._read(reader))
+
+    async def close(self):
+        self._closing = True
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+        if self.hub is not None:
+            await self.hub.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+    async def _connect(self) -> asyncio.StreamReader:
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME_BYTES)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self.hub is None and self._take_hub_lock():
+                    self.hub = UnixSocketHub(self.path)
+                    await self.hub.start()
+                else:
+                    await asyncio.sleep(RECONNECT_SECONDS / 10)
+        for room_id in self.rooms:
+            self.writer.write(encode({"op": "sub", "r": room_id}))
+        return reader
+
+    def _take_hub_lock(self) -> bool:
+        import fcntl
+
+        lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until this process exits or closes the bus
+        self._lock_file = lock_file
+        return True
+
+    async def _read(self, reader: asyncio.StreamReader):
+        while not self._closing:
+            try:
+                line = await reader.readline()
+            except (ConnectionError, ValueError) as e:
+                # ValueError: a line past the stream limit; start over on a new connection
+                logger.warning(f"Signaling hub connection failed: {e!r}")
+                line = b""
+            if not line:
+                logger.warning(f"Lost the signaling hub at {self.path}; reconnecting")
+                if self.writer is not None:
+                    self.writer.close()
+                self.writer = None
+                await asyncio.sleep(RECONNECT_SECONDS)
+                reader = await self._connect()
+                continue
+            try:
+                frame = json.loads(line)
+                sender, room_id, message = frame.get("n"), frame["r"], frame["m"]
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Ignored a malformed frame from the signaling hub: {e!r}")
+                continue
+            if sender == self.id:
+                continue
+            try:
+                self.deliver(room_id, message)
+            except Exception:
+                # A failing handler must not end the subscription for every room
+                logger.exception(f"Delivering a bus message to room {room_id} failed")
+
+    def _send(self, frame: dict) -> bool:
+        if self.writer is None or self.writer.is_closing():
+            return False
+        data = encode(frame)
+        if len(data) > MAX_FRAME_BYTES:
+            logger.warning(f"Dropped a {len(data)}-byte {frame['op']} frame for room {frame['r']}: over {MAX_FRAME_BYTES} bytes")
+            return False
+        self.writer.write(data)
+        return True
+
+    def publish(self, room_id: str, message: str):
+        if self.writer is not None and self.writer.transport.get_write_buffer_size() > HIGH_WATER_BYTES:
+            # The hub is not keeping up; do not buffer without bound
+            self.dropped += 1
+            return
+        if self._send({"op": "pub", "r": room_id, "n": self.id, "m": message}):
+            self.published += 1
+        else:
+            self.dropped += 1
+
+    def subscribe(self, room_id: str):
+        super().subscribe(room_id)
+        self._send({"op": "sub", "r": room_id})
+
+    def unsubscribe(self, room_id: str):
+        super().unsubscribe(room_id)
+        self._send({"op": "unsub", "r": room_id})
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["path"] = self.path
+        stats["hub"] = self.hub is not None
+        if self.hub is not None:
+            stats["hub_forwarded"] = self.hub.forwarded
+            stats["hub_dropped"] = self.hub.dropped
+        return stats
+
+
+class RedisBus(Bus):
+    """Nodes on several hosts, through Redis pub/sub with one channel per room.
+
+    ``rooms`` is the set of channels this node wants. After a failed
+    (un)subscribe, or a failed read that may have lost the connection, the
+    writer re-issues the difference between it and what Redis confirmed
+    until they match.
+    """
+
+    kind = "redis"
+
+    def __init__(self, url: str, bus_id: Optional[str] = None, prefix: str = "signaling:"):
+        super().__init__(bus_id)
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("SIGNALING_BUS=redis requires the redis package")
+        self.redis = redis.asyncio
+        self.url = url
+        self.prefix = prefix
+        self.client = None
+        self.pubsub = None
+        self.outbox: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self.client = self.redis.from_url(self.url)
+        self.pubsub = self.client.pubsub()
+        # One writer task keeps publishes and (un)subscribes in call order
+        self.outbox = asyncio.Queue(OUTBOX_SIZE)
+        self.tasks = [asyncio.create_task(self._write()), asyncio.create_task(self._read())]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        for resource in (self.pubsub, self.client):
+            if resource is not None:
+                # aclose() from redis 5.0.1, close() before
+                await getattr(resource, "aclose", resource.close)()
+
+    def _queue(self, op: str, room_id: str, data: Optional[str] = None) -> bool:
+        if self.outbox is None:
+            return False
+        try:
+            self.outbox.put_nowait((op, self.prefix + room_id, data))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def publish(self, room_id: str, message: str):
+        data = json.dumps({"n": self.id, "m": message}, separators=(",", ":"))
+        if self._queue("pub", room_id, data):
+            self.published += 1
+        else:
+            self.dropped += 1
+
+    def subscribe(self, room_id: str):
+        super().subscribe(room_id)
+        self._queue("sub", room_id)
+
+    def unsubscribe(self, room_id: str):
+        super().unsubscribe(room_id)
+        self._queue("unsub", room_id)
+
+    async def _resubscribe(self):
+        """Bring the Redis subscriptions back in line with ``rooms``"""
+        wanted = {self.prefix + room_id for room_id in self.rooms}
+        subscribed = {c.decode() if isinstance(c, bytes) else c for c in self.pubsub.channels}
+        if wanted - subscribed:
+            await self.pubsub.subscribe(*(wanted - subscribed))
+        if subscribed - wanted:
+            await self.pubsub.unsubscribe(*(subscribed - wanted))
+
+    async def _write(self):
+        resync = False
+        while True:
+            if resync:
+                try:
+                    await self._resubscribe()
+                    resync = False
+                except Exception as e:
+                    logger.warning(f"Redis resubscribe failed: {e}")
+                    await asyncio.sleep(RECONNECT_SECONDS)
+                    continue
+            op, channel, data = await self.outbox.get()
+            if op == "resync":
+                resync = True
+                continue
+            try:
+                if op == "pub":
+                    await self.client.publish(channel, data)
+                elif op == "sub":
+                    await self.pubsub.subscribe(channel)
+                else:
+                    await self.pubsub.unsubscribe(channel)
+            except Exception as e:
+                logger.warning(f"Redis {op} on {channel} failed: {e}")
+                if op == "pub":
+                    self.dropped += 1
+                else:
+                    resync = True
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _read(self):
+        while True:
+            if not self.pubsub.subscribed:
+                # get_message() returns at once until there is a subscription
+                await asyncio.sleep(RECONNECT_SECONDS / 10)
+                continue
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                logger.warning(f"Redis subscription failed: {e}")
+                self._queue("resync", "")
+                await asyncio.sleep(RECONNECT_SECONDS)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            frame = json.loads(message["data"])
+            if frame["n"] != self.id:
+                self.deliver(channel[len(self.prefix):], frame["m"])
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["outbox"] = self.outbox.qsize() if self.outbox is not None else 0
+        return stats
+
+
+def build_bus() -> Optional[Bus]:
+    """The bus named by SIGNALING_BUS, or None to keep rooms local to this process"""
+    kind = os.getenv("SIGNALING_BUS", "none")
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return InMemoryBus()
+    if kind == "unix":
+        return UnixSocketBus(os.getenv("SIGNALING_BUS_PATH", DEFAULT_SOCKET_PATH))
+    if kind == "redis":
+        return RedisBus(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown SIGNALING_BUS {kind!r}; use none, memory, unix or redis")
+
+
+def parse_nodes(value: str) -> Dict[str, str]:
+    """``"a=https://sig-a.example.com,b=https://sig-b.example.com"`` to ``{node: url}``"""
+    nodes = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        node_id, _, url = entry.partition("=")
+        nodes[node_id.strip()] = url.strip()
+    return nodes
+
+
+def preferred_node(room_id: str, nodes: List[str]) -> Optional[str]:
+    """Rendezvous hash: the node a room should live on.
+
+    Every node computes the same answer without coordination, and
+    adding or removing a node only moves the rooms that hashed to it.
+    """
+    if not nodes:
+        return None
+    return max(nodes, key=lambda node: hashlib.blake2b(f"{node}/{room_id}".encode(), digest_size=8).digest())
+
+
+class Affinity:
+    """Sticky room-to-node hints, so peers in a call tend to share a node.
+
+    The bus keeps calls correct wherever their peers land; routing the
+    whole room to one node keeps its messages off the bus altogether.
+    """
+
+    def __init__(self, node_id: str, nodes: Dict[str, str]):
+        self.node_id = node_id
+        self.nodes = nodes
+        self._order = sorted(nodes)
+
+    def hint(self, room_id: str) -> dict:
+        node = preferred_node(room_id, self._order) or self.node_id
+        return {
+            "room": room_id,
+            "node": node,
+            "url": self.nodes.get(node),
+            "local": node == self.node_id,
+        }
+
+
+def build_affinity() -> Affinity:
+    return Affinity(node_name(), parse_nodes(os.getenv("SIGNALING_NODES", "")))
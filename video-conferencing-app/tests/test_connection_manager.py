@@ -0,0 +1,349 @@
+import asyncio
+import json
+import unittest
+
+from server.connection_manager import ConnectionManager, DEFAULT_ROOM, PING, PONG
+
+
+class FakeSocket:
+    """Enough of starlette's WebSocket for the connection manager; records what it was sent"""
+
+    def __init__(self):
+        self.received = []
+        self.accepted = False
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        self.accepted = True
+
+    async def send_text(self, message):
+        self.received.append(message)
+
+    async def send_bytes(self, frame):
+        self.received.append(frame)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+class StalledSocket(FakeSocket):
+    """A client whose sends never complete"""
+
+    async def send_text(self, message):
+        await asyncio.Event().wait()
+
+
+def candidate(value):
+    return json.dumps({"type": "candidate", "from": "alice", "candidate": value})
+
+
+class ManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    """A manager without a background sweeper or ICE batching delay"""
+
+    manager_options = {}
+
+    async def asyncSetUp(self):
+        self.manager = ConnectionManager(sweep_interval=0, batch_window=0, **self.manager_options)
+
+    async def asyncTearDown(self):
+        for websocket in list(self.manager.connections):
+            self.manager.disconnect(websocket)
+        await self.manager.close()
+
+    async def connect(self, room_id=None, **kwargs):
+        websocket = FakeSocket()
+        self.assertTrue(await self.manager.connect(websocket, room_id, **kwargs))
+        return websocket
+
+    async def flush(self):
+        """Let the writer tasks send what is queued"""
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+
+class RoomRoutingTests(ManagerTestCase):
+
+    async def test_message_only_reaches_the_other_sockets_in_the_room(self):
+        alice, bob = await self.connect("call-1"), await self.connect("call-1")
+        eve = await self.connect("call-2")
+
+        self.assertEqual(self.manager.broadcast("offer", alice), 1)
+        await self.flush()
+
+        self.assertEqual(bob.received, ["offer"])
+        self.assertEqual(alice.received, [])
+        self.assertEqual(eve.received, [])
+
+    async def test_sockets_without_a_room_share_the_lobby(self):
+        first, second = await self.connect(), await self.connect()
+
+        self.manager.broadcast("hello", first)
+        await self.flush()
+
+        self.assertEqual(second.received, ["hello"])
+        self.assertEqual(self.manager.occupancy(DEFAULT_ROOM), 2)
+
+    async def test_join_moves_a_socket_and_drops_the_empty_room(self):
+        alice = await self.connect("call-1")
+        bob = await self.connect("call-2")
+
+        self.manager.join(alice, "call-2")
+        self.manager.broadcast("offer", bob)
+        await self.flush()
+
+        self.assertEqual(alice.received, ["offer"])
+        self.assertNotIn("call-1", self.manager.rooms)
+        self.assertNotIn("call-1", self.manager.room_stats)
+
+    async def test_disconnect_removes_the_socket_and_its_room(self):
+        alice = await self.connect("call-1")
+
+        self.assertEqual(self.manager.disconnect(alice), "call-1")
+
+        self.assertEqual(self.manager.rooms, {})
+        self.assertIsNone(self.manager.disconnect(alice))
+
+    async def test_unknown_sender_reaches_nobody(self):
+        await self.connect("call-1")
+
+        self.assertEqual(self.manager.broadcast("offer", FakeSocket()), 0)
+
+    async def test_full_room_is_refused_before_accepting(self):
+        self.manager.max_per_room = 2
+        await self.connect("call-1")
+        await self.connect("call-1")
+
+        late = FakeSocket()
+        self.assertFalse(await self.manager.connect(late, "call-1"))
+        self.assertTrue(await self.manager.connect(FakeSocket(), "call-2"))
+
+        self.assertFalse(late.accepted)
+        self.assertEqual(late.close_code, 1013)
+        self.assertEqual(self.manager.occupancy("call-1"), 2)
+        self.assertEqual(self.manager.rejected["room_full"], 1)
+
+    async def test_full_server_is_refused(self):
+        self.manager.max_connections = 1
+        await self.connect("call-1")
+
+        late = FakeSocket()
+        self.assertFalse(await self.manager.connect(late, "call-2"))
+
+        self.assertEqual(late.close_code, 1013)
+        self.assertEqual(self.manager.rejected["server_full"], 1)
+        self.assertNotIn("call-2", self.manager.rooms)
+
+    async def test_stats_are_per_room(self):
+        alice = await self.connect("call-1")
+        await self.connect("call-1")
+        await self.connect("call-2")
+
+        self.manager.broadcast("offer", alice)
+        stats = self.manager.stats()
+
+        self.assertEqual(stats["connections"], 3)
+        self.assertEqual(stats["per_room"]["call-1"]["occupancy"], 2)
+        self.assertEqual(stats["per_room"]["call-1"]["deliveries"], 1)
+        self.assertEqual(stats["per_room"]["call-2"]["messages"], 0)
+
+
+class OverflowPolicyTests(ManagerTestCase):
+    """Broadcasts queue synchronously, so a queue overflows before its writer runs"""
+
+    async def connect_pair(self, policy, batch=False):
+        self.manager.overflow_policy = policy
+        self.manager.queue_size = 2
+        sender = await self.connect("call-1")
+        receiver = await self.connect("call-1", batch=batch)
+        return sender, receiver, self.manager.connections[receiver]
+
+    async def test_drop_oldest_keeps_the_newest_messages(self):
+        sender, receiver, connection = await self.connect_pair("drop_oldest")
+
+        for message in ("one", "two", "three", "four"):
+            self.manager.broadcast(message, sender)
+        await self.flush()
+
+        self.assertEqual(receiver.received, ["three", "four"])
+        self.assertEqual(connection.dropped, 2)
+        self.assertEqual(connection.peak_depth, 2)
+
+    async def test_disconnect_closes_the_overflowing_socket(self):
+        sender, receiver, _ = await self.connect_pair("disconnect")
+
+        for message in ("one", "two", "three"):
+            self.manager.broadcast(message, sender)
+        await self.flush()
+
+        self.assertEqual(receiver.close_code, 1013)
+        self.assertNotIn(receiver, self.manager.connections)
+        self.assertEqual(self.manager.dropped_connections, 1)
+        self.assertEqual(sender.received, ["A user disconnected"])
+
+    async def test_coalesce_merges_queued_candidates_for_batching_clients(self):
+        sender, receiver, connection = await self.connect_pair("coalesce", batch=True)
+
+        for value in ("a", "b", "c"):
+            self.manager.broadcast(candidate(value), sender)
+        await self.flush()
+
+        self.assertEqual(
+            [json.loads(message) for message in receiver.received],
+            [{"type": "candidates", "from": "alice", "candidates": ["a", "b"]},
+             {"type": "candidate", "from": "alice", "candidate": "c"}],
+        )
+        self.assertEqual(connection.coalesced, 1)
+        self.assertEqual(connection.dropped, 0)
+
+    async def test_coalesce_keeps_candidates_with_different_envelopes_apart(self):
+        sender, receiver, connection = await self.connect_pair("coalesce", batch=True)
+
+        self.manager.broadcast(candidate("a"), sender)
+        self.manager.broadcast(json.dumps({"type": "candidate", "from": "bob", "candidate": "b"}), sender)
+        self.manager.broadcast(candidate("c"), sender)
+        await self.flush()
+
+        self.assertEqual(receiver.received[0], json.dumps({"type": "candidate", "from": "bob", "candidate": "b"}))
+        self.assertEqual(connection.dropped, 1)
+
+    async def test_coalesce_drops_oldest_for_clients_without_batching(self):
+        sender, receiver, connection = await self.connect_pair("coalesce")
+
+        for value in ("a", "b", "c"):
+            self.manager.broadcast(candidate(value), sender)
+        await self.flush()
+
+        self.assertEqual(receiver.received, [candidate("b"), candidate("c")])
+        self.assertEqual(connection.coalesced, 0)
+        self.assertEqual(connection.dropped, 1)
+
+    async def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ConnectionManager(overflow_policy="block")
+
+    async def test_stalled_peer_does_not_delay_the_room(self):
+        self.manager.send_timeout = 0.05
+        sender = await self.connect("call-1")
+        fast = await self.connect("call-1")
+        stalled = StalledSocket()
+        await self.manager.connect(stalled, "call-1")
+
+        for message in ("offer", "candidate"):
+            self.manager.broadcast(message, sender)
+        await self.flush()
+
+        self.assertEqual(fast.received, ["offer", "candidate"])
+
+        await asyncio.sleep(0.1)
+        await self.flush()
+
+        self.assertEqual(stalled.close_code, 1011)
+        self.assertNotIn(stalled, self.manager.connections)
+        self.assertEqual(self.manager.dropped_connections, 1)
+        self.assertEqual(fast.received[-1], "A user disconnected")
+
+
+class SweepTests(ManagerTestCase):
+    """Connections are aged by moving their timestamps back rather than by sleeping"""
+
+    manager_options = {"ping_interval": 20, "ping_timeout": 20, "idle_timeout": 0, "max_lifetime": 3600}
+
+    async def connect_quiet(self, room_id="call-1", quiet_for=30):
+        websocket = await self.connect(room_id)
+        connection = self.manager.connections[websocket]
+        connection.last_seen -= quiet_for
+        return websocket, connection
+
+    def miss_pong(self, connection):
+        connection.pinged_at -= self.manager.ping_timeout + 1
+
+    async def test_quiet_socket_is_pinged(self):
+        websocket, connection = await self.connect_quiet()
+
+        self.assertEqual(self.manager.sweep(), 0)
+        await self.flush()
+
+        self.assertEqual(websocket.received, [PING])
+        self.assertIsNotNone(connection.pinged_at)
+        self.assertEqual(self.manager.health()["awaiting_pong"], 1)
+
+        # Not pinged again while the first ping is pending
+        self.manager.sweep()
+        await self.flush()
+        self.assertEqual(websocket.received, [PING])
+
+    async def test_recently_heard_socket_is_not_pinged(self):
+        websocket = await self.connect("call-1")
+
+        self.manager.sweep()
+        await self.flush()
+
+        self.assertEqual(websocket.received, [])
+
+    async def test_pong_is_recorded_and_not_relayed(self):
+        websocket, connection = await self.connect_quiet()
+        self.manager.sweep()
+
+        self.assertFalse(self.manager.heard(websocket, PONG))
+        self.assertIsNone(connection.pinged_at)
+        self.assertTrue(connection.answers_pings)
+        self.assertTrue(self.manager.heard(websocket, "offer"))
+
+    async def test_missed_pong_reaps_a_socket_that_answered_before(self):
+        peer = await self.connect("call-1")
+        websocket, connection = await self.connect_quiet()
+        connection.answers_pings = True
+        self.manager.sweep()
+        self.miss_pong(connection)
+
+        self.assertEqual(self.manager.sweep(), 1)
+        await self.flush()
+
+        self.assertEqual(websocket.close_code, 1001)
+        self.assertNotIn(websocket, self.manager.connections)
+        self.assertEqual(self.manager.reaped["no_pong"], 1)
+        self.assertEqual(peer.received, ["A user disconnected"])
+
+    async def test_legacy_client_is_not_reaped_or_pinged_again(self):
+        websocket, connection = await self.connect_quiet()
+        self.manager.sweep()
+        self.miss_pong(connection)
+
+        self.assertEqual(self.manager.sweep(), 0)
+
+        self.assertIn(websocket, self.manager.connections)
+        self.assertIs(connection.answers_pings, False)
+        self.assertIsNone(connection.pinged_at)
+
+        self.manager.sweep()
+        await self.flush()
+        self.assertEqual(websocket.received, [PING])
+
+    async def test_socket_past_its_lifetime_is_reaped(self):
+        websocket = await self.connect("call-1")
+        self.manager.connections[websocket].connected_at -= self.manager.max_lifetime + 1
+
+        self.assertEqual(self.manager.sweep(), 1)
+        await self.flush()
+
+        self.assertEqual(websocket.close_code, 1001)
+        self.assertEqual(self.manager.reaped["lifetime"], 1)
+        self.assertEqual(self.manager.rooms, {})
+
+    async def test_idle_socket_is_reaped_only_with_an_idle_timeout(self):
+        websocket, _ = await self.connect_quiet(quiet_for=120)
+        self.manager.ping_interval = 0
+
+        self.assertEqual(self.manager.sweep(), 0)
+
+        self.manager.idle_timeout = 60
+        self.assertEqual(self.manager.sweep(), 1)
+        await self.flush()
+
+        self.assertEqual(websocket.close_code, 1001)
+        self.assertEqual(self.manager.reaped["idle"], 1)
+        self.assertEqual(self.manager.health()["live"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,12 +3,15 @@ import json
 import httpx
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import Optional
 import uvicorn
 from pathlib import Path
 from dotenv import load_dotenv
+from server.connection_manager import build_connection_manager
+from server.pubsub import build_affinity
+from server import codec, metrics
 
 # Load environment variables
 load_dotenv()
@@ -107,41 +110,70 @@ async def get_turn_credentials():
         ]
     })
 
-# WebSocket Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+# WebSocket Manager: messages are only relayed within the sender's room, through
+# per-connection send queues (WS_SEND_QUEUE_SIZE, WS_OVERFLOW_POLICY, WS_SEND_TIMEOUT)
+manager = build_connection_manager()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New connection. Total: {len(self.active_connections)}")
+# Room-to-node hints from SIGNALING_NODES, for routing a whole call to one node
+affinity = build_affinity()
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"Disconnected. Total: {len(self.active_connections)}")
+# With SIGNALING_BUS set, rooms span every worker and node sharing the bus
+@app.on_event("startup")
+async def start_signaling_bus():
+    codec.warn_if_unavailable()
+    await manager.start()
 
-    async def broadcast(self, message: str, sender: WebSocket):
-        for connection in self.active_connections:
-            if connection != sender:
-                try:
-                    await connection.send_text(message)
-                except:
-                    self.disconnect(connection)
-
-manager = ConnectionManager()
+@app.on_event("shutdown")
+async def stop_signaling_bus():
+    await manager.close()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Clients pick their call with ?room=<id>; without one they share the lobby
+    room_id = websocket.query_params.get("room") or websocket.query_params.get("roomId")
+    # JSON text unless the client asks for MessagePack (subprotocol or ?encoding=msgpack);
+    # ?batch=1 merges bursts of ICE candidates into "candidates" messages
+    encoding, subprotocol = codec.negotiate(websocket)
+    batch = websocket.query_params.get("batch")
+    # Refused when the server or the room is full (WS_MAX_CONNECTIONS, WS_MAX_PER_ROOM)
+    if not await manager.connect(websocket, room_id, encoding=encoding, subprotocol=subprotocol,
+                                 batch=batch in ("1", "true") if batch is not None else None):
+        return
     try:
         while True:
-            data = await websocket.receive_text()
-            await manager.broadcast(data, websocket)
+            data = await codec.receive(websocket)
+            # Replies to the server's heartbeat pings stay on this worker
+            if manager.heard(websocket, data):
+                manager.broadcast(data, websocket)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        await manager.broadcast("A user disconnected", websocket)
+        pass
+    finally:
+        # No-op when the manager already dropped the connection itself
+        room_id = manager.disconnect(websocket)
+        if room_id is not None:
+            manager.broadcast("A user disconnected", websocket, room_id=room_id)
+
+# Per-room occupancy and message rates
+@app.get("/api/rooms")
+async def get_room_stats():
+    return JSONResponse(content=manager.stats())
+
+# Which node a room should be routed to (rendezvous hash over SIGNALING_NODES)
+@app.get("/api/affinity")
+async def get_room_affinity(room: str):
+    return JSONResponse(content=affinity.hint(room))
+
+# Per-connection send queue depth and dropped-message counts
+@app.get("/api/connections")
+async def get_connection_stats(room: Optional[str] = None):
+    return JSONResponse(content={"connections": manager.connection_stats(room)})
+
+# Connection gauges in Prometheus text format, when METRICS_ENABLED=True
+@app.get("/metrics")
+async def get_metrics():
+    if os.getenv("METRICS_ENABLED", "False") != "True":
+        return JSONResponse(content={"error": "Metrics are disabled"}, status_code=404)
+    return PlainTextResponse(metrics.render(manager), media_type="text/plain; version=0.0.4")
 
 # Serve frontend files
 @app.get("/{path:path}")